@@ -103,6 +103,12 @@ def _parse_args(cmd_args):
     )
     parser.add_argument("--dry-run", action="store_true", help="test start-up and exit", default=False)
     parser.add_argument("--daemon", action="store_true", help="run as daemon")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="log how long each start-up step takes",
+        default=False,
+    )
 
     group.add_argument("--version", action="version", version=f"pyLoad {__version__}")
 
@@ -130,7 +136,15 @@ def main(cmd_args=sys.argv[1:]):
     Entry point for console_scripts.
     """
     args = _parse_args(cmd_args)
-    core_args = (args.userdir, args.tempdir, args.storagedir, args.debug, args.restore, args.dry_run)
+    core_args = (
+        args.userdir,
+        args.tempdir,
+        args.storagedir,
+        args.debug,
+        args.restore,
+        args.dry_run,
+        args.profile_startup,
+    )
 
     run(core_args, args.daemon)
 
@@ -16,6 +16,7 @@ import subprocess
 import sys
 import tempfile
 import time
+from contextlib import contextmanager
 
 from pyload import PKGDIR, APPID, USERHOMEDIR
 from .. import __version__ as PYLOAD_VERSION
@@ -76,7 +77,16 @@ class Core:
         return self._debug
 
     # NOTE: should `restore` reset config as well?
-    def __init__(self, userdir, tempdir, storagedir, debug=None, restore=False, dry=False):
+    def __init__(
+        self,
+        userdir,
+        tempdir,
+        storagedir,
+        debug=None,
+        restore=False,
+        dry=False,
+        profile=False,
+    ):
         self._running = Event()
         self._exiting = False
         self._do_restart = False
@@ -84,6 +94,8 @@ class Core:
         self._ = lambda x: x
         self._debug = 0
         self._dry_run = dry
+        self._profile = profile
+        self._startup_times = []  #: (step, seconds) spent starting up
 
         # if self.tmpdir not in sys.path:
         # sys.path.append(self.tmpdir)
@@ -91,14 +103,20 @@ class Core:
         # if refresh:
         # cleanpy(PACKDIR)
 
-        self._init_config(userdir, tempdir, storagedir, debug)
-        self._init_log()
-
-        self._init_database(restore and not dry)
-        self._init_network()
-        self._init_api()
+        with self._timed("config"):
+            self._init_config(userdir, tempdir, storagedir, debug)
+        with self._timed("logging"):
+            self._init_log()
+
+        with self._timed("database"):
+            self._init_database(restore and not dry)
+        with self._timed("network"):
+            self._init_network()
+        with self._timed("api"):
+            self._init_api()
         self._init_managers()
-        self._init_webserver()
+        with self._timed("webserver"):
+            self._init_webserver()
 
         atexit.register(self.terminate)
 
@@ -192,15 +210,38 @@ class Core:
 
         from .scheduler import Scheduler
 
-        self.files = self.file_manager = FileManager(self)
-        self.scheduler = Scheduler(self)
+        with self._timed("file manager"):
+            self.files = self.file_manager = FileManager(self)
+            self.scheduler = Scheduler(self)
 
-        self.pgm = self.plugin_manager = PluginManager(self)
+        with self._timed("plugin indexing"):
+            self.pgm = self.plugin_manager = PluginManager(self)
         self.evm = self.event_manager = EventManager(self)
-        self.acm = self.account_manager = AccountManager(self)
-        self.thm = self.thread_manager = ThreadManager(self)
+        with self._timed("account plugins"):
+            self.acm = self.account_manager = AccountManager(self)
+        with self._timed("thread manager"):
+            self.thm = self.thread_manager = ThreadManager(self)
         self.cpm = self.captcha_manager = CaptchaManager(self)
-        self.adm = self.addon_manager = AddonManager(self)
+        with self._timed("addon loading"):
+            self.adm = self.addon_manager = AddonManager(self)
+
+    @contextmanager
+    def _timed(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._startup_times.append((step, time.perf_counter() - start))
+
+    def _report_startup(self):
+        if not self._profile:
+            return
+        total = sum(seconds for step, seconds in self._startup_times)
+        self.log.info(self._("Startup profile:"))
+        for step, seconds in self._startup_times:
+            share = 100 * seconds / total if total else 0
+            self.log.info(f"  {step:<20} {seconds:8.3f}s {share:5.1f}%")
+        self.log.info(f"  {'total':<20} {total:8.3f}s")
 
     def _setup_permissions(self):
         self.log.debug("Setup permissions...")
@@ -276,11 +317,13 @@ class Core:
 
         # TODO: Move to accountmanager
         self.log.info(self._("Activating accounts..."))
-        self.acm.get_account_infos()
+        with self._timed("account activation"):
+            self.acm.get_account_infos()
         # self.scheduler.add_job(0, self.acm.get_account_infos)
 
         self.log.info(self._("Activating Plugins..."))
-        self.adm.core_ready()
+        with self._timed("addon activation"):
+            self.adm.core_ready()
 
     def _start_webserver(self):
         if not self.config.get("webui", "enabled"):
@@ -394,9 +437,12 @@ class Core:
             # from meliae import scanner
             # scanner.dump_all_objects(os.path.join(PACKDIR, 'objs.json'))
 
-            self._start_webserver()
+            with self._timed("webserver start"):
+                self._start_webserver()
             # self._parse_linkstxt()
 
+            self._report_startup()
+
             self.log.debug("*** pyLoad is up and running ***")
             # self.evm.fire('pyload:started')
 
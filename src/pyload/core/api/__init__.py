@@ -16,7 +16,6 @@ import time
 from functools import wraps
 
 from ..datatypes.pyfile import PyFile
-from ..log_factory import LogFactory
 from ..network.request_factory import get_url
 from ..utils.old.packagetools import parse_names
 from ..utils import seconds, fs
@@ -122,6 +121,24 @@ class Api:
         )
         return f
 
+    def _convert_package(self, p):
+        return PackageData(
+            p["id"],
+            p["name"],
+            p["folder"],
+            p["site"],
+            p["password"],
+            p["queue"],
+            p["order"],
+            p["linksdone"],
+            p["sizedone"],
+            p["sizetotal"],
+            p["linkstotal"],
+            links=None
+            if p["links"] is None
+            else [self._convert_py_file(x) for x in p["links"].values()],
+        )
+
     def _convert_config_format(self, c):
         sections = {}
         for section_name, sub in c.items():
@@ -180,6 +197,7 @@ class Api:
             if option in (
                 "limit_speed",
                 "max_speed",
+                "plugin_speed",
             ):  #: not so nice to update the limit
                 self.pyload.request_factory.update_bucket()
 
@@ -290,6 +308,26 @@ class Api:
 
         return server_status
 
+    @permission(Perms.STATUS)
+    def get_bandwidth_status(self):
+        """
+        Current state of all speed limiters, from the global one down to the single downloads.
+
+        :return: list of `BandwidthInfo`, rates and speeds in bytes/s, backlog in bytes
+        """
+        return [
+            BandwidthInfo(
+                bucket.name,
+                bucket.parent.name if bucket.parent else None,
+                bucket.get_rate() if bucket.get_rate() >= bucket.MIN_RATE else -1,
+                int(bucket.get_speed()),
+                bucket.get_backlog(),
+                bucket.transferred,
+                bucket.weight,
+            )
+            for bucket in self.pyload.request_factory.bucket.walk()
+        ]
+
     @legacy("freeSpace")
     @permission(Perms.STATUS)
     def free_space(self):
@@ -306,6 +344,21 @@ class Api:
         """
         return self.pyload.version
 
+    def vacuum_database(self):
+        """
+        Compact the database file, blocks all database access while running.
+        """
+        self.pyload.db.vacuum()
+
+    def check_package_stats(self):
+        """
+        Recounts links and sizes of all packages and repairs the statistics kept in the
+        database, needed only if they were changed outside of pyLoad.
+
+        :return: list of repaired package ids
+        """
+        return self.pyload.db.check_package_stats()
+
     def kill(self):
         """
         Clean way to quit pyLoad.
@@ -320,27 +373,33 @@ class Api:
 
     @legacy("getLog")
     @permission(Perms.LOGS)
-    def get_log(self, offset=0):
+    def get_log(self, offset=0, limit=None):
         """
         Returns most recent log entries.
 
-        :param offset: line offset
+        :param offset: line offset, negative to count from the end
+        :param limit: max number of lines, all by default
         :return: List of log entries
         """
-        filelog_folder = self.pyload.config.get("log", "filelog_folder")
-        if not filelog_folder:
-            filelog_folder = os.path.join(self.pyload.userdir, "logs")
-
-        path = os.path.join(filelog_folder, "pyload" + LogFactory.FILE_EXTENSION)
         try:
-            with open(path) as fh:
-                lines = fh.readlines()
-            if offset >= len(lines):
-                return []
-            return lines[offset:]
+            return self.pyload.logfactory.get_index("pyload").read(
+                int(offset), limit if limit is None else int(limit)
+            )
         except Exception:
             return ["No log available"]
 
+    @permission(Perms.LOGS)
+    def get_log_length(self):
+        """
+        Returns the number of lines in the log.
+
+        :return: number of lines, 0 if there is no log
+        """
+        try:
+            return self.pyload.logfactory.get_index("pyload").count()
+        except Exception:
+            return 0
+
     @legacy("isTimeDownload")
     @permission(Perms.STATUS)
     def is_time_download(self):
@@ -740,6 +799,46 @@ class Api:
             for pack in self.pyload.files.get_complete_data(Destination.QUEUE).values()
         ]
 
+    @permission(Perms.LIST)
+    def get_queue_page(self, destination=Destination.QUEUE.value, offset=0, limit=100):
+        """
+        Returns some packages with their files, big queues can be loaded page by page
+        this way. Keep the version to ask for changes with `get_queue_changes`.
+
+        :param destination: `Destination`
+        :param offset: position of the first package
+        :param limit: max number of packages
+        :return: `QueuePage`
+        """
+        version, total, packs = self.pyload.files.get_page(
+            Destination(destination), int(offset), int(limit)
+        )
+        return QueuePage(
+            version, total, [self._convert_package(pack) for pack in packs.values()]
+        )
+
+    @permission(Perms.LIST)
+    def get_queue_changes(self, version, destination=Destination.QUEUE.value):
+        """
+        Returns what changed in queue or collector since version, to keep a copy of it
+        up to date. If `reload` is set the changes are not known anymore, reload all
+        pages instead.
+
+        :param version: version of the last page or changes loaded
+        :param destination: `Destination`
+        :return: `QueueChanges`
+        """
+        changes = self.pyload.files.get_changes(int(version), Destination(destination))
+        return QueueChanges(
+            changes["version"],
+            changes["reload"],
+            [self._convert_package(pack) for pack in changes["packages"].values()],
+            [self._convert_py_file(link) for link in changes["links"].values()],
+            changes["removed_packages"],
+            changes["removed_links"],
+            changes["order"],
+        )
+
     @legacy("getCollector")
     @permission(Perms.LIST)
     def get_collector(self):
@@ -990,6 +1089,20 @@ class Api:
         p.sync()
         self.pyload.files.save()
 
+    @permission(Perms.MODIFY)
+    def set_package_weight(self, package_id, weight):
+        """
+        Sets the share of bandwidth the downloads of a package get, relative to the others.
+
+        :param package_id: package id
+        :param weight: positive integer, 1 is the default
+        """
+        p = self.pyload.files.get_package(package_id)
+        if not p:
+            raise PackageDoesNotExists(package_id)
+
+        self.pyload.request_factory.set_weight(package_id, weight)
+
     @legacy("deleteFinished")
     @permission(Perms.DELETE)
     def delete_finished(self):
@@ -1162,6 +1275,8 @@ class Api:
                         acc["maxtraffic"],
                         acc["premium"],
                         acc["type"],
+                        acc["refreshed"],
+                        acc["plugin"].is_stale(acc["login"]),
                     )
                     for acc in group
                 ]
@@ -1185,6 +1300,7 @@ class Api:
         Changes pw/options for specific account.
         """
         self.pyload.account_manager.update_account(plugin, account, password, options)
+        self.pyload.request_factory.update_bucket()  #: options may hold a speed limit
 
     @legacy("removeAccount")
     @permission(Perms.ACCOUNTS)
@@ -1380,6 +1496,19 @@ class Api:
         """
         return self.pyload.addon_manager.get_all_info()
 
+    @permission(Perms.STATUS)
+    def get_addon_hook_stats(self):
+        """
+        Timing of the addon hooks and event listeners called so far, to spot the
+        ones slowing pyLoad down.
+
+        :return: list of `AddonHookStats`, times in seconds
+        """
+        return [
+            AddonHookStats(*stats)
+            for stats in self.pyload.addon_manager.get_hook_stats()
+        ]
+
     @legacy("getInfoByPlugin")
     @permission(Perms.STATUS)
     def get_info_by_plugin(self, plugin):
@@ -234,29 +234,37 @@ class ConfigParser:
 
     def save_config(self, config, filename):
         """
-        saves config to filename.
+        saves config to filename, unless it is up to date already.
         """
-        with open(filename, mode="w") as fp:
-            os.chmod(filename, 0o600)
-            fp.write(f"version: {__version__} \n")
-            for section in sorted(config.keys()):
-                fp.write(f'\n{section} - "{config[section]["desc"]}":\n')
+        lines = [f"version: {__version__} \n"]
+        for section in sorted(config.keys()):
+            lines.append(f'\n{section} - "{config[section]["desc"]}":\n')
 
-                for option, data in sorted(
-                    config[section].items(), key=lambda _x: _x[0]
-                ):
-                    if option in ("desc", "outline"):
-                        continue
+            for option, data in sorted(config[section].items(), key=lambda _x: _x[0]):
+                if option in ("desc", "outline"):
+                    continue
 
-                    if isinstance(data["value"], list):
-                        value = "[ \n"
-                        for x in data["value"]:
-                            value += f"\t\t{x},\n"
-                        value += "\t\t]\n"
-                    else:
-                        value = str(data["value"]) + "\n"
+                if isinstance(data["value"], list):
+                    value = "[ \n"
+                    for x in data["value"]:
+                        value += f"\t\t{x},\n"
+                    value += "\t\t]\n"
+                else:
+                    value = str(data["value"]) + "\n"
 
-                    fp.write(f'\t{data["type"]} {option} : "{data["desc"]}" = {value}')
+                lines.append(f'\t{data["type"]} {option} : "{data["desc"]}" = {value}')
+
+        content = "".join(lines)
+        try:
+            with open(filename) as fp:
+                if fp.read() == content:
+                    return
+        except (OSError, ValueError):
+            pass
+
+        with open(filename, mode="w") as fp:
+            os.chmod(filename, 0o600)
+            fp.write(content)
 
     def cast(self, typ, value):
         """
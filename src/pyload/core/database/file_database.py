@@ -5,9 +5,30 @@ from ..datatypes.pypackage import PyPackage
 from ..utils.struct.style import style
 from ..utils import format
 
+#: link states a download can be started from: online, queued, unknown
+JOB_STATUS = (2, 3, 14)
+
+#: link states counted as done in the package statistics: finished, skipped, processing
+DONE_STATUS = (0, 4, 13)
+
+#: plugins processed in the collector too
+COLLECTOR_PLUGINS = ("DLC", "LinkList", "SerienjunkiesOrg", "CCF", "RSDF")
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+def _chunks(values, size=500):
+    """
+    splits values into lists short enough for the sqlite variable limit.
+    """
+    values = list(values)
+    return [values[n : n + size] for n in range(0, len(values), size)]
+
 
 class FileDatabaseMethods:
-    @style.queue
+    @style.read
     def filecount(self, queue):
         """
         returns number of files in queue.
@@ -18,7 +39,7 @@ class FileDatabaseMethods:
         )
         return self.c.fetchone()[0]
 
-    @style.queue
+    @style.read
     def queuecount(self, queue):
         """
         number of files in queue not finished yet.
@@ -29,7 +50,7 @@ class FileDatabaseMethods:
         )
         return self.c.fetchone()[0]
 
-    @style.queue
+    @style.read
     def processcount(self, queue, fid):
         """
         number of files which have to be proccessed.
@@ -106,7 +127,7 @@ class FileDatabaseMethods:
             (f.order, str(f.packageid)),
         )
 
-    @style.queue
+    @style.read
     def get_all_links(self, q):
         """
         return information about all links in queue q.
@@ -124,28 +145,13 @@ class FileDatabaseMethods:
             "SELECT l.id,l.url,l.name,l.size,l.status,l.error,l.plugin,l.package,l.linkorder FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE p.queue=? ORDER BY l.linkorder",
             (q,),
         )
-        data = {}
-        for r in self.c:
-            data[r[0]] = {
-                "id": r[0],
-                "url": r[1],
-                "name": r[2],
-                "size": r[3],
-                "format_size": format.size(r[3]),
-                "status": r[4],
-                "statusmsg": self.pyload.files.status_msg[r[4]],
-                "error": r[5],
-                "plugin": r[6],
-                "package": r[7],
-                "order": r[8],
-            }
+        return {r[0]: self._link_info(r) for r in self.c}
 
-        return data
-
-    @style.queue
-    def get_all_packages(self, q):
+    @style.read
+    def get_all_packages(self, q, offset=0, limit=-1):
         """
-        return information about packages in queue q (only useful in get all data)
+        return information about packages in queue q (only useful in get all data),
+        optionally just limit of them starting at offset.
 
         q0 queue
         q1 collector
@@ -159,43 +165,99 @@ class FileDatabaseMethods:
         self.c.execute(
             "SELECT p.id, p.name, p.folder, p.site, p.password, p.queue, p.packageorder, s.sizetotal, s.sizedone, s.linksdone, s.linkstotal \
             FROM packages p JOIN pstats s ON p.id = s.id \
-            WHERE p.queue=? ORDER BY p.packageorder",
-            str(q),
+            WHERE p.queue=? AND s.linkstotal > 0 ORDER BY p.packageorder LIMIT ? OFFSET ?",
+            (q, limit, offset),
         )
+        return {r[0]: self._package_info(r) for r in self.c}
 
+    @style.read
+    def get_packages_by_id(self, ids):
+        """
+        like `get_all_packages`, for the given package ids.
+        """
         data = {}
-        for r in self.c:
-            data[r[0]] = {
-                "id": r[0],
-                "name": r[1],
-                "folder": r[2],
-                "site": r[3],
-                "password": r[4],
-                "queue": r[5],
-                "order": r[6],
-                "sizetotal": int(r[7]),
-                "sizedone": r[8] if r[8] else 0,  #: these can be None
-                "linksdone": r[9] if r[9] else 0,
-                "linkstotal": r[10],
-                "links": {},
-            }
+        for chunk in _chunks(ids):
+            self.c.execute(
+                f"SELECT p.id, p.name, p.folder, p.site, p.password, p.queue, p.packageorder, s.sizetotal, s.sizedone, s.linksdone, s.linkstotal \
+                FROM packages p JOIN pstats s ON p.id = s.id \
+                WHERE p.id IN ({_placeholders(chunk)}) AND s.linkstotal > 0",
+                chunk,
+            )
+            data.update((r[0], self._package_info(r)) for r in self.c)
+        return data
 
+    @style.read
+    def get_links_by_id(self, ids):
+        """
+        like `get_all_links`, for the given link ids.
+        """
+        data = {}
+        for chunk in _chunks(ids):
+            self.c.execute(
+                f"SELECT id,url,name,size,status,error,plugin,package,linkorder FROM links WHERE id IN ({_placeholders(chunk)})",
+                chunk,
+            )
+            data.update((r[0], self._link_info(r)) for r in self.c)
+        return data
+
+    @style.read
+    def get_links_by_package(self, ids):
+        """
+        like `get_all_links`, for the links of the given packages.
+        """
+        data = {}
+        for chunk in _chunks(ids):
+            self.c.execute(
+                f"SELECT id,url,name,size,status,error,plugin,package,linkorder FROM links WHERE package IN ({_placeholders(chunk)}) ORDER BY package, linkorder",
+                chunk,
+            )
+            data.update((r[0], self._link_info(r)) for r in self.c)
         return data
 
+    @style.read
+    def get_package_order(self, queue):
+        """
+        ids of the packages in queue, in order, skipping empty ones like
+        `get_all_packages`.
+        """
+        self.c.execute(
+            "SELECT p.id FROM packages p JOIN pstats s ON p.id = s.id \
+            WHERE p.queue=? AND s.linkstotal > 0 ORDER BY p.packageorder",
+            (queue,),
+        )
+        return [r[0] for r in self.c]
+
     @style.queue
-    def get_link_data(self, id):
+    def check_package_stats(self):
+        return self._check_package_stats()
+
+    @style.inner
+    def _check_package_stats(self):
         """
-        get link information as dict.
+        recounts the statistics of all packages, repairs and returns the wrong ones.
         """
         self.c.execute(
-            "SELECT id,url,name,size,status,error,plugin,package,linkorder FROM links WHERE id=?",
-            (str(id),),
+            f"SELECT p.id, COUNT(l.id), TOTAL(l.status IN {DONE_STATUS}), TOTAL(l.size), TOTAL((l.status IN {DONE_STATUS}) * l.size), \
+            s.linkstotal, s.linksdone, s.sizetotal, s.sizedone \
+            FROM packages p LEFT JOIN links l ON p.id = l.package LEFT JOIN pstats s ON p.id = s.id \
+            GROUP BY p.id"
         )
-        data = {}
-        r = self.c.fetchone()
-        if not r:
-            return None
-        data[r[0]] = {
+        wrong = []
+        for r in self.c.fetchall():
+            counted = tuple(int(x) for x in r[1:5])
+            if counted != r[5:]:
+                wrong.append((r[0],) + counted)
+
+        self.c.executemany(
+            "INSERT OR REPLACE INTO pstats(id, linkstotal, linksdone, sizetotal, sizedone) VALUES (?, ?, ?, ?, ?)",
+            wrong,
+        )
+        self.c.execute("DELETE FROM pstats WHERE id NOT IN (SELECT id FROM packages)")
+        return [r[0] for r in wrong]
+
+    @style.inner
+    def _link_info(self, r):
+        return {
             "id": r[0],
             "url": r[1],
             "name": r[2],
@@ -209,9 +271,38 @@ class FileDatabaseMethods:
             "order": r[8],
         }
 
-        return data
+    @style.inner
+    def _package_info(self, r):
+        return {
+            "id": r[0],
+            "name": r[1],
+            "folder": r[2],
+            "site": r[3],
+            "password": r[4],
+            "queue": r[5],
+            "order": r[6],
+            "sizetotal": int(r[7]),
+            "sizedone": r[8] if r[8] else 0,  #: these can be None
+            "linksdone": r[9] if r[9] else 0,
+            "linkstotal": r[10],
+            "links": {},
+        }
 
-    @style.queue
+    @style.read
+    def get_link_data(self, id):
+        """
+        get link information as dict.
+        """
+        self.c.execute(
+            "SELECT id,url,name,size,status,error,plugin,package,linkorder FROM links WHERE id=?",
+            (str(id),),
+        )
+        r = self.c.fetchone()
+        if not r:
+            return None
+        return {r[0]: self._link_info(r)}
+
+    @style.read
     def get_package_data(self, id):
         """
         get data about links for a package.
@@ -221,23 +312,7 @@ class FileDatabaseMethods:
             (str(id),),
         )
 
-        data = {}
-        for r in self.c:
-            data[r[0]] = {
-                "id": r[0],
-                "url": r[1],
-                "name": r[2],
-                "size": r[3],
-                "format_size": format.size(r[3]),
-                "status": r[4],
-                "statusmsg": self.pyload.files.status_msg[r[4]],
-                "error": r[5],
-                "plugin": r[6],
-                "package": r[7],
-                "order": r[8],
-            }
-
-        return data
+        return {r[0]: self._link_info(r) for r in self.c}
 
     @style.async_
     def update_link(self, f):
@@ -323,7 +398,7 @@ class FileDatabaseMethods:
     def restart_package(self, id):
         self.c.execute("UPDATE links SET status=3 WHERE package=?", (str(id),))
 
-    @style.queue
+    @style.read
     def get_package(self, id):
         """
         return package instance from id.
@@ -338,7 +413,7 @@ class FileDatabaseMethods:
         return PyPackage(self.pyload.files, id, *r)
 
     # ----------------------------------------------------------------------
-    @style.queue
+    @style.read
     def get_file(self, id):
         """
         return link instance from id.
@@ -352,41 +427,43 @@ class FileDatabaseMethods:
             return None
         return PyFile(self.pyload.files, id, *r)
 
-    @style.queue
+    @style.read
     def get_job(self, occ):
         """
         return pyfile ids, which are suitable for download and dont use a occupied
         plugin.
         """
-        # TODO: improve this hardcoded method
-        # plugins which are processed in collector
-        pre = "('DLC', 'LinkList', 'SerienjunkiesOrg', 'CCF', 'RSDF')"
-
-        cmd = "("
-        for i, item in enumerate(occ):
-            if i:
-                cmd += ", "
-            cmd += f"'{item}'"
-
-        cmd += ")"
-        cmd = f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE ((p.queue=1 AND l.plugin NOT IN {cmd}) OR l.plugin IN {pre}) AND l.status IN (2,3,14) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5"
-
-        self.c.execute(cmd)  #: very bad!
-
+        occ = tuple(occ)
+        self.c.execute(
+            f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE ((p.queue=1 AND l.plugin NOT IN ({_placeholders(occ)})) OR l.plugin IN ({_placeholders(COLLECTOR_PLUGINS)})) AND l.status IN ({_placeholders(JOB_STATUS)}) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5",
+            occ + COLLECTOR_PLUGINS + JOB_STATUS,
+        )
         return [x[0] for x in self.c]
 
-    @style.queue
+    @style.read
     def get_plugin_job(self, plugins):
         """
         returns pyfile ids with suited plugins.
         """
-        cmd = f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE l.plugin IN {plugins} AND l.status IN (2,3,14) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5"
-
-        self.c.execute(cmd)  #: very bad!
-
+        plugins = tuple(plugins)
+        self.c.execute(
+            f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE l.plugin IN ({_placeholders(plugins)}) AND l.status IN ({_placeholders(JOB_STATUS)}) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5",
+            plugins + JOB_STATUS,
+        )
         return [x[0] for x in self.c]
 
-    @style.queue
+    @style.read
+    def get_ready_links(self):
+        """
+        returns (id, plugin, packageorder, linkorder) of all links a download can be started for.
+        """
+        self.c.execute(
+            f"SELECT l.id, l.plugin, p.packageorder, l.linkorder FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE l.status IN ({_placeholders(JOB_STATUS)}) AND (p.queue=1 OR l.plugin IN ({_placeholders(COLLECTOR_PLUGINS)}))",
+            JOB_STATUS + COLLECTOR_PLUGINS,
+        )
+        return self.c.fetchall()
+
+    @style.read
     def get_unfinished(self, pid):
         """
         return list of max length 3 ids with pyfiles in package not finished or
@@ -409,7 +486,7 @@ class FileDatabaseMethods:
     def restart_failed(self):
         self.c.execute("UPDATE links SET status=3,error='' WHERE status IN (6, 8, 9)")
 
-    @style.queue
+    @style.read
     def find_duplicates(self, id, folder, filename):
         """
         checks if filename exists with different id and same package.
@@ -30,6 +30,8 @@ class AccountInfo(AbstractData):
         "maxtraffic",
         "premium",
         "type",
+        "refreshed",
+        "stale",
     ]
 
     def __init__(
@@ -42,6 +44,8 @@ class AccountInfo(AbstractData):
         maxtraffic=None,
         premium=None,
         type=None,
+        refreshed=None,
+        stale=None,
     ):
         self.validuntil = validuntil
         self.login = login
@@ -51,6 +55,63 @@ class AccountInfo(AbstractData):
         self.maxtraffic = maxtraffic
         self.premium = premium
         self.type = type
+        self.refreshed = refreshed
+        self.stale = stale
+
+
+class AddonHookStats(AbstractData):
+    __slots__ = [
+        "addon",
+        "hook",
+        "calls",
+        "seconds",
+        "max_seconds",
+        "errors",
+        "dropped",
+        "pending",
+    ]
+
+    def __init__(
+        self,
+        addon=None,
+        hook=None,
+        calls=None,
+        seconds=None,
+        max_seconds=None,
+        errors=None,
+        dropped=None,
+        pending=None,
+    ):
+        self.addon = addon
+        self.hook = hook
+        self.calls = calls
+        self.seconds = seconds
+        self.max_seconds = max_seconds
+        self.errors = errors
+        self.dropped = dropped
+        self.pending = pending
+
+
+class BandwidthInfo(AbstractData):
+    __slots__ = ["name", "parent", "rate", "speed", "backlog", "transferred", "weight"]
+
+    def __init__(
+        self,
+        name=None,
+        parent=None,
+        rate=None,
+        speed=None,
+        backlog=None,
+        transferred=None,
+        weight=None,
+    ):
+        self.name = name
+        self.parent = parent
+        self.rate = rate
+        self.speed = speed
+        self.backlog = backlog
+        self.transferred = transferred
+        self.weight = weight
 
 
 class CaptchaTask(AbstractData):
@@ -300,6 +361,45 @@ class PackageData(AbstractData):
         self.fids = fids
 
 
+class QueueChanges(AbstractData):
+    __slots__ = [
+        "version",
+        "reload",
+        "packages",
+        "links",
+        "removed_packages",
+        "removed_links",
+        "order",
+    ]
+
+    def __init__(
+        self,
+        version=None,
+        reload=None,
+        packages=None,
+        links=None,
+        removed_packages=None,
+        removed_links=None,
+        order=None,
+    ):
+        self.version = version
+        self.reload = reload
+        self.packages = packages
+        self.links = links
+        self.removed_packages = removed_packages
+        self.removed_links = removed_links
+        self.order = order
+
+
+class QueuePage(AbstractData):
+    __slots__ = ["version", "total", "packages"]
+
+    def __init__(self, version=None, total=None, packages=None):
+        self.version = version
+        self.total = total
+        self.packages = packages
+
+
 class ServerStatus(AbstractData):
     __slots__ = [
         "pause",
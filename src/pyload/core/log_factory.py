@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import io
 import locale
 import logging
 import logging.handlers
 import os
 import sys
+from array import array
+from bisect import bisect_right
+from collections import deque
 from contextlib import closing
+from itertools import islice
+from threading import Condition, Lock
 
 try:
     import colorlog
@@ -13,6 +19,127 @@ except ImportError:
     colorlog = None
 
 
+class LogTail(logging.Handler):
+    """
+    keeps the latest formatted records in memory, numbered in order of arrival.
+    """
+
+    SIZE = 1000  #: records kept
+
+    def __init__(self, size=SIZE):
+        super().__init__()
+        self.cond = Condition()
+        self.records = deque(maxlen=size)  #: (seq, line)
+        self.seq = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self.cond:
+            self.seq += 1
+            self.records.append((self.seq, line))
+            self.cond.notify_all()
+
+    def read(self, cursor=0):
+        """
+        returns the kept records added after cursor and the new cursor.
+        """
+        with self.cond:
+            first = self.records[0][0] if self.records else self.seq + 1
+            start = max(0, cursor + 1 - first)
+            return [line for seq, line in islice(self.records, start, None)], self.seq
+
+    def wait(self, cursor, timeout):
+        """
+        like `read`, but waits up to timeout seconds for new records first.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > cursor, timeout)
+            return self.read(cursor)
+
+
+class LogIndex:
+    """
+    line numbers and offsets of a log file about every `CHUNK_SIZE` bytes, so reading
+    from a line seeks near it instead of reading the whole file.
+
+    Only the bytes appended since the last read are scanned, a rotated or truncated
+    file is indexed again.
+    """
+
+    CHUNK_SIZE = 64 << 10
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.encoding = encoding
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self, inode=None):
+        self.inode = inode
+        self.numbers = array("Q", [0])  #: line numbers...
+        self.offsets = array("Q", [0])  #: ...and where they start
+        self.lines = 0  #: complete lines indexed
+        self.end = 0  #: offset after the last of them
+        self.scanned = 0  #: bytes looked at
+
+    def update(self, fh):
+        stat = os.fstat(fh.fileno())
+        if stat.st_ino != self.inode or stat.st_size < self.scanned:
+            self.reset(stat.st_ino)
+
+        pos = self.scanned
+        fh.seek(pos)
+        while True:
+            chunk = fh.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+
+            newlines = chunk.count(b"\n")
+            if newlines:
+                self.lines += newlines
+                self.end = pos + chunk.rfind(b"\n") + 1
+                if self.end - self.offsets[-1] >= self.CHUNK_SIZE:
+                    self.numbers.append(self.lines)
+                    self.offsets.append(self.end)
+
+            pos += len(chunk)
+
+        self.scanned = pos
+
+    def count(self):
+        """
+        number of lines in the file.
+        """
+        with self.lock, open(self.path, mode="rb") as fh:
+            self.update(fh)
+            return self.lines + (self.scanned > self.end)
+
+    def read(self, offset=0, limit=None):
+        """
+        returns up to limit lines starting at line offset, a negative offset counts
+        from the end.
+        """
+        with self.lock, open(self.path, mode="rb") as fh:
+            self.update(fh)
+
+            if offset < 0:
+                offset = max(0, self.lines + (self.scanned > self.end) + offset)
+
+            i = bisect_right(self.numbers, offset) - 1
+            fh.seek(self.offsets[i])
+            for n in range(offset - self.numbers[i]):
+                if not fh.readline():
+                    return []
+
+            with io.TextIOWrapper(fh, encoding=self.encoding, errors="replace") as text:
+                return list(islice(text, limit))
+
+
 class LogFactory:
 
     FILE_EXTENSION = ".log"
@@ -46,6 +173,13 @@ class LogFactory:
         self._ = core._
         self.loggers = {}
 
+        #: recent records of all loggers, for the webui
+        self.tail = LogTail()
+        self.tail.setFormatter(
+            logging.Formatter(self.LINEFORMAT, self.DATEFORMAT, self.LINESTYLE)
+        )
+        self.indexes = {}  #: log file path -> LogIndex
+
     def init_logger(self, name):
         logger = logging.getLogger(name)
         self.loggers[name] = logger
@@ -67,6 +201,9 @@ class LogFactory:
         if filelog:
             self._init_filelog_handler(logger)
 
+        if self.tail not in logger.handlers:
+            logger.addHandler(self.tail)
+
     def get_logger(self, name):
         return self.loggers.get(name, self.init_logger(name))
 
@@ -82,6 +219,24 @@ class LogFactory:
             return
         self._init_logger(logger)
 
+    def get_filelog_path(self, name):
+        filelog_folder = self.pyload.config.get("log", "filelog_folder")
+        if not filelog_folder:
+            filelog_folder = os.path.join(self.pyload.userdir, "logs")
+
+        return os.path.join(filelog_folder, name + self.FILE_EXTENSION)
+
+    def get_index(self, name):
+        """
+        returns the line index of the log file of logger name.
+        """
+        path = self.get_filelog_path(name)
+        index = self.indexes.get(path)
+        if index is None:
+            encoding = locale.getpreferredencoding(do_setlocale=False)
+            index = self.indexes.setdefault(path, LogIndex(path, encoding))
+        return index
+
     def _removeHandlers(self, logger):
         for handler in logger.handlers:
             with closing(handler) as hdlr:
@@ -145,18 +300,12 @@ class LogFactory:
         logger.addHandler(sysloghdlr)
 
     def _init_filelog_handler(self, logger):
-        filename = logger.name + self.FILE_EXTENSION
-
-        filelog_folder = self.pyload.config.get("log", "filelog_folder")
-        if not filelog_folder:
-            filelog_folder = os.path.join(self.pyload.userdir, "logs")
-
-        os.makedirs(filelog_folder, exist_ok=True)
+        filelog_path = self.get_filelog_path(logger.name)
+        os.makedirs(os.path.dirname(filelog_path), exist_ok=True)
 
         filelog_form = logging.Formatter(
             self.LINEFORMAT, self.DATEFORMAT, self.LINESTYLE
         )
-        filelog_path = os.path.join(filelog_folder, filename)
 
         encoding = locale.getpreferredencoding(do_setlocale=False)
         if self.pyload.config.get("log", "filelog_rotate"):
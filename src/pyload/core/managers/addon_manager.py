@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 
 
-from functools import wraps
+from collections import defaultdict
+from functools import partial, wraps
 from threading import RLock
 from types import MethodType
 
 from _thread import start_new_thread
 
 from ..threads.addon_thread import AddonThread
+from ..threads.event_bus import EventBus
 from ..utils.struct.lock import lock
 from .plugin_manager import literal_eval
 
@@ -54,8 +56,68 @@ class AddonManager:
     | Notes:
     |    all_downloads_processed is *always* called before all_downloads_finished.
     |    config_changed is *always* called before plugin_config_changed.
+
+    Addons are only called for the hooks they override. Addons overriding nothing
+    but hooks and events get imported when one of them is fired the first time.
+
+    Hooks an addon lists in `__threaded__` and the listeners of the events in
+    `ASYNC_EVENTS` run through the `EventBus`, in the addon's order but without
+    holding up the caller.
     """
 
+    #: hooks called on addons, with the methods to override for them
+    HOOKS = {
+        "download_preparing": ("download_preparing",),
+        "download_finished": ("download_finished",),
+        "download_failed": ("download_failed",),
+        "package_finished": ("package_finished",),
+        "before_reconnecting": ("before_reconnecting", "before_reconnect"),
+        "after_reconnecting": ("after_reconnecting", "after_reconnect"),
+        "captcha_task": ("new_captcha_task", "captcha_task"),
+    }
+
+    #: events addons are registered for by BaseAddon
+    EVENTS = (
+        "all_downloads_finished",
+        "all_downloads_processed",
+        "config_changed",
+        "download_processed",
+        "download_start",
+        "links_added",
+        "package_deleted",
+        "package_failed",
+        "package_processed",
+    )
+
+    #: events nobody waits for, their listeners run in the background;
+    #: the download events stay synchronous, the pyfile is released right after them
+    ASYNC_EVENTS = (
+        "all_downloads_finished",
+        "all_downloads_processed",
+        "package_failed",
+        "package_finished",
+        "package_processed",
+        "after_reconnecting",
+        "pyload_updated",
+        "archive_extracted",
+        "archive_extract_failed",
+        "package_extracted",
+        "package_extract_failed",
+        "all_archives_extracted",
+        "all_archives_processed",
+    )
+
+    #: an addon defining any of these has to be loaded at start
+    EAGER = (
+        "__init__",
+        "init",
+        "activate",
+        "core_ready",
+        "init_events",
+        "periodical_task",
+    )
+    EAGER_DECORATORS = ("expose",)  #: ...or decorating a method with one of these
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
@@ -66,6 +128,11 @@ class AddonManager:
 
         self.events = {}  #: contains events
 
+        self.subscribers = defaultdict(list)  #: hook -> names of addons overriding it
+        self.deferred = {}  #: name -> event listeners of addons not loaded yet
+
+        self.bus = EventBus(self)
+
         # registering callback for config event
         self.pyload.config.plugin_cb = MethodType(
             self.dispatch_event, "plugin_config_changed"
@@ -99,13 +166,20 @@ class AddonManager:
         plugins = []
 
         active = []
+        deferred = []
         deactive = []
 
-        for pluginname in self.pyload.plugin_manager.addon_plugins:
+        for pluginname, info in self.pyload.plugin_manager.addon_plugins.items():
             try:
                 # addon_class = getattr(plugin, plugin.__name__)
 
                 if self.pyload.config.get_plugin(pluginname, "enabled"):
+                    hooks = self.get_deferred_hooks(info)
+                    if hooks is not None:
+                        self.defer(pluginname, hooks)
+                        deferred.append(pluginname)
+                        continue
+
                     plugin_class = self.pyload.plugin_manager.load_class(
                         "addon", pluginname
                     )
@@ -115,6 +189,7 @@ class AddonManager:
                     plugin = plugin_class(self.pyload, self)
                     plugins.append(plugin)
                     self.plugin_map[plugin_class.__name__] = plugin
+                    self.subscribe(plugin)
                     if plugin.is_activated():
                         active.append(plugin_class.__name__)
                 else:
@@ -130,12 +205,124 @@ class AddonManager:
         self.pyload.log.info(
             self._("Activated plugins: {}").format(", ".join(sorted(active)))
         )
+        if deferred:
+            self.pyload.log.info(
+                self._("Plugins activated on demand: {}").format(
+                    ", ".join(sorted(deferred))
+                )
+            )
         self.pyload.log.info(
             self._("Deactivate plugins: {}").format(", ".join(sorted(deactive)))
         )
 
         self.plugins = plugins
 
+    def get_deferred_hooks(self, info):
+        """
+        returns the hooks and events an addon overrides according to its source, None
+        if it has to be loaded right away.
+        """
+        methods = info.get("methods")
+        decorators = info.get("decorators")
+        if methods is None or decorators is None or info.get("bases") != ["BaseAddon"]:
+            return None
+        if any(name in methods for name in self.EAGER) or any(
+            name in decorators for name in self.EAGER_DECORATORS
+        ):
+            return None
+
+        hooks = [
+            hook
+            for hook, names in self.HOOKS.items()
+            if any(name in methods for name in names)
+        ]
+        return hooks + [event for event in self.EVENTS if event in methods]
+
+    @staticmethod
+    def overrides(plugin, name):
+        """
+        checks if the addon class itself defines the method, not `BaseAddon`.
+        """
+        for cls in type(plugin).__mro__:
+            if name in cls.__dict__:
+                return cls.__name__ != "BaseAddon"
+        return False
+
+    def subscribe(self, plugin):
+        name = plugin.__name__
+        for hook, methods in self.HOOKS.items():
+            if name not in self.subscribers[hook] and any(
+                self.overrides(plugin, method) for method in methods
+            ):
+                self.subscribers[hook].append(name)
+
+    def unsubscribe(self, name):
+        for names in self.subscribers.values():
+            if name in names:
+                names.remove(name)
+
+    def defer(self, name, hooks):
+        """
+        subscribes an addon without loading it.
+        """
+        listeners = []
+        for hook in hooks:
+            if hook in self.HOOKS:
+                self.subscribers[hook].append(name)
+            else:
+                func = partial(self._deferred_event, name, hook)
+                self.add_event(hook, func)
+                listeners.append((hook, func))
+        self.deferred[name] = listeners
+
+    @lock
+    def load_deferred(self, name):
+        """
+        loads and activates an addon on its first hook.
+        """
+        listeners = self.deferred.pop(name, None)
+        if listeners is None:
+            return self.plugin_map.get(name)
+
+        for event, func in listeners:
+            self.remove_event(event, func)
+
+        try:
+            plugin_class = self.pyload.plugin_manager.load_class("addon", name)
+            plugin = plugin_class(self.pyload, self)
+            plugin.core_ready()
+
+        except Exception:
+            self.pyload.log.warning(
+                self._("Failed activating {}").format(name),
+                exc_info=self.pyload.debug > 1,
+                stack_info=self.pyload.debug > 2,
+            )
+            self.unsubscribe(name)
+            return None
+
+        self.pyload.log.debug(f"Plugin loaded: {name}")
+        self.plugins.append(plugin)
+        self.plugin_map[plugin_class.__name__] = plugin
+        self.subscribe(plugin)
+        return plugin
+
+    def _deferred_event(self, name, event, *args):
+        plugin = self.load_deferred(name)
+        if plugin is not None:
+            getattr(plugin, event)(*args)
+
+    def get_subscribers(self, hook, activated=True):
+        """
+        returns the addons overriding hook, only the activated ones by default.
+        """
+        plugins = []
+        for name in list(self.subscribers.get(hook, ())):
+            plugin = self.plugin_map.get(name) or self.load_deferred(name)
+            if plugin is not None and (plugin.is_activated() or not activated):
+                plugins.append(plugin)
+        return plugins
+
     def manage_addons(self, plugin, name, value):
         if name == "enabled" and value:
             self.activate_addon(plugin)
@@ -145,6 +332,8 @@ class AddonManager:
     def activate_addon(self, plugin):
 
         # check if already loaded
+        if plugin in self.deferred:
+            return
         for inst in self.plugins:
             if inst.__name__ == plugin:
                 return
@@ -159,12 +348,19 @@ class AddonManager:
         plugin = plugin_class(self.pyload, self)
         self.plugins.append(plugin)
         self.plugin_map[plugin_class.__name__] = plugin
+        self.subscribe(plugin)
 
         # call core Ready
         start_new_thread(plugin.core_ready, tuple())
 
     def deactivate_addon(self, plugin):
 
+        if plugin in self.deferred:
+            for event, func in self.deferred.pop(plugin):
+                self.remove_event(event, func)
+            self.unsubscribe(plugin)
+            return
+
         addon = None
         for inst in self.plugins:
             if inst.__name__ == plugin:
@@ -181,6 +377,7 @@ class AddonManager:
         res = self.pyload.scheduler.remove_job(addon.cb)
         self.pyload.log.debug(f"Removed callback {res}")
         self.plugins.remove(addon)
+        self.unsubscribe(addon.__name__)
         del self.plugin_map[addon.__name__]
 
     @try_catch
@@ -198,64 +395,69 @@ class AddonManager:
                 plugin.core_exiting()
 
         self.dispatch_event("core_exiting")
+        self.bus.stop()
+
+    def run_hook(self, plugin, hook, *args):
+        """
+        calls the hook of an addon, in the background if it is threaded.
+        """
+        func = getattr(plugin, hook)
+        if hook in plugin.__threaded__:
+            self.post(plugin.__name__, hook, func, *args)
+        else:
+            self.bus.call(plugin.__name__, hook, func, *args)
 
     @lock
     def download_preparing(self, pyfile):
-        for plugin in self.plugins:
-            if plugin.is_activated():
-                plugin.download_preparing(pyfile)
+        for plugin in self.get_subscribers("download_preparing"):
+            self.run_hook(plugin, "download_preparing", pyfile)
 
         self.dispatch_event("download_preparing", pyfile)
 
     @lock
     def download_finished(self, pyfile):
-        for plugin in self.plugins:
-            if plugin.is_activated():
-                if "download_finished" in plugin.__threaded__:
-                    self.start_thread(plugin.download_finished, pyfile)
-                else:
-                    plugin.download_finished(pyfile)
+        for plugin in self.get_subscribers("download_finished"):
+            self.run_hook(plugin, "download_finished", pyfile)
 
         self.dispatch_event("download_finished", pyfile)
 
     @lock
     @try_catch
     def download_failed(self, pyfile):
-        for plugin in self.plugins:
-            if plugin.is_activated():
-                if "download_failed" in plugin.__threaded__:
-                    self.start_thread(plugin.download_finished, pyfile)
-                else:
-                    plugin.download_failed(pyfile)
+        for plugin in self.get_subscribers("download_failed"):
+            self.run_hook(plugin, "download_failed", pyfile)
 
         self.dispatch_event("download_failed", pyfile)
 
     @lock
     def package_finished(self, package):
-        for plugin in self.plugins:
-            if plugin.is_activated():
-                if "package_finished" in plugin.__threaded__:
-                    self.start_thread(plugin.package_finished, package)
-                else:
-                    plugin.package_finished(package)
+        for plugin in self.get_subscribers("package_finished"):
+            self.run_hook(plugin, "package_finished", package)
 
         self.dispatch_event("package_finished", package)
 
     @lock
     def before_reconnecting(self, ip):
-        for plugin in self.plugins:
-            plugin.before_reconnecting(ip)
+        #: called on deactivated addons as well, as it always was
+        for plugin in self.get_subscribers("before_reconnecting", activated=False):
+            self.run_hook(plugin, "before_reconnecting", ip)
 
         self.dispatch_event("before_reconnecting", ip)
 
     @lock
     def after_reconnecting(self, ip):
-        for plugin in self.plugins:
-            if plugin.is_activated():
-                plugin.after_reconnecting(ip)
+        for plugin in self.get_subscribers("after_reconnecting"):
+            self.run_hook(plugin, "after_reconnecting", ip)
 
         self.dispatch_event("after_reconnecting", ip)
 
+    def captcha_task(self, task):
+        for plugin in self.get_subscribers("captcha_task"):
+            try:
+                self.run_hook(plugin, "new_captcha_task", task)
+            except Exception:
+                pass
+
     def start_thread(self, function, *args, **kwargs):
         return AddonThread(self.pyload.thread_manager, function, args, kwargs)
 
@@ -301,14 +503,40 @@ class AddonManager:
             if func in self.events[event]:
                 self.events[event].remove(func)
 
+    @staticmethod
+    def get_owner(func):
+        """
+        name of the addon an event listener belongs to.
+        """
+        if isinstance(func, partial):  #: listener of a deferred addon
+            return func.args[0]
+        owner = getattr(func, "__self__", None)
+        name = getattr(owner, "__name__", None)
+        if isinstance(name, str):
+            return name
+        return getattr(func, "__qualname__", repr(func))
+
+    def post(self, owner, hook, func, *args):
+        """
+        queues func on the bus, without waiting for room while holding the lock.
+        """
+        #: every other hook call would wait on the lock meanwhile
+        wait = not self.lock._is_owned()
+        return self.bus.post(owner, hook, func, *args, wait=wait)
+
     def dispatch_event(self, event, *args):
         """
         dispatches event with args.
         """
         if event in self.events:
-            for f in self.events[event]:
+            background = event in self.ASYNC_EVENTS
+            for f in list(self.events[event]):
+                owner = self.get_owner(f)
+                if background:
+                    self.post(owner, event, f, *args)
+                    continue
                 try:
-                    f(*args)
+                    self.bus.call(owner, event, f, *args)
                 except Exception as exc:
                     self.pyload.log.warning(
                         self._("Error calling event handler {}: {}, {}, {}").format(
@@ -317,3 +545,13 @@ class AddonManager:
                         exc_info=self.pyload.debug > 1,
                         stack_info=self.pyload.debug > 2,
                     )
+
+    def get_hook_stats(self):
+        """
+        returns (owner, hook, calls, seconds, max seconds, errors, dropped, pending) of
+        every hook and listener called so far.
+        """
+        return [
+            (owner, hook, *stats, self.bus.pending(owner))
+            for (owner, hook), stats in sorted(self.bus.get_stats().items())
+        ]
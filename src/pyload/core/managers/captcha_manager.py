@@ -47,11 +47,7 @@ class CaptchaManager:
         # if cli:  #: Client connected -> should solve the captcha
         #     task.set_waiting(50)  #: Wait minimum 50 sec for response
 
-        for plugin in self.pyload.addon_manager.active_plugins():
-            try:
-                plugin.new_captcha_task(task)
-            except Exception:
-                pass
+        self.pyload.addon_manager.captcha_task(task)
 
         if task.handler or cli:  #: The captcha was handled
             self.tasks.append(task)
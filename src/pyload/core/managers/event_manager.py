@@ -1,63 +1,111 @@
 # -*- coding: utf-8 -*-
 
 import time
-
-from ..utils.purge import uniquify
+from collections import deque
+from itertools import islice
+from threading import Condition
 
 
 class EventManager:
+    """
+    keeps the latest events in a ring buffer, clients read them from their own cursor.
+
+    An event repeating one still in the buffer (e.g. another update of the same
+    file) supersedes it, so a client gets every change once, however often it
+    happened since its last read. Clients falling behind the buffer are told to
+    reload everything.
+
+    Sequence numbers start at the microseconds since the epoch, so a cursor kept
+    from an earlier run is always behind the buffer and gets the reload as well.
+    """
+
+    BUFFER_SIZE = 2000  #: events kept for clients to catch up
+    CLIENT_TIMEOUT = 30  #: seconds a polling client is remembered
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
-        self.clients = []
+
+        self.lock = Condition()  #: notified on every new event
+        self.events = deque()  #: (seq, event as tuple)
+        self.latest = {}  #: event -> seq of its latest occurrence
+        self.seq = int(time.time() * 1000000)  #: unique to this run
+        self.clients = {}  #: uuid -> Client
 
     def new_client(self, uuid):
-        self.clients.append(Client(uuid))
+        self.clients[uuid] = Client(uuid, self.seq)
 
     def clean(self):
-        for n, client in enumerate(self.clients):
-            if client.last_active + 30 < time.time():
-                del self.clients[n]
+        deadline = time.time() - self.CLIENT_TIMEOUT
+        for uuid, client in list(self.clients.items()):
+            if client.last_active < deadline:
+                del self.clients[uuid]
 
     def get_events(self, uuid):
-        events = []
-        valid_uuid = False
-        for client in self.clients:
-            if client.uuid == uuid:
-                client.last_active = time.time()
-                valid_uuid = True
-                while client.new_events():
-                    events.append(client.pop_event().to_list())
-                break
-        if not valid_uuid:
-            self.new_client(uuid)
+        with self.lock:
+            client = self.clients.get(uuid)
+            if client is None:
+                self.clean()
+                self.new_client(uuid)
+                return [
+                    ReloadAllEvent("queue").to_list(),
+                    ReloadAllEvent("collector").to_list(),
+                ]
+
+            client.last_active = time.time()
+            events, client.cursor = self.read(client.cursor)
+            return events
+
+    def add_event(self, event):
+        key = tuple(event.to_list())
+        with self.lock:
+            if len(self.events) >= self.BUFFER_SIZE:
+                seq, old = self.events.popleft()
+                if self.latest.get(old) == seq:
+                    del self.latest[old]
+
+            self.seq += 1
+            self.events.append((self.seq, key))
+            self.latest[key] = self.seq
+            self.lock.notify_all()
+
+    def read(self, cursor):
+        """
+        returns the events added after cursor, each just once, and the new cursor.
+        """
+        with self.lock:
+            first = self.events[0][0] if self.events else self.seq + 1
+            #: missed some, or not a cursor of this run
+            if cursor + 1 < first or cursor > self.seq:
+                return (
+                    [
+                        ReloadAllEvent("queue").to_list(),
+                        ReloadAllEvent("collector").to_list(),
+                    ],
+                    self.seq,
+                )
+
             events = [
-                ReloadAllEvent("queue").to_list(),
-                ReloadAllEvent("collector").to_list(),
+                list(key)
+                for seq, key in islice(self.events, cursor + 1 - first, None)
+                if self.latest[key] == seq
             ]
-        return uniquify(events)  # return uniquify(events, repr)
+            return events, self.seq
 
-    def add_event(self, event):
-        for client in self.clients:
-            client.add_event(event)
+    def wait(self, cursor, timeout):
+        """
+        like `read`, but waits up to timeout seconds for events after cursor first.
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: self.seq != cursor, timeout)
+            return self.read(cursor)
 
 
 class Client:
-    def __init__(self, uuid):
+    def __init__(self, uuid, cursor=0):
         self.uuid = uuid
         self.last_active = time.time()
-        self.events = []
-
-    def new_events(self):
-        return len(self.events) > 0
-
-    def pop_event(self):
-        if not len(self.events):
-            return None
-        return self.events.pop(0)
-
-    def add_event(self, event):
-        self.events.append(event)
+        self.cursor = cursor  #: seq of the last event read
 
 
 class UpdateEvent:
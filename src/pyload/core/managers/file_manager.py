@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
-from threading import RLock
+import heapq
+from threading import Lock, RLock
 
+from ..database.file_database import COLLECTOR_PLUGINS, JOB_STATUS
 from ..datatypes.enums import Destination
 from ..utils.struct.lock import lock
 from .event_manager import InsertEvent, ReloadAllEvent, RemoveEvent, UpdateEvent
@@ -13,6 +15,8 @@ def change(func):
         self.filecount = -1
         self.queuecount = -1
         self.job_cache = {}
+        with self.ready_lock:
+            self.ready = None
         return func(self, *args)
 
     return new
@@ -56,6 +60,12 @@ class FileManager:
 
         self.job_cache = {}
 
+        #: links a download can be started for, kept up to date on status changes and
+        #: reloaded after anything else changed, see `get_job`
+        self.ready = None  #: plugin -> heap of (packageorder, linkorder, id)
+        self.ready_keys = {}  #: id -> (plugin, heap entry), entries not in here are stale
+        self.ready_lock = Lock()
+
         self.lock = RLock()  # TODO: should be a Lock w/o R
         # self.lock._Verbose__verbose = True
 
@@ -121,6 +131,120 @@ class FileManager:
 
         return packs
 
+    @lock
+    def get_page(self, queue=Destination.QUEUE, offset=0, limit=-1):
+        """
+        gets limit packages of the queue starting at offset, with their links.
+
+        :return: queue version the data reflects, number of packages, packages
+        """
+        version = self.pyload.event_manager.seq
+        total = len(self.pyload.db.get_package_order(queue.value))
+        packs = self.pyload.db.get_all_packages(queue.value, offset, limit)
+        self._load_links(packs)
+        return version, total, packs
+
+    @lock
+    def get_changes(self, version, queue=Destination.QUEUE):
+        """
+        gets what changed in the queue since version.
+
+        Changed packages come without links, inserted or moved ones with all of
+        them. `order` lists the package ids if packages were added, moved or
+        removed. `reload` is set when version is too old and the queue has to be
+        loaded again.
+        """
+        destination = "queue" if queue == Destination.QUEUE else "collector"
+        events, new_version = self.pyload.event_manager.read(version)
+        changes = {
+            "version": new_version,
+            "reload": False,
+            "packages": {},
+            "links": {},
+            "removed_packages": [],
+            "removed_links": [],
+            "order": None,
+        }
+
+        changed = {}  #: (type, id) -> last change
+        for event in events:
+            if event[0] == "reload" and event[1] == destination:
+                changes["reload"] = True
+                return changes
+            if event[0] not in ("update", "remove", "insert"):
+                continue
+            if event[1] != destination:
+                continue
+            key = (event[2], event[3])
+            if event[0] != "update" or changed.get(key) != "insert":
+                changed[key] = event[0]
+
+        existing = [key for key, name in changed.items() if name != "remove"]
+        packs = self.pyload.db.get_packages_by_id(
+            [id for itype, id in existing if itype == "pack"]
+        )
+        links = self.pyload.db.get_links_by_id(
+            [id for itype, id in existing if itype == "file"]
+        )
+
+        #: moving a link changes the order of all others in its package
+        moved = {
+            links[id]["package"]
+            for (itype, id), name in changed.items()
+            if itype == "file" and name == "insert" and id in links
+        }
+        if moved:
+            links.update(self.pyload.db.get_links_by_package(list(moved)))
+
+        for x in self.package_cache.values():
+            if x.id in packs:
+                packs[x.id].update(x.to_dict()[x.id])
+        for x in self.cache.values():
+            if x.id in links:
+                links[x.id] = x.to_db_dict()[x.id]
+
+        full = {}  #: packages sent with all links
+        for (itype, id), name in changed.items():
+            if itype == "pack":
+                if id in packs and packs[id]["queue"] == queue.value:
+                    changes["packages"][id] = packs[id]
+                    if name == "insert":
+                        full[id] = packs[id]
+                    else:
+                        packs[id]["links"] = None
+                else:
+                    changes["removed_packages"].append(id)
+
+                if name != "update":
+                    changes["order"] = True
+
+            elif id not in links:
+                changes["removed_links"].append(id)
+
+        changes["links"] = links
+
+        self._load_links(full)
+        if changes["order"]:
+            changes["order"] = self.pyload.db.get_package_order(queue.value)
+
+        return changes
+
+    def _load_links(self, packs):
+        """
+        adds their links to packages loaded from the db.
+        """
+        links = self.pyload.db.get_links_by_package(list(packs))
+        for x in self.package_cache.values():
+            if x.id in packs:
+                packs[x.id].update(x.to_dict()[x.id])
+        for x in self.cache.values():
+            if x.packageid in packs:
+                links[x.id] = x.to_db_dict()[x.id]
+
+        for key, value in links.items():
+            if value["package"] in packs:
+                packs[value["package"]]["links"][key] = value
+
     @lock
     @change
     def add_links(self, urls, package):
@@ -251,8 +375,11 @@ class FileManager:
         """
         self.pyload.db.update_link(pyfile)
 
+        package = pyfile.package()
+        self._update_ready(pyfile, package)
+
         e = UpdateEvent(
-            "file", pyfile.id, "collector" if not pyfile.package().queue else "queue"
+            "file", pyfile.id, "collector" if not package.queue else "queue"
         )
         self.pyload.event_manager.add_event(e)
 
@@ -323,48 +450,70 @@ class FileManager:
             return self.pyload.db.get_file(id)
 
     # ----------------------------------------------------------------------
+    def _push_ready(self, id, plugin, entry):
+        if self.ready_keys.get(id) != (plugin, entry):
+            self.ready_keys[id] = (plugin, entry)
+            heapq.heappush(self.ready.setdefault(plugin, []), entry)
+
+    def _load_ready(self):
+        with self.ready_lock:
+            self.ready = {}
+            self.ready_keys = {}
+            for id, plugin, packageorder, linkorder in self.pyload.db.get_ready_links():
+                self._push_ready(id, plugin, (packageorder, linkorder, id))
+
+    def _update_ready(self, pyfile, package):
+        """
+        adds or removes the link from the ready queue according to its status.
+        """
+        with self.ready_lock:
+            if self.ready is None:
+                return
+
+            if package and pyfile.status in JOB_STATUS and (
+                package.queue or pyfile.pluginname in COLLECTOR_PLUGINS
+            ):
+                entry = (package.order, pyfile.order, pyfile.id)
+                self._push_ready(pyfile.id, pyfile.pluginname, entry)
+            else:
+                self.ready_keys.pop(pyfile.id, None)
+
+    def requeue_job(self, pyfile):
+        """
+        puts a job back that could not be started.
+        """
+        package = pyfile.package()
+        with self.ready_lock:
+            if self.ready is not None and package:
+                entry = (package.order, pyfile.order, pyfile.id)
+                self._push_ready(pyfile.id, pyfile.pluginname, entry)
+
     @lock
     def get_job(self, occ):
         """
-        get suitable job.
+        get suitable job, the first link in queue order not using an occupied plugin.
+
+        Links of the plugins processed in the collector are always suitable.
         """
-        # TODO: clean mess
-        # TODO: improve selection of valid jobs
+        if self.ready is None:
+            self._load_ready()
 
-        if occ in self.job_cache:
-            if self.job_cache[occ]:
-                id = self.job_cache[occ].pop()
-                if id == "empty":
-                    pyfile = None
-                    self.job_cache[occ].append("empty")
-                else:
-                    pyfile = self.get_file(id)
-            else:
-                jobs = self.pyload.db.get_job(occ)
-                jobs.reverse()
-                if not jobs:
-                    self.job_cache[occ].append("empty")
-                    pyfile = None
-                else:
-                    self.job_cache[occ].extend(jobs)
-                    pyfile = self.get_file(self.job_cache[occ].pop())
+        best = None
+        with self.ready_lock:
+            for plugin, heap in list(self.ready.items()):
+                if plugin in occ and plugin not in COLLECTOR_PLUGINS:
+                    continue
 
-        else:
-            self.job_cache = {}  #: better not caching to much
-            jobs = self.pyload.db.get_job(occ)
-            jobs.reverse()
-            self.job_cache[occ] = jobs
-
-            if not jobs:
-                self.job_cache[occ].append("empty")
-                pyfile = None
-            else:
-                pyfile = self.get_file(self.job_cache[occ].pop())
+                #: drop entries of links changed since they were pushed
+                while heap and self.ready_keys.get(heap[0][2]) != (plugin, heap[0]):
+                    heapq.heappop(heap)
 
-            # TODO: maybe the new job has to be approved...
+                if not heap:
+                    del self.ready[plugin]
+                elif best is None or heap[0] < best:
+                    best = heap[0]
 
-        # pyfile = self.get_file(self.job_cache[occ].pop())
-        return pyfile
+        return self.get_file(best[2]) if best else None
 
     @lock
     def get_decrypt_job(self):
@@ -377,7 +526,6 @@ class FileManager:
         plugins = list(self.pyload.plugin_manager.crypter_plugins.keys()) + list(
             self.pyload.plugin_manager.container_plugins.keys()
         )
-        plugins = str(tuple(plugins))
 
         jobs = self.pyload.db.get_plugin_job(plugins)
         if jobs:
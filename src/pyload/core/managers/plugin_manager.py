@@ -1,16 +1,315 @@
 # -*- coding: utf-8 -*-
 
 import importlib
+import json
 import os
 import re
 import sys
 from ast import literal_eval
-from itertools import chain
+from collections import defaultdict, namedtuple
 
 # import semver
 
 from pyload import APPID, PKGDIR
 
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+class URLMatcher:
+    """
+    finds the first plugin whose pattern matches an url, without trying all of them.
+
+    Every pattern is expanded into its literal skeletons, from each one a word is
+    taken every match has to contain as a whole token, e.g. `uploaded` for
+    `uploaded.net/file/...` urls. An url is only tried against the patterns
+    indexed under one of its own tokens, plus the few nothing could be taken from,
+    in the original order, so the result is the same as trying all of them.
+
+    Multi-hoster plugins list the domains they handle besides, see
+    `PluginManager.set_domains`. Their pattern matches any url with one of the
+    domains in its first line, e.g. redirector urls too, so the domains are looked
+    for as substrings instead: each one by its first label, at every dot of the
+    url. Their own pattern is indexed like any other.
+    """
+
+    WILDCARD = "\0"  #: stands for anything in a skeleton
+    END = "\1"  #: end of the string, or before a final newline
+    MAX_VARIANTS = 256  #: skeletons per pattern, more are not worth indexing
+    MAX_CLASS = 8  #: character sets up to this size are expanded
+    COMMON = {"http", "https", "ftp", "www", "com", "net", "org", "file", "files"}
+
+    _TOKEN = re.compile(r"[a-z0-9]+")
+    _SPECIAL = re.compile(r"[\\^$*+?{}\[\]|()\n]")  #: not literal in a pattern
+    _NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+    _EMPTY = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+    _REPEAT = tuple(
+        getattr(sre_parse, name)
+        for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+        if hasattr(sre_parse, name)
+    )
+
+    #: everything `find` looks at, replaced as a whole so a rebuild running in
+    #: another thread never mixes two generations
+    State = namedtuple(
+        "State", "entries index unindexed multi bases labels lengths plain keys"
+    )
+
+    def __init__(self, *plugins, tokens=None):
+        self.sources = plugins  #: plugin dicts in the order they are tried
+        self.tokens = {} if tokens is None else tokens  #: tokens by pattern, cached
+        self.build()
+
+    entries = property(lambda self: self.state.entries)
+    index = property(lambda self: self.state.index)
+    unindexed = property(lambda self: self.state.unindexed)
+    multi = property(lambda self: self.state.multi)
+    keys = property(lambda self: self.state.keys)  #: patterns of the plugins in `tokens`
+
+    def build(self):
+        entries = [
+            (name, value, value.get("re"))
+            for plugins in self.sources
+            for name, value in plugins.items()
+        ]
+        index = defaultdict(list)
+        unindexed = []
+        multi = {}  #: id of the plugin dict -> entry, of the ones with domains
+        bases = {}  #: entry -> own pattern, tried instead of the full one
+        labels = defaultdict(list)  #: first label of a domain -> (rest, entry)
+        plain = []  #: (domain without a dot, entry)
+        keys = set()
+
+        for i, (name, value, regex) in enumerate(entries):
+            if regex is None:
+                continue  #: invalid pattern, never matches
+
+            domains = value.get("domains")
+            if domains:
+                multi[id(value)] = i
+                if any(self._SPECIAL.search(domain) for domain in domains):
+                    unindexed.append(i)  #: not plain substrings, keep the full one
+                    continue
+
+                for domain in domains:
+                    label, dot, rest = domain.partition(".")
+                    if dot:
+                        labels[label].append((dot + rest, i))
+                    else:
+                        plain.append((domain, i))
+
+                regex = bases[i] = value.get("base_re")
+                if regex is None:
+                    continue
+
+            keys.add(self._key(regex))
+            tokens = self.get_tokens(regex)
+            if tokens is None:
+                unindexed.append(i)
+            else:
+                for token in tokens:
+                    index[token].append(i)
+
+        lengths = sorted({len(label) for label in labels})
+        self.state = self.State(
+            entries, index, unindexed, multi, bases, labels, lengths, plain, keys
+        )
+
+    def check(self):
+        """
+        rebuilds the index if a plugin was added, removed or got a new pattern.
+        """
+        entries = self.state.entries
+        values = [value for plugins in self.sources for value in plugins.values()]
+        if len(values) != len(entries) or any(
+            value is not entry[1] or value.get("re") is not entry[2]
+            for value, entry in zip(values, entries)
+        ):
+            self.build()
+
+    def find(self, url):
+        """
+        returns (name, plugin dict) of the first matching plugin or None.
+        """
+        state = self.state
+        entries = state.entries
+        direct = ()  #: multi-hosters with one of their domains in the url
+        bases = {}
+        if isinstance(url, str) and not self._NON_ASCII.search(url):
+            lower = url.lower()
+            candidates = set(state.unindexed)
+            for token in set(self._TOKEN.findall(lower)):
+                candidates.update(state.index.get(token, ()))
+
+            if state.multi:
+                direct = self._find_domains(state, url)
+                candidates.update(direct)
+                bases = state.bases
+
+            candidates = sorted(candidates)
+        else:
+            candidates = range(len(entries))
+
+        for i in candidates:
+            name, value, regex = entries[i]
+            regex = bases.get(i, regex)
+            if i in direct or regex is not None and regex.match(url):
+                return name, value
+        return None
+
+    def match(self, value, url):
+        """
+        checks the pattern of a plugin dict against url, multi-hosters are looked up
+        by their domains first.
+        """
+        state = self.state
+        i = state.multi.get(id(value))
+        if (
+            i is None
+            or i not in state.bases
+            or state.entries[i][1] is not value
+            or not isinstance(url, str)
+            or self._NON_ASCII.search(url)
+        ):
+            return value["re"].match(url) is not None
+
+        if i in self._find_domains(state, url):
+            return True
+        base = state.bases[i]
+        return base is not None and base.match(url) is not None
+
+    @staticmethod
+    def _find_domains(state, url):
+        """
+        entries with one of their domains in the first line of url, exactly what
+        their `.*(domain|...).*` pattern matches.
+        """
+        line = url.partition("\n")[0]
+        found = {i for domain, i in state.plain if domain in line}
+
+        labels = state.labels
+        p = line.find(".")
+        while p != -1:
+            for size in state.lengths:
+                if size > p:
+                    break
+                for rest, i in labels.get(line[p - size : p], ()):
+                    if i not in found and line.startswith(rest, p):
+                        found.add(i)
+            p = line.find(".", p + 1)
+
+        return found
+
+    def get_tokens(self, regex):
+        """
+        tokens one of which every match contains, None if there are no such tokens.
+        """
+        key = self._key(regex)
+        if key not in self.tokens:
+            tokens = self._find_tokens(regex)
+            self.tokens[key] = None if tokens is None else sorted(tokens)
+        return self.tokens[key]
+
+    @staticmethod
+    def _key(regex):
+        return f"{regex.flags}:{regex.pattern}"
+
+    def _find_tokens(self, regex):
+        try:
+            variants = self._expand(sre_parse.parse(regex.pattern, regex.flags))
+        except Exception:
+            return None
+        if variants is None:
+            return None
+
+        tokens = set()
+        for variant in variants:
+            token = self._pick_token(variant)
+            if token is None:
+                return None
+            tokens.add(token)
+        return tokens
+
+    def _pick_token(self, variant):
+        W = self.WILDCARD
+        # non ascii chars may match ascii ones ignoring case, consider them unknown
+        variant = self._NON_ASCII.sub(W, variant).lower()
+
+        best = None
+        for m in self._TOKEN.finditer(variant):
+            start, end = m.span()
+            # the token must be delimited by literals on both sides, the start of the
+            # match counts as delimiter too, its end does not
+            if start and variant[start - 1] == W:
+                continue
+            if end == len(variant) or variant[end] == W:
+                continue
+            token = m.group()
+            if best is None or (best in self.COMMON, len(token)) > (
+                token in self.COMMON,
+                len(best),
+            ):
+                best = token
+        return best
+
+    def _expand(self, items):
+        variants = [""]
+        for op, av in items:
+            alts = self._expand_node(op, av)
+            variants = [v + a for v in variants for a in alts]
+            if len(variants) > self.MAX_VARIANTS:
+                return None
+        return variants
+
+    def _expand_node(self, op, av):
+        W = self.WILDCARD
+
+        if op == sre_parse.LITERAL:
+            return [chr(av)]
+
+        elif op == sre_parse.AT and av in (sre_parse.AT_END, sre_parse.AT_END_STRING):
+            return [self.END]
+
+        elif op in self._EMPTY:
+            return [""]  #: zero width, ignoring what it asserts only widens the index
+
+        elif op == sre_parse.IN:
+            if len(av) <= self.MAX_CLASS and all(o == sre_parse.LITERAL for o, a in av):
+                return [chr(a) for o, a in av]
+            return [W]
+
+        elif op == sre_parse.SUBPATTERN:
+            return self._expand(av[-1]) or [W]
+
+        elif op == getattr(sre_parse, "ATOMIC_GROUP", None):
+            return self._expand(av) or [W]
+
+        elif op == sre_parse.BRANCH:
+            alts = []
+            for item in av[1]:
+                sub = self._expand(item)
+                if sub is None:
+                    return [W]
+                alts.extend(sub)
+            return alts if len(alts) <= self.MAX_VARIANTS else [W]
+
+        elif op in self._REPEAT:
+            lo, hi, item = av
+            sub = self._expand(item) or [W]
+            if lo == 0:
+                return [""] + (sub if hi == 1 else [s + W for s in sub])
+            if lo > 3 or len(sub) ** lo > self.MAX_VARIANTS:
+                return [W]
+            alts = [""]
+            for n in range(lo):
+                alts = [a + s for a in alts for s in sub]
+            return alts if hi == lo else [a + W for a in alts]
+
+        return [W]
+
 
 class PluginManager:
     ROOT = "pyload.plugins."
@@ -31,12 +330,22 @@ class PluginManager:
     # _PYLOAD_VERSION = re.compile(r'\s*__pyload_version__\s*=\s*(?:"|\')([\d.]+)')
     _CONFIG = re.compile(r"\s*__config__\s*=\s*(\[[^\]]+\])", re.MULTILINE)
     _DESC = re.compile(r'\s*__description__\s*=\s*(?:"|"""|\')([^"\']+)', re.MULTILINE)
+    _CLASS = re.compile(r"^class (\w+)\(([^)]*)\)", re.MULTILINE)
+    _METHOD = re.compile(r"^    def (\w+)", re.MULTILINE)
+    _DECORATOR = re.compile(r"^    @(\w+)", re.MULTILINE)
+
+    INDEX_FORMAT = 3  #: bump when the metadata taken from plugin files changes
 
     def __init__(self, core):
         self.pyload = core
         self._ = core._
 
         self.plugins = {}
+
+        #: metadata of the plugin files by path, saved between runs
+        self.index_cache_path = os.path.join(core.userdir, "data", "plugin_index.json")
+        self.load_index_cache()
+
         self.create_index()
 
         # save generated config
@@ -66,6 +375,9 @@ class PluginManager:
 
         self.pyload.log.debug("Indexing plugins...")
 
+        self.index_paths = set()
+        self.index_stats = [0, 0]
+
         sys.path.append(os.path.join(self.pyload.userdir, "plugins"))
 
         userplugins_dir = os.path.join(self.pyload.userdir, "plugins")
@@ -109,6 +421,14 @@ class PluginManager:
         self.plugins["base"] = self.internal_plugins
         merge(default_config, config)
 
+        self.url_matcher = URLMatcher(
+            self.crypter_plugins,
+            self.hoster_plugins,
+            self.container_plugins,
+            tokens=self.index_tokens,
+        )
+        self.save_index_cache(self.index_paths)
+
         for name, config in default_config.items():
             desc = config.pop("desc", "")
             config = [[k] + list(v) for k, v in config.items()]
@@ -150,45 +470,12 @@ class PluginManager:
                 os.path.isfile(os.path.join(pfolder, entry)) and entry.endswith(".py")
             ) and not entry.startswith("_"):
 
-                with open(os.path.join(pfolder, entry)) as data:
-                    content = data.read()
-
                 name = entry[:-3]
                 if name[-1] == ".":
                     name = name[:-4]
 
-                # m_pyver = self._PYLOAD_VERSION.search(content)
-                # if m_pyver is None:
-                #     self.pyload.log.debug(
-                #         f"__pyload_version__ not found in plugin {name}"
-                #     )
-                # else:
-                #     pyload_version = m_pyver.group(1)
-
-                #     requires_version = f"{pyload_version}.0"
-                #     requires_version_info = semver.parse_version_info(requires_version)
-
-                #     if self.pyload.version_info.major:
-                #         core_version = self.pyload.version_info.major
-                #         plugin_version = requires_version_info.major
-                #     else:
-                #         core_version = self.pyload.version_info.minor
-                #         plugin_version = requires_version_info.minor
-
-                #     if core_version > plugin_version:
-                #         self.pyload.log.warning(
-                #             self._(
-                #                 "Plugin {} not compatible with current pyLoad version"
-                #             ).format(name)
-                #         )
-                #         continue
-
-                m_ver = self._VERSION.search(content)
-                if m_ver is None:
-                    self.pyload.log.debug(f"__version__ not found in plugin {name}")
-                    version = 0
-                else:
-                    version = float(m_ver.group(1))
+                info = self.parse_file(os.path.join(pfolder, entry), name, pattern)
+                version = info["version"]
 
                 # home contains plugins from pyload root
                 if isinstance(home, dict) and name in home:
@@ -206,40 +493,36 @@ class PluginManager:
                 plugins[name]["folder"] = folder
 
                 if pattern:
-                    m_pat = self._PATTERN.search(content)
-                    pattern = r"^unmachtable$" if m_pat is None else m_pat.group(1)
-
-                    plugins[name]["pattern"] = pattern
+                    plugins[name]["pattern"] = info["pattern"]
 
                     try:
-                        plugins[name]["re"] = re.compile(pattern)
+                        plugins[name]["re"] = re.compile(info["pattern"])
                     except Exception:
                         self.pyload.log.error(
                             self._("{} has a invalid pattern").format(name)
                         )
 
+                if folder == "addons":
+                    plugins[name]["bases"] = info["bases"]
+                    plugins[name]["methods"] = info["methods"]
+                    plugins[name]["decorators"] = info["decorators"]
+
                 # internals have no config
                 if folder == "base":
                     self.pyload.config.delete_config(name)
                     continue
 
-                m_desc = self._DESC.search(content)
-                desc = "" if m_desc is None else m_desc.group(1)
-
-                config = self._CONFIG.findall(content)
-                if not config:
+                desc = info["desc"]
+                config = info["config"]
+                if config is None:
                     new_config = {"enabled": ["bool", "Activated", False], "desc": desc}
                     configs[name] = new_config
                     continue
 
-                config = literal_eval(
-                    config[0].strip().replace("\n", "").replace("\r", "")
-                )
-
                 if isinstance(config, list) and all(
-                    isinstance(c, tuple) for c in config
+                    isinstance(c, (tuple, list)) for c in config
                 ):
-                    config = {x[0]: x[1:] for x in config}
+                    config = {x[0]: list(x[1:]) for x in config}
                 else:
                     self.pyload.log.error(
                         self._("Invalid config in {}: {}").format(name, config)
@@ -259,6 +542,159 @@ class PluginManager:
 
         return plugins, configs
 
+    def parse_file(self, path, name, pattern=False):
+        """
+        returns the metadata of a plugin file, taken from the index cache as long as
+        the file was not modified.
+
+        {version, desc, config, bases, methods, (pattern)}
+        """
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        self.index_paths.add(path)
+
+        info = self.index_cache.get(path)
+        if info is not None and info["stamp"] == stamp and (
+            not pattern or "pattern" in info
+        ):
+            self.index_stats[0] += 1
+            return info
+
+        self.index_stats[1] += 1
+        with open(path) as data:
+            content = data.read()
+
+        info = {"stamp": stamp}
+
+        # m_pyver = self._PYLOAD_VERSION.search(content)
+        # if m_pyver is None:
+        #     self.pyload.log.debug(
+        #         f"__pyload_version__ not found in plugin {name}"
+        #     )
+        # else:
+        #     pyload_version = m_pyver.group(1)
+
+        #     requires_version = f"{pyload_version}.0"
+        #     requires_version_info = semver.parse_version_info(requires_version)
+
+        #     if self.pyload.version_info.major:
+        #         core_version = self.pyload.version_info.major
+        #         plugin_version = requires_version_info.major
+        #     else:
+        #         core_version = self.pyload.version_info.minor
+        #         plugin_version = requires_version_info.minor
+
+        #     if core_version > plugin_version:
+        #         self.pyload.log.warning(
+        #             self._(
+        #                 "Plugin {} not compatible with current pyLoad version"
+        #             ).format(name)
+        #         )
+        #         continue
+
+        m_ver = self._VERSION.search(content)
+        if m_ver is None:
+            self.pyload.log.debug(f"__version__ not found in plugin {name}")
+            info["version"] = 0
+        else:
+            info["version"] = float(m_ver.group(1))
+
+        if pattern:
+            m_pat = self._PATTERN.search(content)
+            info["pattern"] = r"^unmachtable$" if m_pat is None else m_pat.group(1)
+
+        m_desc = self._DESC.search(content)
+        info["desc"] = "" if m_desc is None else m_desc.group(1)
+
+        # what the plugin class defines itself, to know what it hooks into
+        info["bases"] = [
+            base.strip()
+            for cls, bases in self._CLASS.findall(content)
+            if cls == name
+            for base in bases.split(",")
+        ]
+        info["methods"] = sorted(set(self._METHOD.findall(content)))
+        info["decorators"] = sorted(set(self._DECORATOR.findall(content)))
+
+        config = self._CONFIG.findall(content)
+        info["config"] = (
+            literal_eval(config[0].strip().replace("\n", "").replace("\r", ""))
+            if config
+            else None
+        )
+
+        try:
+            json.dumps(info)
+        except (TypeError, ValueError):
+            self.index_cache.pop(path, None)  #: unusual config, parse it every time
+        else:
+            self.index_cache[path] = info
+        return info
+
+    def load_index_cache(self):
+        """
+        loads the metadata of the plugins found on last indexing.
+        """
+        try:
+            with open(self.index_cache_path) as fp:
+                data = json.load(fp)
+            if data["version"] != self.pyload.version:
+                raise ValueError("Outdated")
+            if data["format"] != self.INDEX_FORMAT:
+                raise ValueError("Outdated")
+            self.index_cache = data["plugins"]
+            self.index_tokens = data["tokens"]
+
+        except (OSError, ValueError, KeyError, TypeError):
+            self.index_cache = {}
+            self.index_tokens = {}  #: url tokens by pattern, see URLMatcher
+
+        self.index_tokens_saved = len(self.index_tokens)
+
+        self.index_paths = set()  #: plugin files seen while indexing
+        self.index_stats = [0, 0]  #: plugins taken from cache, plugins parsed
+
+    def save_index_cache(self, paths=None):
+        """
+        saves the plugin metadata, if paths are given only of these files.
+        """
+        hits, parsed = self.index_stats
+        self.pyload.log.debug(
+            f"Indexed {hits + parsed} plugins, {parsed} of them changed"
+        )
+
+        removed = 0
+        if paths is not None:
+            removed = len(self.index_cache)
+            self.index_cache = {
+                path: info for path, info in self.index_cache.items() if path in paths
+            }
+            removed -= len(self.index_cache)
+
+            for key in set(self.index_tokens) - self.url_matcher.keys:
+                del self.index_tokens[key]
+                removed += 1
+
+        if not (parsed or removed or len(self.index_tokens) != self.index_tokens_saved):
+            return
+
+        self.index_tokens_saved = len(self.index_tokens)
+        data = {
+            "version": self.pyload.version,
+            "format": self.INDEX_FORMAT,
+            "plugins": self.index_cache,
+            "tokens": self.index_tokens,
+        }
+        try:
+            with open(self.index_cache_path + ".tmp", mode="w") as fp:
+                json.dump(data, fp)
+            os.replace(self.index_cache_path + ".tmp", self.index_cache_path)
+
+        except (OSError, TypeError, ValueError) as exc:
+            self.pyload.log.warning(
+                self._("Unable to save plugin index: {}").format(exc)
+            )
+
     def parse_urls(self, urls):
         """
         parse plugins for given list of urls.
@@ -266,6 +702,9 @@ class PluginManager:
         last = (None, {})
         res = []  #: tupels of (url, plugin)
 
+        # plugins may have changed their patterns meanwhile
+        self.url_matcher.check()
+
         for url in urls:
             if type(url) not in (
                 str,
@@ -273,29 +712,43 @@ class PluginManager:
                 memoryview,
             ):  #: check memoryview (as py2 byffer)
                 continue
-            found = False
 
             # NOTE: E1136: Value 'last' is unsubscriptable (unsubscriptable-object)
-            if last != (None, {}) and last[1]["re"].match(url):
+            if last != (None, {}) and self.url_matcher.match(last[1], url):
                 res.append((url, last[0]))
                 continue
 
-            for name, value in chain(
-                self.crypter_plugins.items(),
-                self.hoster_plugins.items(),
-                self.container_plugins.items(),
-            ):
-                if value["re"].match(url):
-                    res.append((url, name))
-                    last = (name, value)
-                    found = True
-                    break
-
-            if not found:
+            found = self.url_matcher.find(url)
+            if found:
+                res.append((url, found[0]))
+                last = found
+            else:
                 res.append((url, "DefaultPlugin"))
 
         return res
 
+    def set_domains(self, type, name, domains, pattern=None):
+        """
+        lets plugin name handle the urls of the given domains, besides the ones
+        matching its own pattern.
+        """
+        plugin = self.plugins[type][name]
+        if domains:
+            domains = sorted(domains)
+            alts = "|".join(x.replace(".", r"\.") for x in domains)
+            full = rf".*(?P<DOMAIN>{alts}).*"
+            if pattern:
+                full = rf"{pattern}|{full}"
+        else:
+            full = pattern or r"^unmatchable$"
+
+        plugin["domains"] = tuple(domains)
+        plugin["base_re"] = re.compile(pattern) if domains and pattern else None
+        plugin["pattern"] = full
+        plugin["re"] = re.compile(full)  #: last, the url matcher checks it for changes
+
+        return full
+
     def find_plugin(self, name, pluginlist=("decrypter", "downloader", "container")):
         for ptype in pluginlist:
             if name in self.plugins[ptype]:
@@ -440,6 +893,8 @@ class PluginManager:
                         importlib.reload(self.plugins[type][plugin][APPID])
 
         # index creation
+        self.index_stats = [0, 0]
+
         self.crypter_plugins, config = self.parse("decrypters", pattern=True)
         self.plugins["decrypter"] = self.crypter_plugins
         default_config = config
@@ -467,6 +922,14 @@ class PluginManager:
         self.plugins["account"] = self.account_plugins
         merge(default_config, config)
 
+        self.url_matcher = URLMatcher(
+            self.crypter_plugins,
+            self.hoster_plugins,
+            self.container_plugins,
+            tokens=self.index_tokens,
+        )
+        self.save_index_cache()
+
         for name, config in default_config.items():
             desc = config.pop("desc", "")
             config = [[k] + list(v) for k, v in config.items()]
@@ -340,9 +340,7 @@ class ThreadManager:
                     thread.put(job)
                 else:
                     # put job back
-                    if occ not in self.pyload.files.job_cache:
-                        self.pyload.files.job_cache[occ] = []
-                    self.pyload.files.job_cache[occ].append(job.id)
+                    self.pyload.files.requeue_job(job)
 
                     # check for decrypt jobs
                     job = self.pyload.files.get_decrypt_job()
@@ -9,15 +9,17 @@ from .http.http_request import HTTPRequest
 
 
 class Browser:
-    def __init__(self, bucket=None, options={}):
+    def __init__(self, bucket=None, options={}, reactor=None):
         self.log = getLogger(APPID)
 
         self.options = options  #: holds pycurl options
         self.bucket = bucket
+        self.reactor = reactor  #: shared reactor multiplexing the downloads, if any
 
         self.cj = None  #: needs to be setted later
         self.http = None
         self._size = 0
+        self.last_checksums = {}  #: of the last download, by algorithm
 
         self.renew_http_request()
         self.dl = None
@@ -95,11 +97,15 @@ class Browser:
             resume=False,
             status_notify=None,
             disposition=False,
+            weight=1,
+            checksums=(),
     ):
         """
-        this can also download ftp.
+        this can also download ftp, the checksums named are computed on the fly and
+        stored in `last_checksums`.
         """
         self._size = 0
+        self.last_checksums = {}
         self.dl = HTTPDownload(
             url,
             filename,
@@ -112,9 +118,13 @@ class Browser:
             options=self.options,
             status_notify=status_notify,
             disposition=disposition,
+            reactor=self.reactor,
+            weight=weight,
+            checksums=checksums,
         )
         name = self.dl.download(chunks, resume)
         self._size = self.dl.size
+        self.last_checksums = self.dl.checksums
 
         self.dl = None
 
@@ -170,3 +180,5 @@ class Browser:
             del self.dl
         if hasattr(self, "cj"):
             del self.cj
+        if hasattr(self, "reactor"):
+            del self.reactor
@@ -7,17 +7,40 @@ from ..utils.struct.lock import lock
 
 
 class Bucket:
+    """
+    token bucket limiting the transfer rate.
+
+    Buckets form a tree, usually global -> plugin -> account -> download: every
+    byte is charged to the whole chain and the transfer waits for the most
+    indebted of them. Siblings share the debt of their parent according to
+    their weight, a heavier download waits less and so gets more bandwidth.
+    """
 
     MIN_RATE = 10 << 10  # 10kb minimum rate
+    BATCH_SIZE = 64 << 10  #: max bytes a transfer collects before charging them
+
+    def __init__(self, name="global", parent=None, weight=1):
+        self.name = name
+        self.parent = parent
+        self.weight = max(1, weight)
 
-    def __init__(self):
         self._rate = 0
         self.token = 0
         self.timestamp = time.time()
         self.lock = Lock()
 
+        self.children = set()  #: attached child buckets
+        self.child_weight = 0  #: sum of their weights
+
+        self.transferred = 0  #: bytes charged so far
+        self.speed = 0  #: bytes/s measured over the last second
+        self.window = [self.timestamp, 0]
+
+        if parent is not None:
+            parent.attach(self)
+
     def __bool__(self):
-        return self._rate >= self.MIN_RATE
+        return self.get_limit() > 0
 
     @lock
     def set_rate(self, rate):
@@ -28,6 +51,81 @@ class Bucket:
 
     rate = property(get_rate, set_rate)
 
+    @lock
+    def attach(self, child):
+        self.children.add(child)
+        self.child_weight += child.weight
+
+    @lock
+    def detach(self, child):
+        self.children.discard(child)
+        self.child_weight -= child.weight
+
+    def close(self):
+        """
+        removes the bucket from its parent, needed for short living ones.
+        """
+        if self.parent is not None:
+            self.parent.detach(self)
+            self.parent = None
+
+    def get_limit(self):
+        """
+        the rate the whole chain allows, 0 if unlimited.
+        """
+        limit = 0
+        bucket = self
+        while bucket is not None:
+            if bucket._rate >= self.MIN_RATE and (not limit or bucket._rate < limit):
+                limit = bucket._rate
+            bucket = bucket.parent
+        return limit
+
+    def get_batch_size(self):
+        """
+        amount of bytes worth charging at once, small enough to keep a limited
+        transfer smooth.
+        """
+        limit = self.get_limit()
+        return min(self.BATCH_SIZE, limit >> 3) if limit else self.BATCH_SIZE
+
+    def get_share(self):
+        """
+        factor the waits of the parent are scaled with for this bucket.
+        """
+        parent = self.parent
+        if parent is None or not parent.children:
+            return 1
+        return parent.child_weight / len(parent.children) / self.weight
+
+    @lock
+    def get_children(self):
+        return list(self.children)
+
+    def walk(self):
+        """
+        yields this bucket and all below it.
+        """
+        yield self
+        for child in self.get_children():
+            yield from child.walk()
+
+    def get_speed(self):
+        start, amount = self.window
+        if time.time() - start > 2:  #: nothing charged for a while
+            return 0
+        return self.speed
+
+    @lock
+    def get_backlog(self):
+        """
+        bytes transferred in excess of the limit, not paid back yet.
+        """
+        if self._rate < self.MIN_RATE:
+            return 0
+        self._calc_token()
+        return max(0, int(-self.token))
+
     def _calc_token(self):
         if self.token >= self._rate:
             return
@@ -37,13 +135,29 @@ class Bucket:
         self.timestamp = now
 
     @lock
+    def _consume(self, amount):
+        now = time.time()
+        self.transferred += amount
+        if now - self.window[0] >= 1:
+            self.speed = self.window[1] / (now - self.window[0])
+            self.window = [now, 0]
+        self.window[1] += amount
+
+        if self._rate < self.MIN_RATE:
+            return 0  # NOTE: May become unresponsive otherwise
+        self._calc_token()
+        self.token -= amount
+        return -self.token / self._rate if self.token < 0 else 0
+
     def consumed(self, amount):
         """
         Return time the process have to sleep, after consumed specified amount.
         """
-        if self.rate < self.MIN_RATE:
-            return 0  # NOTE: May become unresponsive otherwise
-        self._calc_token()
-        self.token -= amount
-        consumed = -self.token // self._rate if self.token < 0 else 0
-        return consumed
+        wait = 0
+        share = 1
+        bucket = self
+        while bucket is not None:
+            wait = max(wait, bucket._consume(amount) * share)
+            share *= bucket.get_share()
+            bucket = bucket.parent
+        return wait
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from threading import Lock
+
+import pycurl
+
+from ..utils.struct.lock import lock
+
+
+class CurlPool:
+    """
+    hands out curl handles sharing DNS and SSL session caches.
+
+    Handles and caches are grouped by the network settings (interface, proxy, ipv6)
+    they were created with, a connection made through one proxy must never be
+    reused for another. Returned handles are reset and kept for the next request,
+    so requests skip name resolution and resume TLS sessions, and a handle still
+    connected to the same host skips the TCP handshake too.
+
+    The connection cache itself is not shared: the handles run in many threads at
+    once and libcurl does not support sharing connections between threads.
+    """
+
+    MAX_IDLE = 8  #: idle handles kept per settings
+
+    SHARED_DATA = [
+        getattr(pycurl, name)
+        for name in ("LOCK_DATA_DNS", "LOCK_DATA_SSL_SESSION")
+        if hasattr(pycurl, name)
+    ]
+
+    def __init__(self):
+        self.lock = Lock()
+        self.shares = {}  #: settings -> CurlShare
+        self.idle = defaultdict(list)  #: settings -> handles ready for reuse
+
+    @staticmethod
+    def get_key(options):
+        if not options:
+            return None
+        proxy = options.get("proxies") or {}
+        return (
+            options.get("interface"),
+            tuple(sorted(proxy.items())),
+            bool(options.get("ipv6")),
+        )
+
+    @lock
+    def acquire(self, options=None):
+        """
+        returns a curl handle for the given network options.
+        """
+        key = self.get_key(options)
+        if self.idle[key]:
+            return self.idle[key].pop()
+
+        c = pycurl.Curl()
+        c.pool_key = key
+
+        share = self.shares.get(key)
+        if share is None:
+            share = self.shares[key] = pycurl.CurlShare()
+            for data in self.SHARED_DATA:
+                try:
+                    share.setopt(pycurl.SH_SHARE, data)
+                except pycurl.error:
+                    pass  #: not supported by this libcurl
+        c.setopt(pycurl.SHARE, share)
+
+        return c
+
+    @lock
+    def release(self, c, reuse=True):
+        """
+        takes back a handle not attached to a multi handle anymore.
+        """
+        key = getattr(c, "pool_key", None)
+        if not reuse or len(self.idle[key]) >= self.MAX_IDLE:
+            c.close()
+            return
+
+        try:
+            c.reset()  #: keeps live connections and caches, but forgets everything else
+            c.setopt(pycurl.COOKIELIST, "ALL")
+        except pycurl.error:
+            c.close()
+        else:
+            self.idle[key].append(c)
+
+    @lock
+    def clear(self):
+        """
+        closes all idle handles, open connections get closed with them.
+        """
+        for handles in self.idle.values():
+            for c in handles:
+                c.close()
+        self.idle.clear()
+
+
+#: shared by all requests
+POOL = CurlPool()
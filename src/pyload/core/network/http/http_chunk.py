@@ -3,8 +3,10 @@
 import codecs
 import os
 import re
+import struct
 import time
 import urllib.parse
+import zlib
 from cgi import parse_header as parse_header_line
 from email.header import decode_header as parse_mime_header
 from ntpath import basename as ntpath_basename
@@ -13,6 +15,7 @@ from posixpath import basename as posixpath_basename
 import pycurl
 from pyload.core.utils import purge
 
+from ..curl_pool import POOL
 from .http_request import HTTPRequest
 
 
@@ -21,24 +24,65 @@ class WrongFormat(Exception):
 
 
 class ChunkInfo:
+    """
+    state of a chunked download, stored next to it as `<name>.chunks`.
+
+    Binary layout (little endian), version 1:
+      magic, version, flags, file size, chunk count, name
+      per chunk: name, range start, range end, position
+      crc32 of everything before
+    Strings are stored as utf-8 prefixed by their length. The position of a chunk
+    is the first byte not safely on disk yet, so resume never trusts a half
+    written tail.
+    """
+
+    MAGIC = b"pyLoadCI"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<8sBBqI")
+    _CHUNK = struct.Struct("<qqq")
+    _STRLEN = struct.Struct("<H")
+    _CRC = struct.Struct("<I")
+
+    FLAG_DIRECT = 1
+
     def __init__(self, name):
         self.name = os.fsdecode(name)
         self.size = 0
         self.resume = False
-        self.chunks = []
+        self.direct = False  #: all chunks are written in place into the first chunk file
+        self.chunks = []  #: list of [name, range, position]
 
     def __repr__(self):
         ret = f"ChunkInfo: {self.name}, {self.size}\n"
         for i, c in enumerate(self.chunks):
-            ret += f"{i}# {c[1]}\n"
+            ret += f"{i}# {c[1]} @ {c[2]}\n"
 
         return ret
 
     def set_size(self, size):
         self.size = int(size)
 
-    def add_chunk(self, name, range):
-        self.chunks.append((name, range))
+    def add_chunk(self, name, range, pos=None):
+        self.chunks.append([name, range, range[0] if pos is None else pos])
+
+    def set_chunk_range(self, index, range):
+        self.chunks[index][1] = range
+
+    def set_chunk_pos(self, index, pos):
+        self.chunks[index][2] = pos
+
+    def split_chunk(self, index, start):
+        """
+        moves the part of a chunk from start on into a new chunk, returns its index.
+        """
+        begin, end = self.chunks[index][1]
+        self.chunks[index][1] = (begin, start - 1)
+
+        new = self.get_count()
+        name = f"{self.name}.chunk0" if self.direct else f"{self.name}.chunk{new}"
+        self.add_chunk(name, (start, end))
+        return new
 
     def clear(self):
         self.chunks = []
@@ -50,48 +94,116 @@ class ChunkInfo:
         current = 0
         for i in range(chunks):
             end = self.size - 1 if (i == chunks - 1) else current + chunk_size
-            self.add_chunk(f"{self.name}.chunk{i}", (current, end))
+            name = f"{self.name}.chunk0" if self.direct else f"{self.name}.chunk{i}"
+            self.add_chunk(name, (current, end))
             current += chunk_size + 1
 
+    @classmethod
+    def _pack_str(cls, value):
+        data = value.encode("utf-8")
+        return cls._STRLEN.pack(len(data)) + data
+
     def save(self):
+        """
+        writes the state atomically, a crash leaves either the old or the new file.
+        """
+        data = bytearray(
+            self._HEADER.pack(
+                self.MAGIC,
+                self.VERSION,
+                self.FLAG_DIRECT if self.direct else 0,
+                self.size,
+                len(self.chunks),
+            )
+        )
+        data += self._pack_str(self.name)
+        for name, range, pos in self.chunks:
+            data += self._pack_str(name)
+            data += self._CHUNK.pack(range[0], range[1], pos)
+        data += self._CRC.pack(zlib.crc32(data))
+
         fs_name = f"{self.name}.chunks"
-        with open(fs_name, mode="w", encoding="utf-8") as fh:
-            fh.write(f"name:{self.name}\n")
-            fh.write(f"size:{self.size}\n")
-            for i, c in enumerate(self.chunks):
-                fh.write(f"#{i}:\n")
-                fh.write(f"\tname:{c[0]}\n")
-                fh.write(f"\trange:{c[1][0]}-{c[1][1]}\n")
+        tmp_name = f"{fs_name}.tmp"
+        with open(tmp_name, mode="wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, fs_name)
 
     @staticmethod
     def load(name):
         fs_name = f"{name}.chunks"
         if not os.path.exists(fs_name):
             raise IOError
-        with open(fs_name, encoding="utf-8") as fh:
-            name = fh.readline()[:-1]
-            size = fh.readline()[:-1]
-            if name.startswith("name:") and size.startswith("size:"):
+        with open(fs_name, mode="rb") as fh:
+            data = fh.read()
+
+        if not data.startswith(ChunkInfo.MAGIC):
+            return ChunkInfo._load_text(data)
+
+        return ChunkInfo._load_binary(data)
+
+    @staticmethod
+    def _load_binary(data):
+        def read(fmt, offset):
+            try:
+                return fmt.unpack_from(data, offset), offset + fmt.size
+            except struct.error:
+                raise WrongFormat from None
+
+        def read_str(offset):
+            (length,), offset = read(ChunkInfo._STRLEN, offset)
+            if offset + length > len(data):
+                raise WrongFormat
+            return data[offset : offset + length].decode("utf-8"), offset + length
+
+        if len(data) < ChunkInfo._CRC.size:
+            raise WrongFormat
+        (crc,) = ChunkInfo._CRC.unpack_from(data, len(data) - ChunkInfo._CRC.size)
+        data = data[: -ChunkInfo._CRC.size]
+        if zlib.crc32(data) != crc:
+            raise WrongFormat
+
+        (magic, version, flags, size, count), offset = read(ChunkInfo._HEADER, 0)
+        if version != ChunkInfo.VERSION:
+            raise WrongFormat
+
+        name, offset = read_str(offset)
+        ci = ChunkInfo(name)
+        ci.loaded = True
+        ci.set_size(size)
+        ci.direct = bool(flags & ChunkInfo.FLAG_DIRECT)
+
+        for i in range(count):
+            name, offset = read_str(offset)
+            (start, end, pos), offset = read(ChunkInfo._CHUNK, offset)
+            ci.add_chunk(name, (start, end), pos)
+
+        return ci
+
+    @staticmethod
+    def _load_text(data):
+        """
+        reads the line based format written by older versions, without positions.
+        """
+        lines = data.decode("utf-8").splitlines()
+        if len(lines) < 2 or not lines[0].startswith("name:") or not lines[1].startswith("size:"):
+            raise WrongFormat
+
+        ci = ChunkInfo(lines[0][5:])
+        ci.loaded = True
+        ci.set_size(lines[1][5:])
+
+        for i in range(2, len(lines) - 2, 3):  #: skip the "#n:" lines
+            name = lines[i + 1].strip()
+            range = lines[i + 2].strip()
+            if name.startswith("name:") and range.startswith("range:"):
                 name = name[5:]
-                size = size[5:]
+                range = range[6:].split("-")
             else:
-                fh.close()
                 raise WrongFormat
-            ci = ChunkInfo(name)
-            ci.loaded = True
-            ci.set_size(size)
-            while True:
-                if not fh.readline():  #: skip line
-                    break
-                name = fh.readline()[1:-1]
-                range = fh.readline()[1:-1]
-                if name.startswith("name:") and range.startswith("range:"):
-                    name = name[5:]
-                    range = range[6:].split("-")
-                else:
-                    raise WrongFormat
-
-                ci.add_chunk(name, (int(range[0]), int(range[1])))
+
+            ci.add_chunk(name, (int(range[0]), int(range[1])), -1)
 
         return ci
 
@@ -109,6 +221,12 @@ class ChunkInfo:
     def get_chunk_range(self, index):
         return self.chunks[index][1]
 
+    def get_chunk_pos(self, index):
+        """
+        first byte of the chunk not safely stored yet, -1 if unknown.
+        """
+        return self.chunks[index][2]
+
 
 class HTTPChunk(HTTPRequest):
     def __init__(self, id, parent, range=None, resume=False):
@@ -120,11 +238,12 @@ class HTTPChunk(HTTPRequest):
 
         self.size = range[1] - range[0] if range else -1
         self.arrived = 0
+        self.offset = range[0] if range else 0  #: file position of the first arrived byte
         self.last_url = self.p.referer
 
         self.aborted = False  # indicates that the chunk aborted gracefully
 
-        self.c = pycurl.Curl()
+        self.c = POOL.acquire(self.p.options)
 
         self.response_header = b""
         self.header_parsed = False  #: indicates if the header has been processed
@@ -138,8 +257,9 @@ class HTTPChunk(HTTPRequest):
 
         self.rep = None
 
-        self.sleep = 0.0
-        self.last_size = 0
+        self.paused_until = 0  #: time the transfer is paused until to honour the speed limit
+        self.paused = False  #: curl holds back the data until unpaused
+        self.unaccounted = 0  #: bytes not charged to the bucket yet
 
     def __repr__(self):
         return f"<HTTPChunk id={self.id}, size={self.size}, arrived={self.arrived}>"
@@ -149,7 +269,7 @@ class HTTPChunk(HTTPRequest):
         return self.p.cj
 
     def format_range(self):
-        if self.id == len(self.p.info.chunks) - 1:  #: as last chunk don't set end range, so we get everything
+        if self.range[1] >= self.p.size - 1:  #: as last chunk don't set end range, so we get everything
             end = ""
             if self.resume:
                 start = self.arrived + self.range[0]
@@ -174,16 +294,35 @@ class HTTPChunk(HTTPRequest):
         self.c.setopt(pycurl.WRITEFUNCTION, self.write_body)
         self.c.setopt(pycurl.HEADERFUNCTION, self.write_header)
 
+        limit = self.p.bucket.get_limit() if self.p.bucket is not None else 0
+        if limit:
+            #: a single connection can't go faster than the tightest limit anyway
+            self.c.setopt(pycurl.MAX_RECV_SPEED_LARGE, limit)
+        else:
+            #: bigger reads, less callbacks
+            self.c.setopt(pycurl.BUFFERSIZE, 256 << 10)
+
         # request all bytes, since some servers in russia seems to have a defect
         # arithmetic unit
 
         fs_name = self.p.info.get_chunk_name(self.id)
+        if self.p.info.direct:
+            return self._get_direct_handle(fs_name)
+
         if self.resume:
             self.fp = open(fs_name, mode="ab")
             self.arrived = self.fp.tell()
             if not self.arrived:
                 self.arrived = os.stat(fs_name).st_size
 
+            #: drop whatever was written after the last checkpoint
+            pos = self.p.info.get_chunk_pos(self.id)
+            if pos >= 0:
+                saved = pos - self.p.info.get_chunk_range(self.id)[0]
+                if 0 <= saved < self.arrived:
+                    self.fp.truncate(saved)
+                    self.arrived = saved
+
             if self.range:
                 #: do nothing if chunk already finished
                 if self.arrived + self.range[0] >= self.range[1]:
@@ -208,6 +347,39 @@ class HTTPChunk(HTTPRequest):
 
         return self.c
 
+    def _get_direct_handle(self, fs_name):
+        """
+        all chunks share one file, each one writes its range in place.
+
+        The file size tells nothing about the progress of a chunk, a resumed chunk
+        continues at the position saved by the last checkpoint.
+        """
+        if self.resume:
+            self.offset = self.p.info.get_chunk_range(self.id)[0]
+            self.arrived = max(0, self.p.info.get_chunk_pos(self.id) - self.offset)
+
+        if (self.resume or self.id) and os.path.exists(fs_name):
+            self.fp = open(fs_name, mode="r+b")
+            self.fp.seek(self.offset + self.arrived)
+        else:
+            self.fp = open(fs_name, mode="wb")
+
+        if self.range:
+            #: do nothing if chunk already finished
+            if self.offset + self.arrived > self.range[1]:
+                return None
+
+            range = self.format_range()
+
+            self.log.debug(f"Chunk {self.id + 1} chunked with range {range}")
+            self.c.setopt(pycurl.RANGE, range)
+
+        elif self.offset + self.arrived:
+            self.log.debug(f"Resume File from {self.offset + self.arrived}")
+            self.c.setopt(pycurl.RESUME_FROM, self.offset + self.arrived)
+
+        return self.c
+
     def write_header(self, buf):
         self.response_header += buf
         # TODO: forward headers?, this is possibly unneeded, when we just parse valid 200 headers
@@ -224,6 +396,12 @@ class HTTPChunk(HTTPRequest):
         self.header_parsed = True
 
     def write_body(self, buf):
+        if self.paused_until:
+            #: over the limit, let curl keep the data and stop reading from the socket,
+            #: the parent unpauses the transfer when the time is up
+            self.paused = True
+            return pycurl.WRITEFUNC_PAUSE
+
         #: ignore BOM, it confuses unrar
         if not self.BOMChecked:
             if buf[:3] == codecs.BOM_UTF8:
@@ -231,26 +409,30 @@ class HTTPChunk(HTTPRequest):
             self.BOMChecked = True
 
         size = len(buf)
+        pos = self.offset + self.arrived
 
-        self.arrived += size
+        if self.range and self.p.info.direct:
+            #: drop anything past the range end, it belongs to the next chunk
+            buf = buf[: max(0, self.range[1] + 1 - pos)]
 
         self.fp.write(buf)
-
-        if self.p.bucket:
-            time.sleep(self.p.bucket.consumed(size))
-        else:
-            # Avoid small buffers, increasing sleep time slowly if buffer size gets smaller
-            # otherwise reduce sleep time percentual (values are based on tests)
-            # So in general cpu time is saved without reducing bandwidth too much
-
-            if size < self.last_size:
-                self.sleep += 0.002
+        self.arrived += len(buf)  #: after writing, checkpoints rely on it
+        if self.p.hasher is not None:
+            self.p.hasher.update(pos, buf)
+
+        bucket = self.p.bucket
+        if bucket is not None:
+            #: charge in batches, the buckets are shared by all transfers
+            self.unaccounted += size
+            if self.unaccounted < bucket.get_batch_size():
+                wait = 0
             else:
-                self.sleep *= 0.7
-
-            self.last_size = size
+                wait = bucket.consumed(self.unaccounted)
+                self.unaccounted = 0
 
-            time.sleep(self.sleep)
+            if wait:
+                #: don't block the thread, the next data gets paused instead
+                self.paused_until = time.time() + wait
 
         if self.range and self.arrived > self.size:
             self.aborted = True  #: tell parent to ignore the pycurl Exception
@@ -360,12 +542,29 @@ class HTTPChunk(HTTPRequest):
         self.size = range[1] - range[0]
         self.log.debug("Chunk {id} chunked with range {range}".format(id=self.id + 1, range=self.format_range()))
 
+    def unpause(self):
+        self.paused_until = 0
+        if self.paused:
+            self.paused = False
+            try:
+                self.c.pause(pycurl.PAUSE_CONT)
+            except pycurl.error as exc:
+                #: the held back data ended the transfer, curl reports it as finished
+                self.log.debug(f"Chunk {self.id + 1} unpaused: {exc}")
+
+    def sync(self):
+        """
+        make sure everything written so far is on disk.
+        """
+        if self.fp and not self.fp.closed:
+            self.fp.flush()
+            os.fsync(self.fp.fileno())
+
     def flush_file(self):
         """
         flush and close file.
         """
-        self.fp.flush()
-        os.fsync(self.fp.fileno())  #: make sure everything was written to disk
+        self.sync()  #: make sure everything was written to disk
         self.fp.close()  #: needs to be closed, or merging chunks will fail
 
     def close(self):
@@ -374,6 +573,11 @@ class HTTPChunk(HTTPRequest):
         """
         if self.fp:
             self.fp.close()
-        self.c.close()
+        if self.c is not None:
+            POOL.release(self.c, reuse=not self.paused)  #: a paused handle can't be reused safely
+            self.c = None
         if hasattr(self, "p"):
+            if self.unaccounted and self.p.bucket is not None:
+                self.p.bucket.consumed(self.unaccounted)  #: keep the statistics right
+                self.unaccounted = 0
             del self.p
@@ -6,9 +6,12 @@ from logging import getLogger
 
 import pycurl
 from pyload import APPID
+from pyload.core.utils import fs
 
+from ..bucket import Bucket
 from ..exceptions import Abort
-from .http_chunk import ChunkInfo, HTTPChunk
+from ..reactor import CurlReactor
+from .http_chunk import ChunkInfo, HTTPChunk, WrongFormat
 from .http_request import BadHeader
 
 
@@ -17,6 +20,13 @@ class HTTPDownload:
     loads a url http + ftp.
     """
 
+    #: a chunk is only split when both halves would be at least this big
+    MIN_SPLIT_SIZE = 2 << 20
+
+    #: progress is synced to disk and recorded after this many bytes or seconds
+    CHECKPOINT_SIZE = 64 << 20
+    CHECKPOINT_INTERVAL = 30
+
     def __init__(
             self,
             url,
@@ -30,6 +40,9 @@ class HTTPDownload:
             options={},
             status_notify=None,
             disposition=False,
+            reactor=None,
+            weight=1,
+            checksums=(),
     ):
         self.url = url
         self.filename = filename  #: complete file destination, not only name
@@ -37,11 +50,19 @@ class HTTPDownload:
         self.post = post
         self.referer = referer
         self.cj = cj  #: cookiejar if cookies are needed
-        self.bucket = bucket
+        #: own bucket below the one of the plugin/account, weighted by package
+        self.bucket = (
+            None
+            if bucket is None
+            else Bucket(os.path.basename(filename), bucket, weight)
+        )
         self.options = options
         self.disposition = disposition
         # all arguments
 
+        #: write chunks in place into one preallocated file instead of merging them afterwards
+        self.direct_write = bool(options.get("direct_write"))
+
         self.abort = False
         self.size = size
         self.name_disposition = None  #: will be parsed from content disposition
@@ -57,9 +78,15 @@ class HTTPDownload:
             self.info_saved = True
         except IOError:
             self.info = ChunkInfo(filename)
+        except WrongFormat:
+            self.log.warning(f"Invalid chunk info, restarting download: {filename}")
+            self.info = ChunkInfo(filename)
 
         self.chunk_support = None
-        self.m = self.manager = pycurl.CurlMulti()
+
+        #: transfers are multiplexed by a shared reactor if given, a private one otherwise
+        self.private_reactor = reactor is None
+        self.reactor = CurlReactor() if reactor is None else reactor
 
         # needed for speed calculation
         self.last_arrived = []
@@ -69,6 +96,10 @@ class HTTPDownload:
         # notifications callback
         self.status_notify = status_notify
 
+        #: hashes the data while it arrives, see `checksums` for the results
+        self.hasher = fs.ChecksumStream(checksums) if checksums else None
+        self.checksums = {}
+
     @property
     def speed(self):
         last = [sum(x) for x in self.last_speeds if x]
@@ -87,24 +118,39 @@ class HTTPDownload:
     def _copy_chunks(self):
         init = self.info.get_chunk_name(0)  #: initial chunk name
 
-        if self.info.get_count() > 1:
+        if self.info.direct:
+            #: nothing to merge, just make sure no chunk came up short
+            for chunk in self.chunks:
+                if chunk.range:
+                    missing = chunk.arrived <= chunk.size
+                else:
+                    missing = chunk.offset + chunk.arrived < self.info.size
+                if missing:
+                    os.remove(init)
+                    self.info.remove()
+                    self.info.clear()
+                    raise Exception(
+                        "Downloaded content was smaller than expected. Try to reduce download connections."
+                    )
+
+        elif self.info.get_count() > 1:
+            #: split chunks are appended to the info, merge them in file order
+            order = sorted(
+                range(self.info.get_count()), key=lambda i: self.info.get_chunk_range(i)[0]
+            )
             with open(init, mode="rb+") as fo:  #: first chunk file
-                for i in range(1, self.info.get_count()):
+                for prev, i in zip(order, order[1:]):
                     # input file
                     # seek to beginning of chunk, to get rid of overlapping chunks
-                    fo.seek(self.info.get_chunk_range(i - 1)[1] + 1)
-                    fname = f"{self.filename}.chunk{i}"
+                    fo.seek(self.info.get_chunk_range(prev)[1] + 1)
+                    fname = self.info.get_chunk_name(i)
                     with open(fname, mode="rb") as fi:
-                        buf = 32 << 10
-                        while True:  #: copy in chunks, consumes less memory
-                            data = fi.read(buf)
-                            if not data:
-                                break
-                            fo.write(data)
+                        self._copy_chunk(fi, fo, self.info.get_chunk_range(i)[0])
                     if fo.tell() < self.info.get_chunk_range(i)[1]:
                         fo.close()
                         os.remove(init)
                         self.info.remove()  #: there are probably invalid chunks
+                        self.info.clear()
                         raise Exception(
                             "Downloaded content was smaller than expected. Try to reduce download connections."
                         )
@@ -121,6 +167,24 @@ class HTTPDownload:
             pass
         os.rename(init, self.filename)
         self.info.remove()  #: os.remove info file
+        self.info.clear()  #: nothing left to resume
+
+        if self.hasher is not None:
+            self.checksums = self.hasher.finish(self.filename)
+
+    def _copy_chunk(self, fi, fo, pos):
+        """
+        appends chunk file fi, starting at file position pos, feeding the hasher on
+        the way if it has not seen the data yet.
+        """
+        if self.hasher is None or self.hasher.pos < pos:
+            fs.copyfileobj(fi, fo)
+            return
+
+        for data in iter(lambda: fi.read(1 << 20), b""):
+            fo.write(data)
+            self.hasher.update(pos, data)
+            pos += len(data)
 
     def download(self, chunks=1, resume=False):
         """
@@ -156,167 +220,231 @@ class HTTPDownload:
     def _download(self, chunks, resume):
         if not resume:
             self.info.clear()
+            self.info.direct = self.direct_write
             self.info.add_chunk(
                 f"{self.filename}.chunk0", (0, 0)
             )  #: create an initial entry)
 
         self.chunks = []
+        self.finished = []  #: finished curl transfers, filled by the reactor
+        if self.hasher is not None:
+            self.hasher.reset()
 
         # initial chunk that will load complete file (if needed)
-        init = HTTPChunk(0, self, None, resume)
-
-        self.chunks.append(init)
-        self.m.add_handle(init.get_handle())
-
-        last_finish_check = 0
-        last_time_check = 0
-        chunks_done = set()  #: list of curl handles that are finished
-        chunks_created = False
-        done = False
+        self.init = HTTPChunk(0, self, None, resume)
+
+        self.chunks.append(self.init)
+        self.reactor.add_handle(self.init.get_handle(), self)
+
+        self.resume = resume
+        self.chunks_wanted = chunks
+        self.last_time_check = 0
+        self.checkpoint_time = time.time()
+        self.checkpoint_arrived = self.arrived
+        self.chunks_done = set()  #: list of curl handles that are finished
+        self.chunks_created = False
         if (
             self.info.get_count() > 1
         ):  #: This is a resume, if we were chunked originally assume still can
             self.chunk_support = True
 
-        while True:
-            # need to create chunks
-            if (
-                not chunks_created and self.chunk_support and self.size
-            ):  #: will be set later by first chunk
-
-                if not resume:
-                    self.info.set_size(self.size)
-                    self.info.create_chunks(chunks)
-                    self.info.save()
-
-                chunks = self.info.get_count()
-
-                init.set_range(self.info.get_chunk_range(0))
-
-                for i in range(1, chunks):
-                    c = HTTPChunk(i, self, self.info.get_chunk_range(i), resume)
-
-                    handle = c.get_handle()
-                    if handle:
-                        self.chunks.append(c)
-                        self.m.add_handle(handle)
-                    else:
-                        # close immediately
-                        self.log.debug("Invalid curl handle -> closed")
-                        c.close()
-
-                chunks_created = True
-
-            while True:
-                ret, num_handles = self.m.perform()
-                if ret != pycurl.E_CALL_MULTI_PERFORM:
-                    break
-
-            t = time.time()
-
-            # reduce these calls
-            while last_finish_check + 0.5 < t:
-                # list of failed curl handles
-                failed = []
-                ex = None  #: save only last exception, we can only raise one anyway
-
-                num_q, ok_list, err_list = self.m.info_read()
-                for c in ok_list:
-                    chunk = self.find_chunk(c)
-                    try:  #: check if the header implies success, else add it to failed list
-                        chunk.verify_header()
-                    except BadHeader as exc:
-                        self.log.debug(f"Chunk {chunk.id + 1} failed: {exc}")
-                        failed.append(chunk)
-                        ex = exc
-                    else:
-                        self.log.debug(f"Chunk {chunk.id + 1} download finished")
-                        chunks_done.add(c)
-
-                for c in err_list:
-                    curl, errno, msg = c
-                    chunk = self.find_chunk(curl)
-                    # test if chunk was finished
-                    if errno != pycurl.E_WRITE_ERROR or not chunk.aborted:
-                        failed.append(chunk)
-                        ex = pycurl.error(errno, msg)
-                        self.log.debug(f"Chunk {chunk.id + 1} failed: {ex}")
-                        continue
-
-                    try:  #: check if the header implies success, else add it to failed list
-                        chunk.verify_header()
-                    except BadHeader as exc:
-                        self.log.debug(f"Chunk {chunk.id + 1} failed: {exc}")
-                        failed.append(chunk)
-                        ex = exc
-                    else:
-                        self.log.debug(f"Chunk {chunk.id + 1} download finished")
-                        chunks_done.add(curl)
-                if not num_q:  #: no more infos to get
-
-                    # check if init is not finished so we reset download connections
-                    # note that other chunks are closed and downloaded with init too
-                    if failed and init not in failed and init.c not in chunks_done:
-                        self.log.error(
-                            f"Download chunks failed, fallback to single connection | {ex}"
-                        )
-
-                        # list of chunks to clean and os.remove
-                        to_clean = [x for x in self.chunks if x is not init]
-                        for chunk in to_clean:
-                            self.close_chunk(chunk)
-                            self.chunks.remove(chunk)
-                            os.remove(self.info.get_chunk_name(chunk.id))
-
-                        # let first chunk load the rest and update the info file
-                        init.reset_range()
-                        self.info.clear()
-                        self.info.add_chunk(f"{self.filename}.chunk0", (0, self.size))
-                        self.info.save()
-                    elif failed:
-                        raise ex or Exception
-
-                    last_finish_check = t
-
-                    if len(chunks_done) >= len(self.chunks):
-                        if len(chunks_done) > len(self.chunks):
-                            self.log.warning(
-                                "Finished download chunks size incorrect, please report bug."
-                            )
-                        done = True  #: all chunks loaded
-
-                    break
-
-            if done:
-                break  #: all chunks loaded
-
-            # calc speed once per second, averaging over 3 seconds
-            if last_time_check + 1 < t:
-                diff = [
-                    c.arrived
-                    - (self.last_arrived[i] if len(self.last_arrived) > i else 0)
-                    for i, c in enumerate(self.chunks)
-                ]
-
-                self.last_speeds[1] = self.last_speeds[0]
-                self.last_speeds[0] = self.speeds
-                self.speeds = [float(a) / (t - last_time_check) for a in diff]
-                self.last_arrived = [c.arrived for c in self.chunks]
-                last_time_check = t
-                self.update_progress()
-
-            if self.abort:
-                raise Abort
-
-            # time.sleep(0.003) #supress busy waiting - limits dl speed to  (1 / x) *
-            # buffersize
-            self.m.select(1)
+        self.reactor.transfer(self)
 
         for chunk in self.chunks:
             chunk.flush_file()  #: make sure downloads are written to disk
 
         self._copy_chunks()
 
+    def timeout(self):
+        """
+        seconds until the download needs to step again, even without network activity.
+        """
+        t = time.time()
+
+        # wake up at least once per second for speed calculation and abort
+        timeout = max(0, self.last_time_check + 1 - t)
+        for chunk in self.chunks:
+            if chunk.paused_until:
+                timeout = min(timeout, max(0, chunk.paused_until - t))
+
+        return timeout
+
+    def due(self):
+        """
+        whether `step` has anything to handle yet.
+        """
+        return bool(
+            self.finished
+            or self.abort
+            or not self.timeout()
+            or not self.chunks_created
+            and self.chunk_support
+            and self.size
+        )
+
+    def step(self):
+        """
+        handles everything happened since the last call, returns True when all chunks are loaded.
+        """
+        init = self.init
+
+        # need to create chunks
+        if (
+            not self.chunks_created and self.chunk_support and self.size
+        ):  #: will be set later by first chunk
+
+            if not self.resume:
+                self.info.set_size(self.size)
+                self.info.create_chunks(self.chunks_wanted)
+                self.info.save()
+
+                if self.info.direct:
+                    #: reserve the whole (sparse) file, chunks write at their offsets
+                    init.fp.truncate(self.size)
+
+            chunks = self.info.get_count()
+
+            init.set_range(self.info.get_chunk_range(0))
+
+            for i in range(1, chunks):
+                c = HTTPChunk(i, self, self.info.get_chunk_range(i), self.resume)
+
+                handle = c.get_handle()
+                if handle:
+                    self.chunks.append(c)
+                    self.reactor.add_handle(handle, self)
+                else:
+                    # close immediately
+                    self.log.debug("Invalid curl handle -> closed")
+                    c.close()
+
+            self.chunks_created = True
+
+        t = time.time()
+
+        for chunk in self.chunks:
+            if chunk.paused_until and chunk.paused_until <= t:
+                self.reactor.call(chunk.unpause)
+
+        # list of failed curl handles
+        failed = []
+        ex = None  #: save only last exception, we can only raise one anyway
+
+        finished, self.finished = self.finished, []
+        done = 0
+        for curl, errno, msg in finished:
+            chunk = self.find_chunk(curl)
+            # test if chunk was finished
+            if errno and (errno != pycurl.E_WRITE_ERROR or not chunk.aborted):
+                failed.append(chunk)
+                ex = pycurl.error(errno, msg)
+                self.log.debug(f"Chunk {chunk.id + 1} failed: {ex}")
+                continue
+
+            try:  #: check if the header implies success, else add it to failed list
+                self.reactor.call(chunk.verify_header)  #: reads curl info
+            except BadHeader as exc:
+                self.log.debug(f"Chunk {chunk.id + 1} failed: {exc}")
+                failed.append(chunk)
+                ex = exc
+            else:
+                self.log.debug(f"Chunk {chunk.id + 1} download finished")
+                self.chunks_done.add(curl)
+                done += 1
+
+        # check if init is not finished so we reset download connections
+        # note that other chunks are closed and downloaded with init too
+        if failed and init not in failed and init.c not in self.chunks_done:
+            self.log.error(
+                f"Download chunks failed, fallback to single connection | {ex}"
+            )
+
+            # list of chunks to clean and os.remove
+            to_clean = [x for x in self.chunks if x is not init]
+            for chunk in to_clean:
+                self.close_chunk(chunk)
+                self.chunks.remove(chunk)
+                if not self.info.direct:
+                    os.remove(self.info.get_chunk_name(chunk.id))
+
+            # let first chunk load the rest and update the info file
+            init.reset_range()
+            self.info.clear()
+            self.info.add_chunk(f"{self.filename}.chunk0", (0, self.size))
+            self.info.save()
+        elif failed:
+            raise ex or Exception
+
+        elif self.chunks_created and self.chunks_wanted > 1:
+            #: let the free connections help the slowest ones
+            for i in range(done):
+                self._split_chunk()
+
+        if len(self.chunks_done) >= len(self.chunks):
+            if len(self.chunks_done) > len(self.chunks):
+                self.log.warning(
+                    "Finished download chunks size incorrect, please report bug."
+                )
+            return True  #: all chunks loaded
+
+        # calc speed once per second, averaging over 3 seconds
+        if self.last_time_check + 1 < t:
+            diff = [
+                c.arrived
+                - (self.last_arrived[i] if len(self.last_arrived) > i else 0)
+                for i, c in enumerate(self.chunks)
+            ]
+
+            self.last_speeds[1] = self.last_speeds[0]
+            self.last_speeds[0] = self.speeds
+            self.speeds = [float(a) / (t - self.last_time_check) for a in diff]
+            self.last_arrived = [c.arrived for c in self.chunks]
+            self.last_time_check = t
+            self.update_progress()
+
+            if (
+                self.arrived - self.checkpoint_arrived >= self.CHECKPOINT_SIZE
+                or t - self.checkpoint_time >= self.CHECKPOINT_INTERVAL
+            ):
+                self.checkpoint()
+
+        if self.abort:
+            raise Abort
+
+        return False
+
+    def _split_chunk(self):
+        """
+        splits the chunk with the most bytes left, a new chunk loads its second half.
+        """
+        active = [
+            c
+            for c in self.chunks
+            if c.range and not c.aborted and c.c not in self.chunks_done
+        ]
+        if not active:
+            return
+
+        chunk = max(active, key=lambda c: c.range[1] + 1 - c.offset - c.arrived)
+        pos = chunk.offset + chunk.arrived
+        left = chunk.range[1] + 1 - pos
+        if left < 2 * self.MIN_SPLIT_SIZE:
+            return
+
+        index = self.info.split_chunk(chunk.id, pos + left // 2)
+        chunk.set_range(self.info.get_chunk_range(chunk.id))
+
+        c = HTTPChunk(index, self, self.info.get_chunk_range(index))
+        handle = c.get_handle()
+        if handle:
+            self.log.debug(f"Chunk {chunk.id + 1} split, chunk {index + 1} loads the rest")
+            self.chunks.append(c)
+            self.reactor.add_handle(handle, self)
+        else:
+            c.close()
+
+        self.info.save()
+
     def update_progress(self):
         if self.status_notify:
             self.status_notify({'progress': self.percent})
@@ -336,23 +464,51 @@ class HTTPDownload:
 
     def close_chunk(self, chunk):
         try:
-            self.m.remove_handle(chunk.c)
+            self.reactor.remove_handle(chunk.c)
         except pycurl.error as exc:
             self.log.debug(f"Error removing chunk: {exc}")
         finally:
             chunk.close()
 
+    def checkpoint(self):
+        """
+        syncs the chunk files to disk, then records how far each chunk got.
+
+        Data is always on disk before the position pointing behind it, so resume
+        can trust the saved positions even after a crash.
+        """
+        self.checkpoint_time = time.time()
+        self.checkpoint_arrived = self.arrived
+
+        if not self.chunks or not self.info.get_count():
+            return
+
+        #: the reactor may still be writing, only what arrived before the sync counts
+        positions = [(chunk, chunk.offset + chunk.arrived) for chunk in self.chunks]
+        for chunk, pos in positions:
+            chunk.sync()
+            self.info.set_chunk_pos(chunk.id, pos)
+
+        self.info.set_size(self.size)
+        self.info.save()
+
     def close(self):
         """
         cleanup.
         """
+        if hasattr(self, "info"):
+            self.checkpoint()
+
         for chunk in self.chunks:
             self.close_chunk(chunk)
 
         self.chunks = []
-        if hasattr(self, "m"):
-            self.m.close()
-            del self.m
+        if self.bucket is not None:
+            self.bucket.close()
+        if hasattr(self, "reactor"):
+            if self.private_reactor:
+                self.reactor.close()
+            del self.reactor
         if hasattr(self, "cj"):
             del self.cj
         if hasattr(self, "info"):
@@ -12,6 +12,7 @@ import pycurl
 from pyload import APPID
 
 from ...utils.convert import to_bytes, to_str
+from ..curl_pool import POOL
 from ..exceptions import Abort
 from .exceptions import BadHeader
 
@@ -59,7 +60,7 @@ class HTTPRequest:
         self.exception = None
         self.limit = limit
 
-        self.c = pycurl.Curl()
+        self.c = POOL.acquire(options)
         self.rep = None
 
         self.cj = cookies  #: cookiejar
@@ -430,5 +431,5 @@ class HTTPRequest:
             del self.cj
 
         if hasattr(self, "c"):
-            self.c.close()
+            POOL.release(self.c)
             del self.c
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+import selectors
+import socket
+import time
+from collections import deque
+from logging import getLogger
+from threading import Event, Thread, current_thread
+
+import pycurl
+from pyload import APPID
+
+
+class CurlReactor:
+    """
+    drives curl transfers through one CurlMulti, waking up only when a socket is
+    ready or a curl timer expires.
+
+    Every HTTPDownload owns a private reactor and drives it from its own thread,
+    unless it gets a shared one: once started, a shared reactor transfers the
+    data of all downloads in its own thread and their threads only wake up when
+    there is something to handle.
+    Curl handles are not thread safe, so everything touching them goes through
+    `call` while the thread is running.
+    """
+
+    def __init__(self):
+        self.log = getLogger(APPID)
+
+        self.m = pycurl.CurlMulti()
+        self.m.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket)
+        self.m.setopt(pycurl.M_TIMERFUNCTION, self._on_timer)
+
+        self.selector = selectors.DefaultSelector()
+        self.timer_due = None
+
+        self.owners = {}  #: curl handle -> object collecting its results
+
+        self.thread = None
+        self.calls = deque()  #: pending jobs for the reactor thread
+        self.transfers = {}  #: download -> [step event, stepping]
+        self._wakeup_r = self._wakeup_w = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """
+        starts the reactor thread, downloads will be multiplexed from now on.
+        """
+        if self.thread:
+            return
+
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ)
+
+        self.thread = Thread(target=self._run, name="CurlReactor", daemon=True)
+        self.thread.start()
+
+    def call(self, func, *args):
+        """
+        runs func in the reactor thread and returns its result.
+        """
+        if not self.running or current_thread() is self.thread:
+            return func(*args)
+
+        job = [func, args, Event(), None, None]
+        self.calls.append(job)
+        self._wakeup()
+        job[2].wait()
+
+        if job[4] is not None:
+            raise job[4]
+        return job[3]
+
+    def add_handle(self, handle, owner):
+        """
+        starts a transfer, finished ones are appended to `owner.finished`.
+        """
+        self.call(self._add_handle, handle, owner)
+
+    def remove_handle(self, handle):
+        self.call(self._remove_handle, handle)
+
+    def transfer(self, download):
+        """
+        runs the transfer of download until it returns done, raises its errors.
+
+        With the reactor thread running, `download.step` is still called from the
+        calling thread, but only when the reactor found it `due`: checkpoints, new
+        chunks and callbacks of one download do not hold up the others.
+        """
+        if not self.running:
+            while not download.step():
+                self.poll(download.timeout())
+            return
+
+        state = [Event(), False]  #: step wanted, stepping
+        self.call(self.transfers.__setitem__, download, state)
+        try:
+            while True:
+                state[0].wait()
+                state[0].clear()
+                if download.step():
+                    return
+                state[1] = False
+                self._wakeup()  #: its timeout changed
+
+        finally:
+            self.call(self.transfers.pop, download, None)
+
+    def poll(self, timeout):
+        """
+        waits until a socket is ready or the curl timer expires, at most timeout seconds,
+        then collects the finished transfers.
+        """
+        if self.timer_due is not None:
+            timeout = min(timeout, max(0, self.timer_due - time.time()))
+
+        if self.selector.get_map():
+            ready = self.selector.select(timeout)
+        else:
+            ready = []
+            time.sleep(timeout)
+
+        for key, mask in ready:
+            if key.fileobj is self._wakeup_r:
+                self._drain()
+                continue
+
+            events = 0
+            if mask & selectors.EVENT_READ:
+                events |= pycurl.CSELECT_IN
+            if mask & selectors.EVENT_WRITE:
+                events |= pycurl.CSELECT_OUT
+            self._socket_action(key.fd, events)
+
+        if self.timer_due is not None and self.timer_due <= time.time():
+            self.timer_due = None
+            self._socket_action(pycurl.SOCKET_TIMEOUT, 0)
+
+        while True:
+            num_q, ok_list, err_list = self.m.info_read()
+            for c in ok_list:
+                self._finished(c, 0, None)
+            for c, errno, msg in err_list:
+                self._finished(c, errno, msg)
+            if not num_q:
+                break
+
+    def close(self):
+        """
+        cleanup, only for reactors not running as thread.
+        """
+        self.m.close()
+        self.selector.close()
+
+    def _add_handle(self, handle, owner):
+        self.owners[handle] = owner
+        self.m.add_handle(handle)
+
+    def _remove_handle(self, handle):
+        self.owners.pop(handle, None)
+        self.m.remove_handle(handle)
+
+    def _finished(self, handle, errno, msg):
+        owner = self.owners.get(handle)
+        if owner is not None:
+            owner.finished.append((handle, errno, msg))
+
+    def _on_socket(self, what, fd, multi, data):
+        """
+        curl callback, (un)registers a socket we have to wait on.
+        """
+        if what == pycurl.POLL_REMOVE:
+            try:
+                self.selector.unregister(fd)
+            except (KeyError, ValueError, OSError):
+                pass
+            return
+
+        events = 0
+        if what & pycurl.POLL_IN:
+            events |= selectors.EVENT_READ
+        if what & pycurl.POLL_OUT:
+            events |= selectors.EVENT_WRITE
+
+        try:
+            if fd in self.selector.get_map():
+                self.selector.modify(fd, events)
+            else:
+                self.selector.register(fd, events)
+        except (KeyError, ValueError, OSError) as exc:
+            self.log.debug(f"Unable to watch socket {fd}: {exc}")
+
+    def _on_timer(self, timeout_ms):
+        """
+        curl callback, sets when curl needs to be called on timeout.
+        """
+        self.timer_due = None if timeout_ms < 0 else time.time() + timeout_ms / 1000
+
+    def _socket_action(self, fd, events):
+        while True:
+            ret, num_handles = self.m.socket_action(fd, events)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            pass  #: a wakeup is already pending
+
+    def _drain(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _run_calls(self):
+        while self.calls:
+            job = self.calls.popleft()
+            try:
+                job[3] = job[0](*job[1])
+            except Exception as exc:
+                job[4] = exc
+            job[2].set()
+
+    def _run(self):
+        while True:
+            self._run_calls()
+
+            timeout = min(
+                (d.timeout() for d, state in self.transfers.items() if not state[1]),
+                default=1,
+            )
+            try:
+                self.poll(timeout)
+            except Exception as exc:
+                self.log.error(f"Curl reactor error: {exc}", exc_info=True)
+
+            self._run_calls()
+
+            for download, state in self.transfers.items():
+                if not state[1] and download.due():
+                    state[1] = True
+                    state[0].set()
@@ -7,6 +7,8 @@ from .browser import Browser
 from .bucket import Bucket
 from .cookie_jar import CookieJar
 from .http.http_request import HTTPRequest
+from .reactor import CurlReactor
+from .xdcc.reactor import DCCReactor
 from .xdcc.request import XDCCRequest
 
 DEFAULT_REQUEST = None
@@ -18,7 +20,11 @@ class RequestFactory:
         self.pyload = core
         self._ = core._
         self.bucket = Bucket()
+        self.buckets = {}  #: (plugin name, account) -> bucket below the global one
+        self.package_weights = {}  #: package id -> share of bandwidth, default 1
         self.update_bucket()
+        self.reactor = None  #: started on first use, see `get_reactor`
+        self.dcc_reactor = None  #: receives all xdcc transfers, started on first use
         self.cookiejars = {}
 
         # TODO: Rewrite...
@@ -34,11 +40,13 @@ class RequestFactory:
         options = self.get_options()
         options.update(kwargs)  #: submit kwargs as additional options
 
+        bucket = self.get_bucket(plugin_name, account)
+
         if type == "XDCC":
-            req = XDCCRequest(self.bucket, options)
+            req = XDCCRequest(bucket, options, self.get_dcc_reactor())
 
         else:
-            req = Browser(self.bucket, options)
+            req = Browser(bucket, options, self.get_reactor())
 
             if account:
                 cj = self.get_cookie_jar(plugin_name, account)
@@ -64,6 +72,26 @@ class RequestFactory:
             rep = h.load(*args, **kwargs)
         return rep
 
+    def get_reactor(self):
+        """
+        returns the reactor shared by all downloads, None if they should run their own.
+        """
+        if not self.pyload.config.get("download", "multiplex"):
+            return None
+
+        if self.reactor is None:
+            self.reactor = CurlReactor()
+            self.reactor.start()
+
+        return self.reactor
+
+    def get_dcc_reactor(self):
+        if self.dcc_reactor is None:
+            self.dcc_reactor = DCCReactor()
+            self.dcc_reactor.start()
+
+        return self.dcc_reactor
+
     def get_cookie_jar(self, plugin_name, account=None):
         if (plugin_name, account) in self.cookiejars:
             return self.cookiejars[(plugin_name, account)]
@@ -116,8 +144,54 @@ class RequestFactory:
             "interface": self.iface(),
             "proxies": self.get_proxies(),
             "ipv6": self.pyload.config.get("download", "ipv6"),
+            "direct_write": self.pyload.config.get("download", "direct_write"),
         }
 
+    def get_bucket(self, plugin_name, account=None):
+        """
+        returns the bucket limiting a plugin, or one of its accounts.
+        """
+        key = (plugin_name, account)
+        if key not in self.buckets:
+            if account is None:
+                bucket = Bucket(plugin_name, self.bucket)
+            else:
+                bucket = Bucket(f"{plugin_name}/{account}", self.get_bucket(plugin_name))
+            bucket.set_rate(self._get_bucket_rate(key))
+            self.buckets[key] = bucket
+
+        return self.buckets[key]
+
+    def _get_bucket_rate(self, key):
+        plugin_name, account = key
+        if account is None:
+            for limit in self.pyload.config.get("download", "plugin_speed").split(","):
+                name, _, speed = limit.partition(":")
+                if name.strip() == plugin_name:
+                    try:
+                        return int(speed) << 10
+                    except ValueError:
+                        break
+            return -1
+
+        try:
+            options = self.pyload.account_manager.accounts[plugin_name][account]["options"]
+            return int(options["max_speed"][0]) << 10
+        except (AttributeError, KeyError, IndexError, ValueError, TypeError):
+            return -1
+
+    def get_weight(self, package_id):
+        return self.package_weights.get(package_id, 1)
+
+    def set_weight(self, package_id, weight):
+        """
+        sets the share of bandwidth downloads of a package get from now on.
+        """
+        if weight == 1:
+            self.package_weights.pop(package_id, None)
+        else:
+            self.package_weights[package_id] = max(1, int(weight))
+
     def update_bucket(self):
         """
         set values in the bucket according to settings.
@@ -127,6 +201,9 @@ class RequestFactory:
         else:
             self.bucket.set_rate(self.pyload.config.get("download", "max_speed") << 10)
 
+        for key, bucket in list(self.buckets.items()):
+            bucket.set_rate(self._get_bucket_rate(key))
+
 
 def get_url(*args, **kwargs):
     return DEFAULT_REQUEST.get_url(*args, **kwargs)
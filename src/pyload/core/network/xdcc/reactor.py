@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import selectors
+import socket
+import time
+from collections import deque
+from logging import getLogger
+from threading import Event, Thread
+
+from pyload import APPID
+
+from ..exceptions import Abort
+
+
+class DCCReactor:
+    """
+    receives the data of dcc transfers, all of them in one thread once started.
+
+    Sockets are read with `recv_into` into a single reusable buffer and every
+    round of reads is acknowledged once. A transfer over its rate limit is not
+    slept on: its socket is just left out of the selector until it may go on.
+    Without a thread, `transfer` drives the reactor from the calling thread.
+    """
+
+    BUFFER_SIZE = 64 << 10  #: bytes received with one call
+    READ_LIMIT = 256 << 10  #: max bytes read from one socket per round
+    TICK = 1  #: seconds between progress updates
+
+    def __init__(self):
+        self.log = getLogger(APPID)
+
+        self.selector = selectors.DefaultSelector()
+        self.buffer = bytearray(self.BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+
+        self.transfers = {}  #: request -> [done event, exception]
+        self.paused = []  #: heap of (paused until, counter, request, socket)
+        self.counter = itertools.count()
+        self.next_tick = time.time() + self.TICK
+
+        self.thread = None
+        self.pending = deque()  #: requests waiting to be added by the reactor thread
+        self._wakeup_r = self._wakeup_w = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """
+        starts the reactor thread, transfers will be multiplexed from now on.
+        """
+        if self.thread:
+            return
+
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ)
+
+        self.thread = Thread(target=self._run, name="DCCReactor", daemon=True)
+        self.thread.start()
+
+    def transfer(self, req):
+        """
+        receives the data of req until the sender is done, raises its errors.
+        """
+        state = [Event(), None]
+
+        if self.running:
+            self.pending.append((req, state))
+            self.wakeup()
+            state[0].wait()
+
+        else:
+            self._add(req, state)
+            while not state[0].is_set():
+                self.poll()
+
+        if state[1] is not None:
+            raise state[1]
+
+    def wakeup(self):
+        """
+        makes the reactor thread look at new and aborted transfers.
+        """
+        if self._wakeup_w is None:
+            return
+        try:
+            self._wakeup_w.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            pass  #: a wakeup is already pending
+
+    def poll(self):
+        """
+        waits until a socket is ready or a paused transfer may go on, then receives
+        what arrived.
+        """
+        now = time.time()
+        timeout = self.next_tick - now
+        if self.paused:
+            timeout = min(timeout, self.paused[0][0] - now)
+
+        for key, mask in self.selector.select(max(0, timeout)):
+            if key.fileobj is self._wakeup_r:
+                self._drain()
+            else:
+                self._receive(key.data)
+
+        now = time.time()
+        while self.paused and self.paused[0][0] <= now:
+            req, sock = heapq.heappop(self.paused)[2:]
+            if req in self.transfers and req.dccsock is sock:
+                self.selector.register(sock, selectors.EVENT_READ, req)
+
+        for req in [req for req in self.transfers if req.abort]:
+            self._finish(req, Abort())
+
+        if now >= self.next_tick:
+            self.next_tick = now + self.TICK
+            for req in list(self.transfers):
+                try:
+                    req.update_speed(now)
+                except Exception as exc:
+                    self._finish(req, exc)
+
+    def _add(self, req, state):
+        self.transfers[req] = state
+        req.dccsock.setblocking(False)
+        self.selector.register(req.dccsock, selectors.EVENT_READ, req)
+
+    def _receive(self, req):
+        sock = req.dccsock
+        bucket = req.bucket
+        limit = self.READ_LIMIT if bucket is None else bucket.get_batch_size()
+
+        total = 0
+        try:
+            while total < limit:
+                try:
+                    size = sock.recv_into(self.buffer)
+                except (BlockingIOError, InterruptedError):
+                    break
+
+                if not size or req.filesize and req.received + size > req.filesize:
+                    self._finish(req)
+                    return
+
+                req.write(self.view[:size])
+                total += size
+
+        except Exception as exc:
+            self._finish(req, exc)
+            return
+
+        if not total:
+            return
+
+        #: one ack for everything read in this round
+        req.send_ack()
+
+        if bucket is not None:
+            wait = bucket.consumed(total)
+            if wait:
+                self.selector.unregister(sock)
+                heapq.heappush(
+                    self.paused, (time.time() + wait, next(self.counter), req, sock)
+                )
+
+    def _finish(self, req, exc=None):
+        state = self.transfers.pop(req)
+        try:
+            self.selector.unregister(req.dccsock)
+        except KeyError:
+            pass  #: paused
+        req.dccsock.close()
+
+        state[1] = exc
+        state[0].set()
+
+    def _drain(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _run(self):
+        while True:
+            while self.pending:
+                req, state = self.pending.popleft()
+                try:
+                    self._add(req, state)
+                except Exception as exc:
+                    state[1] = exc
+                    state[0].set()
+
+            try:
+                self.poll()
+            except Exception as exc:
+                self.log.error(f"DCC reactor error: {exc}", exc_info=True)
@@ -1,29 +1,30 @@
 # -*- coding: utf-8 -*-
 
-import errno
 import os
-import select
 import socket
 import struct
 import time
 
-from ..exceptions import Abort
+from .reactor import DCCReactor
 
 
 class XDCCRequest:
-    def __init__(self, bucket=None, options={}):
+    def __init__(self, bucket=None, options={}, reactor=None):
         self.proxies = options.get("proxies", {})
         self.bucket = bucket
 
+        #: receives the data, a private one is driven by the downloading thread
+        self.reactor = reactor or DCCReactor()
+
         self.fh = None
         self.dccsock = None
 
         self.filesize = 0
         self.received = 0
         self.speeds = [0.0, 0.0, 0.0]
+        self.num_recv_len = 0
+        self.last_update = 0
 
-        self.sleep = 0.000
-        self.last_recv_size = 0
         self.send_64bits_ack = False
 
         self.abort = False
@@ -52,31 +53,12 @@ class XDCCRequest:
 
         return sock
 
-    def _write_func(self, buf):
-        size = len(buf)
-
-        self.received += size
-
+    def write(self, buf):
         self.fh.write(buf)
+        self.received += len(buf)
+        self.num_recv_len += len(buf)
 
-        if self.bucket:
-            time.sleep(self.bucket.consumed(size))
-
-        else:
-            # Avoid small buffers, increasing sleep time slowly if buffer size gets smaller
-            # otherwise reduce sleep time percentequal (values are based on tests)
-            # So in general cpu time is saved without reducing bandwidth too much
-
-            if size < self.last_recv_size:
-                self.sleep += 0.002
-            else:
-                self.sleep *= 0.7
-
-            self.last_recv_size = size
-
-            time.sleep(self.sleep)
-
-    def _send_ack(self):
+    def send_ack(self):
         # acknowledge data by sending number of received bytes
         try:
             self.dccsock.send(
@@ -105,62 +87,16 @@ class XDCCRequest:
         else:
             self.fh = open(chunk_name, mode="wb")
 
-        last_update = time.time()
-        num_recv_len = 0
+        self.num_recv_len = 0
+        self.last_update = time.time()
 
         self.dccsock = self.create_socket()
-
-        recv_list = [self.dccsock]
-        self.dccsock.connect((ip, port))
-        self.dccsock.setblocking(0)
-
-        # recv loop for dcc socket
-        while True:
-            if self.abort:
-                self.dccsock.close()
-                self.fh.close()
-                raise Abort
-
-            fdset = select.select(recv_list, [], [], 0.1)
-            if self.dccsock in fdset[0]:
-                try:
-                    data = self.dccsock.recv(16384)
-
-                except socket.error as exc:
-                    if exc.errno == errno.EAGAIN or exc.errno == errno.EWOULDBLOCK:
-                        continue
-
-                    else:
-                        raise
-
-                data_len = len(data)
-                if (
-                    data_len == 0
-                    or self.filesize
-                    and self.received + data_len > self.filesize
-                ):
-                    break
-
-                num_recv_len += data_len
-
-                self._write_func(data)
-                self._send_ack()
-
-            now = time.time()
-            timespan = now - last_update
-            if timespan > 1:
-                # calc speed once per second, averaging over 3 seconds
-                self.speeds[2] = self.speeds[1]
-                self.speeds[1] = self.speeds[0]
-                self.speeds[0] = num_recv_len // timespan
-
-                num_recv_len = 0
-                last_update = now
-
-                self.update_progress()
-
-        self.dccsock.close()
-        self.fh.close()
+        try:
+            self.dccsock.connect((ip, port))
+            self.reactor.transfer(self)
+        finally:
+            self.dccsock.close()
+            self.fh.close()
 
         os.rename(chunk_name, filename)
 
@@ -168,6 +104,24 @@ class XDCCRequest:
 
     def abort_downloads(self):
         self.abort = True
+        self.reactor.wakeup()
+
+    def update_speed(self, now):
+        """
+        called by the reactor once per second, averaging the speed over 3 seconds.
+        """
+        timespan = now - self.last_update
+        if timespan <= 0:
+            return
+
+        self.speeds[2] = self.speeds[1]
+        self.speeds[1] = self.speeds[0]
+        self.speeds[0] = self.num_recv_len // timespan
+
+        self.num_recv_len = 0
+        self.last_update = now
+
+        self.update_progress()
 
     def update_progress(self):
         if self.status_notify:
@@ -4,22 +4,28 @@ import inspect
 import os
 import shutil
 import sqlite3
+import time
 
 from contextlib import closing
-from queue import Queue
-from threading import Event, Thread
+from urllib.request import pathname2url
+from queue import Empty, Queue
+from threading import Event, Lock, Thread, current_thread, local
 
 from ... import exc_logger
 from ..database import FileDatabaseMethods, StorageDatabaseMethods, UserDatabaseMethods
+from ..database.file_database import DONE_STATUS
 from ..utils.struct.style import style
 
 # DATABASE VERSION
-__version__ = 4
+__version__ = 5
 
 # TODO: rewrite using peewee
 class DatabaseJob:
+    #: remember where jobs were queued from, costly so only done when tracing
+    trace = False
+
     def __init__(self, f, *args, **kwargs):
-        self.done = Event()
+        self.done = None  #: set by the ones waiting for the result
 
         self.f = f
         self.args = args
@@ -28,9 +34,11 @@ class DatabaseJob:
         self.result = None
         self.exception = False
 
-        self.frame = inspect.currentframe()
+        self.frame = inspect.currentframe() if self.trace else None
 
     def __repr__(self):
+        if self.frame is None:
+            return f"DataBase Job {self.f.__name__}:{self.args[1:]}\n Result: {self.result}"
 
         frame = self.frame.f_back
         output = ""
@@ -54,8 +62,6 @@ class DatabaseJob:
             msg = f"Database Error @ {self.f.__name__} {self.args[1:]} {self.kwargs}"
             exc_logger.exception(msg)
             self.exception = exc
-        finally:
-            self.done.set()
 
     def wait(self):
         self.done.wait()
@@ -68,6 +74,10 @@ class DatabaseThread(Thread):
     DB_FILENAME = "pyload.db"
     VERSION_FILENAME = "db.version"
 
+    #: jobs run in one transaction, committed after this many jobs or seconds
+    COMMIT_JOBS = 1000
+    COMMIT_INTERVAL = 0.5
+
     def __init__(self, core):
         super().__init__()
         self.daemon = True
@@ -82,6 +92,23 @@ class DatabaseThread(Thread):
 
         self.jobs = Queue()
 
+        self.transaction_start = None  #: time the open transaction began
+        self.transaction_jobs = 0  #: jobs run in it so far
+
+        #: reads bypass the queue only when no job is pending and everything is committed
+        self.count_lock = Lock()
+        self.queued = 0
+        self.processed = 0
+        self.dirty = False
+        self.committed_changes = 0
+
+        self.local = local()  #: per thread read connection and wait event
+        self.read_uri = "file:{}?mode=ro".format(
+            pathname2url(os.path.abspath(self.db_path))
+        )
+
+        DatabaseJob.trace = core.debug > 1
+
         self.setuplock = Event()
 
         style.set_db(self)
@@ -99,6 +126,11 @@ class DatabaseThread(Thread):
         self.conn = sqlite3.connect(self.db_path, isolation_level=None)
         os.chmod(self.db_path, 0o600)
 
+        #: readers don't block the writer and commits don't wait for fsync,
+        #: the database still can't get corrupted by a crash
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
         self.c = self.conn.cursor()  #: compatibility
 
         if convert is not None:
@@ -112,16 +144,59 @@ class DatabaseThread(Thread):
         self.setuplock.set()
 
         while True:
-            j = self.jobs.get()
+            try:
+                j = self.jobs.get(timeout=self._commit_timeout())
+            except Empty:
+                self._commit()
+                continue
+
             if j == "quit":
+                self._commit()
                 self.c.close()
                 self.conn.close()
                 break
+
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+                self.transaction_start = time.time()
+
             j.process_job()
 
+            self.transaction_jobs += 1
+            if self.transaction_jobs >= self.COMMIT_JOBS or not self._commit_timeout():
+                self._commit()
+            else:
+                self.dirty = self.conn.total_changes != self.committed_changes
+
+            self.processed += 1
+            if j.done is not None:
+                j.done.set()
+
+    def _commit_timeout(self):
+        """
+        how long to wait for jobs before the open transaction is due, None if there is none.
+        """
+        if self.transaction_start is None:
+            return None
+        return max(0, self.transaction_start + self.COMMIT_INTERVAL - time.time())
+
+    def _commit(self):
+        try:
+            if self.conn.in_transaction:
+                self.conn.commit()
+        except sqlite3.Error:
+            exc_logger.exception("Database Error @ commit")
+            self.transaction_start = time.time()  #: kept open, retried later
+            self.dirty = True
+        else:
+            self.transaction_start = None
+            self.transaction_jobs = 0
+            self.committed_changes = self.conn.total_changes
+            self.dirty = False
+
     @style.queue
     def shutdown(self):
-        self.conn.commit()
+        self._commit()
         self.jobs.put("quit")
 
     def _check_version(self):
@@ -167,6 +242,13 @@ class DatabaseThread(Thread):
             'CREATE TABLE IF NOT EXISTS "users" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "email" TEXT DEFAULT "" NOT NULL, "password" TEXT NOT NULL, "role" INTEGER DEFAULT 0 NOT NULL, "permission" INTEGER DEFAULT 0 NOT NULL, "template" TEXT DEFAULT "default" NOT NULL)'
         )
         self.pyload.log.info(self._("Database was converted from v3 to v4."))
+        self._convertV4()
+
+    def _convertV4(self):
+        self.c.execute('DROP VIEW IF EXISTS "pstats"')
+        self._create_package_stats()
+        self._check_package_stats()
+        self.pyload.log.info(self._("Database was converted from v4 to v5."))
 
     # --convert scripts end
 
@@ -181,6 +263,15 @@ class DatabaseThread(Thread):
             'CREATE TABLE IF NOT EXISTS "links" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "url" TEXT NOT NULL, "name" TEXT, "size" INTEGER DEFAULT 0 NOT NULL, "status" INTEGER DEFAULT 3 NOT NULL, "plugin" TEXT DEFAULT "DefaultPlugin" NOT NULL, "error" TEXT DEFAULT "", "linkorder" INTEGER DEFAULT 0 NOT NULL, "package" INTEGER DEFAULT 0 NOT NULL, FOREIGN KEY(package) REFERENCES packages(id))'
         )
         self.c.execute('CREATE INDEX IF NOT EXISTS "p_id_index" ON links(package)')
+        self.c.execute(
+            'CREATE INDEX IF NOT EXISTS "l_status_plugin_index" ON links(status, plugin)'
+        )
+        self.c.execute(
+            'CREATE INDEX IF NOT EXISTS "l_order_index" ON links(package, linkorder)'
+        )
+        self.c.execute(
+            'CREATE INDEX IF NOT EXISTS "p_order_index" ON packages(queue, packageorder)'
+        )
         self.c.execute(
             'CREATE TABLE IF NOT EXISTS "storage" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "identifier" TEXT NOT NULL, "key" TEXT NOT NULL, "value" TEXT DEFAULT "")'
         )
@@ -188,14 +279,7 @@ class DatabaseThread(Thread):
             'CREATE TABLE IF NOT EXISTS "users" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "email" TEXT DEFAULT "" NOT NULL, "password" TEXT NOT NULL, "role" INTEGER DEFAULT 0 NOT NULL, "permission" INTEGER DEFAULT 0 NOT NULL, "template" TEXT DEFAULT "default" NOT NULL)'
         )
 
-        self.c.execute(
-            'CREATE VIEW IF NOT EXISTS "pstats" AS \
-        SELECT p.id AS id, SUM(l.size) AS sizetotal, COUNT(l.id) AS linkstotal, linksdone, sizedone\
-        FROM packages p JOIN links l ON p.id = l.package LEFT OUTER JOIN\
-        (SELECT p.id AS id, COUNT(*) AS linksdone, SUM(l.size) AS sizedone \
-        FROM packages p JOIN links l ON p.id = l.package AND l.status in (0,4,13) GROUP BY p.id) s ON s.id = p.id \
-        GROUP BY p.id'
-        )
+        self._create_package_stats()
 
         # try to lower ids
         self.c.execute("SELECT max(id) FROM LINKS")
@@ -216,7 +300,48 @@ class DatabaseThread(Thread):
             "UPDATE SQLITE_SEQUENCE SET seq=? WHERE name=?", (pid, "packages")
         )
 
-        self.c.execute("VACUUM")
+    def _create_package_stats(self):
+        """
+        creates the table keeping link count and size of each package, done and in
+        total, and the triggers updating it on every change of the links.
+        """
+        self.c.execute(
+            'CREATE TABLE IF NOT EXISTS "pstats" ("id" INTEGER PRIMARY KEY, "linkstotal" INTEGER DEFAULT 0 NOT NULL, "linksdone" INTEGER DEFAULT 0 NOT NULL, "sizetotal" INTEGER DEFAULT 0 NOT NULL, "sizedone" INTEGER DEFAULT 0 NOT NULL)'
+        )
+        add = f"""
+            INSERT OR IGNORE INTO pstats(id) VALUES (NEW.package);
+            UPDATE pstats SET linkstotal=linkstotal+1, sizetotal=sizetotal+NEW.size,
+                linksdone=linksdone+(NEW.status IN {DONE_STATUS}),
+                sizedone=sizedone+(NEW.status IN {DONE_STATUS})*NEW.size
+            WHERE id=NEW.package;
+        """
+        remove = f"""
+            UPDATE pstats SET linkstotal=linkstotal-1, sizetotal=sizetotal-OLD.size,
+                linksdone=linksdone-(OLD.status IN {DONE_STATUS}),
+                sizedone=sizedone-(OLD.status IN {DONE_STATUS})*OLD.size
+            WHERE id=OLD.package;
+        """
+        self.c.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "pstats_insert" AFTER INSERT ON links BEGIN {add} END'
+        )
+        self.c.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "pstats_delete" AFTER DELETE ON links BEGIN {remove} END'
+        )
+        self.c.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "pstats_update" AFTER UPDATE OF size, status ON links \
+            WHEN OLD.package = NEW.package AND (OLD.size != NEW.size OR OLD.status != NEW.status) BEGIN \
+            UPDATE pstats SET sizetotal=sizetotal-OLD.size+NEW.size, \
+                linksdone=linksdone-(OLD.status IN {DONE_STATUS})+(NEW.status IN {DONE_STATUS}), \
+                sizedone=sizedone-(OLD.status IN {DONE_STATUS})*OLD.size+(NEW.status IN {DONE_STATUS})*NEW.size \
+            WHERE id=NEW.package; END'
+        )
+        self.c.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "pstats_move" AFTER UPDATE OF package ON links \
+            WHEN OLD.package != NEW.package BEGIN {remove} {add} END'
+        )
+        self.c.execute(
+            'CREATE TRIGGER IF NOT EXISTS "pstats_package_delete" AFTER DELETE ON packages BEGIN DELETE FROM pstats WHERE id=OLD.id; END'
+        )
 
     def _migrate_user(self):
         if os.path.exists("pyload.db"):
@@ -240,30 +365,81 @@ class DatabaseThread(Thread):
     def create_cursor(self):
         return self.conn.cursor()
 
-    @style.async_
     def commit(self):
-        self.conn.commit()
+        """
+        changes get committed together every `COMMIT_INTERVAL` seconds anyway, use
+        `sync_save` to write them right now.
+        """
+        pass
 
     @style.queue
     def sync_save(self):
-        self.conn.commit()
+        self._commit()
+
+    @style.queue
+    def vacuum(self):
+        """
+        rebuilds the database file to give back unused space, slow on big databases.
+        """
+        self._commit()  #: can't run inside a transaction
+        self.c.execute("VACUUM")
+        self.c.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
 
     @style.async_
     def rollback(self):
         self.conn.rollback()
 
+    def _put(self, job):
+        with self.count_lock:
+            self.queued += 1
+            self.jobs.put(job)
+
     def async_(self, f, *args, **kwargs):
         args = (self,) + args
         job = DatabaseJob(f, *args, **kwargs)
-        self.jobs.put(job)
+        self._put(job)
 
     def queue(self, f, *args, **kwargs):
         args = (self,) + args
         job = DatabaseJob(f, *args, **kwargs)
-        self.jobs.put(job)
+
+        #: every thread waits for one job at a time, so its event can be reused
+        job.done = getattr(self.local, "done", None)
+        if job.done is None:
+            job.done = self.local.done = Event()
+        job.done.clear()
+
+        self._put(job)
         job.wait()
         return job.result
 
+    def read(self, f, *args, **kwargs):
+        """
+        runs a read only query right in the calling thread on its own connection,
+        through the queue if that could miss changes not committed yet.
+        """
+        if current_thread() is self:
+            return f(self, *args, **kwargs)
+
+        if (
+            self.queued != self.processed
+            or self.dirty
+            or not self.setuplock.is_set()
+        ):
+            return self.queue(f, *args, **kwargs)
+
+        reader = getattr(self.local, "reader", None)
+        try:
+            if reader is None:
+                conn = sqlite3.connect(self.read_uri, uri=True)
+                reader = self.local.reader = DatabaseReader(self, conn)
+            return f(reader, *args, **kwargs)
+
+        except sqlite3.Error:
+            exc_logger.exception(f"Database Error @ {f.__name__} {args} {kwargs}")
+            self.local.reader = None
+            return self.queue(f, *args, **kwargs)
+
     @classmethod
     def register_sub(cls, klass):
         cls.subs.append(klass)
@@ -282,6 +458,20 @@ class DatabaseThread(Thread):
         )
 
 
+class DatabaseReader:
+    """
+    stands in for the `DatabaseThread` when running read only queries outside of it.
+    """
+
+    def __init__(self, db, conn):
+        self.db = db
+        self.conn = conn
+        self.c = conn.cursor()
+
+    def __getattr__(self, attr):
+        return getattr(self.db, attr)
+
+
 DatabaseThread.register_sub(FileDatabaseMethods)
 DatabaseThread.register_sub(UserDatabaseMethods)
 DatabaseThread.register_sub(StorageDatabaseMethods)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import time
+from collections import deque
+from threading import Condition, Lock, Thread, current_thread
+
+
+class EventBus:
+    """
+    runs addon hooks and event listeners in a small pool of worker threads.
+
+    Every addon gets its own queue: its jobs run one after another in the order
+    they were posted, so a slow addon only delays itself and holds at most one
+    worker. Posting to a full queue waits a while for room, then drops the job;
+    posting with `wait=False` drops it right away.
+    Hooks run in the calling thread go through `call` to be timed as well.
+    """
+
+    WORKERS = 4  #: max worker threads
+    QUEUE_SIZE = 100  #: max pending jobs per addon
+    PUT_TIMEOUT = 10  #: seconds to wait on a full queue
+
+    def __init__(self, manager):
+        self.pyload = manager.pyload
+        self._ = manager._
+
+        self.cond = Condition()
+        self.queues = {}  #: owner -> pending jobs
+        self.ready = deque()  #: owners with jobs and no worker running one of them
+        self.busy = set()  #: owners a worker is running a job of
+        self.workers = []
+        self.idle = 0
+        self.running = True
+
+        #: (owner, hook) -> [calls, seconds, max seconds, errors, dropped]
+        self.stats = {}
+        self.stats_lock = Lock()
+
+    def _record(self, owner, hook, elapsed=None, error=False, dropped=False):
+        with self.stats_lock:
+            try:
+                stats = self.stats[owner, hook]
+            except KeyError:
+                stats = self.stats[owner, hook] = [0, 0.0, 0.0, 0, 0]
+
+            if elapsed is not None:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+            if error:
+                stats[3] += 1
+            if dropped:
+                stats[4] += 1
+
+    def get_stats(self):
+        """
+        returns a copy of the stats of every (owner, hook) called so far.
+        """
+        with self.stats_lock:
+            return {key: list(stats) for key, stats in self.stats.items()}
+
+    def call(self, owner, hook, func, *args):
+        """
+        runs func right away, recording how long it takes.
+        """
+        error = False
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._record(owner, hook, time.perf_counter() - start, error)
+
+    def post(self, owner, hook, func, *args, wait=True):
+        """
+        queues func to run in a worker thread after the jobs already queued by owner,
+        returns False if it was dropped.
+        """
+        with self.cond:
+            queue = self.queues.setdefault(owner, deque())
+
+            if len(queue) >= self.QUEUE_SIZE and wait:
+                deadline = time.time() + self.PUT_TIMEOUT
+                while len(queue) >= self.QUEUE_SIZE and time.time() < deadline:
+                    self.cond.wait(deadline - time.time())
+
+            if len(queue) >= self.QUEUE_SIZE:
+                self._record(owner, hook, dropped=True)
+                self.pyload.log.warning(
+                    self._("{} is not keeping up, dropped its {} event").format(
+                        owner, hook
+                    )
+                )
+                return False
+
+            queue.append((hook, func, args))
+            if owner not in self.busy and owner not in self.ready:
+                self.ready.append(owner)
+
+            if not self.idle and len(self.workers) < self.WORKERS:
+                thread = Thread(target=self._run, name="EventBus", daemon=True)
+                self.workers.append(thread)
+                thread.start()
+
+            self.cond.notify_all()
+            return True
+
+    def pending(self, owner):
+        return len(self.queues.get(owner, ()))
+
+    def stop(self):
+        """
+        lets the workers finish the queued jobs and exit.
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.ready:
+                    if not self.running:
+                        self.workers.remove(current_thread())
+                        return
+                    self.idle += 1
+                    self.cond.wait()
+                    self.idle -= 1
+
+                owner = self.ready.popleft()
+                self.busy.add(owner)
+                hook, func, args = self.queues[owner].popleft()
+                self.cond.notify_all()  #: there is room for posters now
+
+            try:
+                self.call(owner, hook, func, *args)
+            except Exception as exc:
+                self.pyload.log.warning(
+                    self._("Error calling event handler {}: {}, {}, {}").format(
+                        hook, func, args, exc
+                    ),
+                    exc_info=self.pyload.debug > 1,
+                    stack_info=self.pyload.debug > 2,
+                )
+
+            with self.cond:
+                self.busy.discard(owner)
+                if self.queues[owner]:
+                    self.ready.append(owner)
@@ -182,6 +182,80 @@ def checksum(filename, chkname, buffering=None):
     return res
 
 
+class _ZlibChecksum:
+    """
+    adler32 or crc32 with the interface of the hashlib objects.
+    """
+
+    def __init__(self, chkname):
+        self.name = chkname
+        self.func = getattr(zlib, chkname)
+        self.value = self.func(b"")
+
+    def update(self, data):
+        self.value = self.func(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value & 0xffffffff:08x}"
+
+
+def new_checksum(chkname):
+    """
+    returns an object computing chkname incrementally, None if it is not supported.
+    """
+    if chkname in ("adler32", "crc32"):
+        return _ZlibChecksum(chkname) if zlib else None
+    elif chkname in hashlib.algorithms_available:
+        return hashlib.new(chkname)
+    return None
+
+
+class ChecksumStream:
+    """
+    computes checksums of a file while it gets written, in any order.
+
+    Data is fed together with its position in the file, only data continuing the
+    part hashed so far is used. `finish` reads whatever was skipped from the file.
+    """
+
+    def __init__(self, chknames):
+        self.chknames = [name for name in chknames if new_checksum(name)]
+        self.reset()
+
+    def reset(self):
+        self.checksums = [new_checksum(name) for name in self.chknames]
+        self.pos = 0  #: bytes hashed so far
+
+    def update(self, pos, data):
+        """
+        feeds data written at file position pos, returns False if it came too early.
+        """
+        if pos > self.pos:
+            return False
+
+        skip = self.pos - pos
+        if skip < len(data):
+            data = memoryview(data)[skip:]
+            for checksum in self.checksums:
+                checksum.update(data)
+            self.pos += len(data)
+        return True
+
+    def finish(self, filename, buffering=None):
+        """
+        hashes the rest of the file, returns the checksums as dict.
+        """
+        with io.open(filename, mode="rb") as fp:
+            fp.seek(self.pos)
+            for chunk in bufread(fp, buffering or 128 * blksize(filename)):
+                self.update(self.pos, chunk)
+
+        return {
+            name: checksum.hexdigest()
+            for name, checksum in zip(self.chknames, self.checksums)
+        }
+
+
 def is_exec(filename):
     return os.path.isfile(filename) and os.access(filename, os.X_OK)
 
@@ -204,6 +278,46 @@ def flush(filename, exist_ok=False):
         os.fsync(fp.fileno())
 
 
+def copyfileobj(fsrc, fdst):
+    """
+    Copy the rest of fsrc into fdst, starting at the current position of both.
+
+    Data is moved in kernel space through `copy_file_range` or `sendfile` where
+    the platform supports it, falling back to a buffered userspace copy.
+    """
+    fdst.flush()
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+    src_pos, dst_pos = fsrc.tell(), fdst.tell()
+    left = os.fstat(src_fd).st_size - src_pos
+    copied = 0
+
+    try:
+        if hasattr(os, "copy_file_range"):
+            while copied < left:
+                n = os.copy_file_range(
+                    src_fd, dst_fd, left - copied, src_pos + copied, dst_pos + copied
+                )
+                if not n:
+                    break
+                copied += n
+
+        elif hasattr(os, "sendfile") and os.name != "nt":
+            os.lseek(dst_fd, dst_pos, os.SEEK_SET)
+            while copied < left:
+                n = os.sendfile(dst_fd, src_fd, src_pos + copied, left - copied)
+                if not n:
+                    break
+                copied += n
+
+    except OSError:
+        pass  #: not supported for these files, copy the rest the slow way
+
+    fsrc.seek(src_pos + copied)
+    fdst.seek(dst_pos + copied)
+    if copied < left:
+        shutil.copyfileobj(fsrc, fdst, blksize(fsrc.name) or 64 << 10)
+
+
 def merge(dst_file, src_file):
     with io.open(dst_file, mode="ab") as dfp:
         with io.open(src_file, mode="rb") as sfp:
@@ -31,3 +31,11 @@ class style:
             return cls.db.async_(fn, *args, **kwargs)
 
         return x
+
+    @classmethod
+    def read(cls, fn):
+        @staticmethod
+        def x(*args, **kwargs):
+            return cls.db.read(fn, *args, **kwargs)
+
+        return x
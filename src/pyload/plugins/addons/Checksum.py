@@ -26,7 +26,7 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
             h = getattr(hashlib, algorithm)()
 
             with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(128 * h.block_size), ""):
+                for chunk in iter(lambda: fp.read(128 * h.block_size), b""):
                     if abort and abort():
                         return False
 
@@ -40,10 +40,10 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
 
         elif algorithm in ("adler32", "crc32"):
             hf = getattr(zlib, algorithm)
-            last = 0
+            last = hf(b"")
 
             with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(8192), ""):
+                for chunk in iter(lambda: fp.read(8192), b""):
                     if abort and abort():
                         return False
 
@@ -54,7 +54,7 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
                         progress_notify(processed * 100 // file_size)
 
             #: zlib sometimes return negative value
-            return "{:x}".format((2 ** 32 + last) & 0xFFFFFFFF)
+            return "{:08x}".format((2 ** 32 + last) & 0xFFFFFFFF)
 
         else:
             return None
@@ -67,7 +67,7 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
 class Checksum(BaseAddon):
     __name__ = "Checksum"
     __type__ = "addon"
-    __version__ = "0.35"
+    __version__ = "0.36"
     __status__ = "testing"
 
     __config__ = [
@@ -124,11 +124,8 @@ class Checksum(BaseAddon):
 
         self.retries = {}
 
-    def download_finished(self, pyfile):
+    def get_check_data(self, pyfile):
         """
-        Compute checksum for the downloaded file and compare it with the hash provided
-        by the hoster.
-
         pyfile.plugin.check_data should be a dictionary which can
         contain: a) if known, the exact filesize in bytes (e.g. 'size':
         123456789) b) hexadecimal hash string with algorithm name as key
@@ -150,6 +147,43 @@ class Checksum(BaseAddon):
             data.pop("size", None)
 
         else:
+            return None
+
+        return data
+
+    def get_hashes(self, data):
+        hashes = dict(data.get("hash", {}))
+
+        for key in self.algorithms:
+            if key in data and key not in hashes:
+                hashes[key] = data[key]
+                break
+
+        return hashes
+
+    def download_start(self, pyfile, url, filename):
+        """
+        Let the downloader compute the checksums the hoster provides while the data
+        arrives, so the file doesn't have to be read again afterwards.
+        """
+        if not self.config.get("check_checksum") or not hasattr(
+            pyfile.plugin, "stream_checksums"
+        ):
+            return
+
+        data = self.get_check_data(pyfile)
+        if data:
+            pyfile.plugin.stream_checksums.update(
+                key.replace("-", "").lower() for key in self.get_hashes(data)
+            )
+
+    def download_finished(self, pyfile):
+        """
+        Compute checksum for the downloaded file and compare it with the hash provided
+        by the hoster, checksums computed while downloading are used if available.
+        """
+        data = self.get_check_data(pyfile)
+        if data is None:
             return
 
         pyfile.set_status("processing")
@@ -182,61 +216,64 @@ class Checksum(BaseAddon):
         self.log_debug(data)
         #: Validate checksum
         if data and self.config.get("check_checksum"):
-            data["hash"] = data.get("hash", {})
-
-            for key in self.algorithms:
-                if key in data and key not in data["hash"]:
-                    data["hash"][key] = data[key]
-                    break
+            data["hash"] = self.get_hashes(data)
+            computed = getattr(pyfile.plugin, "last_checksums", {})
 
             if len(data["hash"]) > 0:
                 for key in self.algorithms:
-                    if key in data["hash"]:
+                    if key not in data["hash"]:
+                        continue
+
+                    algorithm = key.replace("-", "").lower()
+                    if algorithm in computed:
+                        checksum = computed[algorithm]
+
+                    else:
                         pyfile.set_custom_status(self._("checksum verifying"))
                         try:
                             checksum = compute_checksum(
                                 local_file,
-                                key.replace("-", "").lower(),
+                                algorithm,
                                 progress_notify=pyfile.set_progress,
                                 abort=lambda: pyfile.abort,
                             )
                         finally:
                             pyfile.set_status("processing")
 
-                        if checksum is False:
-                            continue
-
-                        elif checksum is not None:
-                            if checksum.lower() == data["hash"][key].lower():
-                                self.log_info(
-                                    self._(
-                                        'File integrity of "{}" verified by {} checksum ({})'
-                                    ).format(pyfile.name, key.upper(), checksum.lower())
-                                )
-                                pyfile.error = self._("checksum verified")
-                                break
-
-                            else:
-                                self.log_warning(
-                                    self._(
-                                        "{} checksum for file {} does not match ({} != {})"
-                                    ).format(
-                                        key.upper(),
-                                        pyfile.name,
-                                        checksum,
-                                        data["hash"][key].lower(),
-                                    )
-                                )
+                    if checksum is False:
+                        continue
 
-                                self.check_failed(
-                                    pyfile, local_file, "Checksums do not match"
-                                )
+                    elif checksum is not None:
+                        if checksum.lower() == data["hash"][key].lower():
+                            self.log_info(
+                                self._(
+                                    'File integrity of "{}" verified by {} checksum ({})'
+                                ).format(pyfile.name, key.upper(), checksum.lower())
+                            )
+                            pyfile.error = self._("checksum verified")
+                            break
 
                         else:
                             self.log_warning(
-                                self._("Unsupported hashing algorithm"), key.upper()
+                                self._(
+                                    "{} checksum for file {} does not match ({} != {})"
+                                ).format(
+                                    key.upper(),
+                                    pyfile.name,
+                                    checksum,
+                                    data["hash"][key].lower(),
+                                )
                             )
 
+                            self.check_failed(
+                                pyfile, local_file, "Checksums do not match"
+                            )
+
+                    else:
+                        self.log_warning(
+                            self._("Unsupported hashing algorithm"), key.upper()
+                        )
+
                 else:
                     self.log_warning(
                         self._('Unable to validate checksum for file: "{}"').format(
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import math
 import os
+import re
+import time
 from builtins import NameError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
 
 from pyload.core.utils.old import safename
 from pyload.core.utils.purge import uniquify
+from pyload.core.utils.struct.lock import lock
 
 from ..base.addon import BaseAddon, expose, threaded
 from ..base.extractor import ArchiveError, CRCError, PasswordError
@@ -20,6 +26,7 @@ class ArchiveQueue:
     def __init__(self, plugin, storage):
         self.plugin = plugin
         self.storage = storage
+        self.lock = Lock()
 
     def get(self):
         return self.plugin.db.retrieve(self.storage, default=[])
@@ -30,6 +37,7 @@ class ArchiveQueue:
     def delete(self):
         return self.plugin.db.delete(self.storage)
 
+    @lock
     def add(self, item):
         queue = self.get()
         if item not in queue:
@@ -37,6 +45,7 @@ class ArchiveQueue:
         else:
             return True
 
+    @lock
     def remove(self, item):
         queue = self.get()
         try:
@@ -51,10 +60,63 @@ class ArchiveQueue:
         return self.set(queue)
 
 
+class PasswordStats:
+    """
+    how often, how recently and for which hosters and package names the saved
+    passwords worked, used to try the most likely ones first.
+    """
+
+    HALF_LIFE = 30 * 24 * 60 * 60  #: seconds after which a hit counts half as recent
+    MAX_SOURCES = 20  #: hosters and package name words kept per password
+
+    def __init__(self, plugin, storage):
+        self.plugin = plugin
+        self.storage = storage
+        self.lock = Lock()
+        self.stats = None  #: password -> [hits, last hit, sources]
+
+    def get(self):
+        if self.stats is None:
+            self.stats = self.plugin.db.retrieve(self.storage, default={})
+        return self.stats
+
+    @staticmethod
+    def get_sources(pyfile):
+        """
+        hoster and package name words an archive came from.
+        """
+        words = re.findall(r"[^\W\d_]{3,}", pyfile.package().name.lower())
+        return uniquify([pyfile.pluginname.lower()] + words)
+
+    @lock
+    def hit(self, password, sources):
+        stats = self.get()
+        hits, last, known = stats.get(password, (0, 0, []))
+        known = uniquify(list(sources) + known)[: self.MAX_SOURCES]
+        stats[password] = [hits + 1, time.time(), known]
+        self.plugin.db.store(self.storage, stats)
+
+    def score(self, password, sources, now):
+        hits, last, known = self.get().get(password, (0, 0, ()))
+        if not hits:
+            return 0
+        recency = 0.5 ** ((now - last) / self.HALF_LIFE)
+        return math.log1p(hits) + 2 * recency + len(set(sources).intersection(known))
+
+    def rank(self, passwords, sources):
+        """
+        passwords sorted by score, ties keep their order.
+        """
+        now = time.time()
+        return sorted(
+            passwords, key=lambda pw: self.score(pw, sources, now), reverse=True
+        )
+
+
 class ExtractArchive(BaseAddon):
     __name__ = "ExtractArchive"
     __type__ = "addon"
-    __version__ = "1.69"
+    __version__ = "1.71"
     __status__ = "testing"
 
     __config__ = [
@@ -84,6 +146,8 @@ class ExtractArchive(BaseAddon):
         ("recursive", "bool", "Extract archives in archives", True),
         ("waitall", "bool", "Run after all downloads was processed", False),
         ("priority", "int", "Process priority", 0),
+        ("workers", "int", "Packages extracted at the same time (0 for auto)", 0),
+        ("passwordworkers", "int", "Passwords tested at the same time", 4),
     ]
 
     __description__ = """Extract different kind of archives"""
@@ -94,6 +158,8 @@ class ExtractArchive(BaseAddon):
         ("GammaC0de", "nitzo2001[AT]yahoo[DOT]com"),
     ]
 
+    DISK_WORKERS = 2  #: max packages extracted to the same disk at the same time
+
     def init(self):
         self.event_map = {
             "all_downloads_processed": "all_downloads_processed",
@@ -101,11 +167,14 @@ class ExtractArchive(BaseAddon):
         }
 
         self.queue = ArchiveQueue(self, "Queue")
+        self.password_stats = PasswordStats(self, "Passwords")
 
-        self.extracting = False
         self.last_package = False
+        self.failed = False
+        self.active = {}  #: package id -> device it gets extracted on
         self.extractors = []
         self.passwords = []
+        self.passwords_stamp = None  #: mtime and size of the password file read
         self.repair = False
 
     def activate(self):
@@ -138,33 +207,91 @@ class ExtractArchive(BaseAddon):
         else:
             self.log_info(self._("No Extract plugins activated"))
 
+    @property
+    def extracting(self):
+        return bool(self.active)
+
+    def get_workers(self):
+        """
+        number of packages extracted at the same time.
+        """
+        workers = self.config.get("workers")
+        if workers > 0:
+            return workers
+        return max(1, min(4, (os.cpu_count() or 1) // 2))
+
+    def get_device(self, pid):
+        """
+        device the package gets extracted on, None if unknown.
+        """
+        pypack = self.pyload.files.get_package(pid)
+        if not pypack:
+            return None
+
+        path = os.path.join(
+            self.pyload.config.get("general", "storage_folder"),
+            pypack.folder,
+            self.config.get("destination"),
+        )
+        while not exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return None
+
+    def extract_queued(self):
+        """
+        starts extracting queued packages as long as there are free workers.
+        """
+        with self.lock:
+            workers = self.get_workers()
+            for pid in self.queue.get():
+                if len(self.active) >= workers:
+                    break
+
+                if pid in self.active:
+                    continue
+
+                #: Several extractions writing to the same disk just slow each other down
+                device = self.get_device(pid)
+                if (
+                    device is not None
+                    and list(self.active.values()).count(device) >= self.DISK_WORKERS
+                ):
+                    continue
+
+                self.active[pid] = device
+                self.extract_worker(pid)
+
     @threaded
-    def extract_queued(self, thread):
-        # NOTE: doing the check here for safety (called by core_ready)
-        if self.extracting:
-            return
+    def extract_worker(self, pid, thread):
+        success = False
+        try:
+            success = self.extract([pid], thread)
 
-        self.extracting = True
+        except Exception as exc:
+            self.log_error(exc)
+            self.queue.remove(pid)
 
-        packages = self.queue.get()
-        while packages:
-            if self.last_package:  #: Set by all_downloads_processed()
-                self.last_package = False
-                if self.extract(
-                    packages, thread
-                ):  # NOTE: check only if all gone fine, no failed reporting for now
-                    self.m.dispatch_event("all_archives_extracted")
-                self.m.dispatch_event("all_archives_processed")
+        finally:
+            with self.lock:
+                del self.active[pid]
+                self.failed = self.failed or not success
+                done = not self.active and self.last_package and not self.queue.get()
 
-            else:
-                if self.extract(
-                    packages, thread
-                ):  # NOTE: check only if all gone fine, no failed reporting for now
-                    pass
+                if done:  #: Set by all_downloads_processed()
+                    self.last_package = False
+                    failed, self.failed = self.failed, False
 
-            packages = self.queue.get()  #: Check for packages added during extraction
+            if done:
+                # NOTE: check only if all gone fine, no failed reporting for now
+                if not failed:
+                    self.m.dispatch_event("all_archives_extracted")
+                self.m.dispatch_event("all_archives_processed")
 
-        self.extracting = False
+            self.extract_queued()  #: Check for packages added during extraction
 
     #: Deprecated method, use `extract_package` instead
     @expose
@@ -181,7 +308,7 @@ class ExtractArchive(BaseAddon):
         """
         for id in ids:
             self.queue.add(id)
-        if not self.config.get("waitall") and not self.extracting:
+        if not self.config.get("waitall"):
             self.extract_queued()
 
     def package_deleted(self, pid):
@@ -189,12 +316,12 @@ class ExtractArchive(BaseAddon):
 
     def package_finished(self, pypack):
         self.queue.add(pypack.id)
-        if not self.config.get("waitall") and not self.extracting:
+        if not self.config.get("waitall"):
             self.extract_queued()
 
     def all_downloads_processed(self):
         self.last_package = True
-        if self.config.get("waitall") and not self.extracting:
+        if self.config.get("waitall"):
             self.extract_queued()
 
     @expose
@@ -438,53 +565,68 @@ class ExtractArchive(BaseAddon):
         pyfile.set_status("processing")
 
         encrypted = False
+        found = None
+        sources = self.password_stats.get_sources(pyfile)
         try:
             self.log_debug(f"Password: {password or None}")
             passwords = (
-                uniquify([password] + self.get_passwords(False))
+                uniquify(
+                    [password]
+                    + self.password_stats.rank(self.get_passwords(False), sources)
+                )
                 if self.config.get("usepasswordfile")
                 else [password]
             )
 
-            for pw in passwords:
-                try:
-                    pyfile.set_custom_status(self._("archive testing"))
-                    pyfile.set_progress(0)
-                    archive.verify(pw)
-                    pyfile.set_progress(100)
-
-                except PasswordError:
-                    if not encrypted:
-                        self.log_info(name, self._("Password protected"))
-                        encrypted = True
-
-                except CRCError as exc:
-                    self.log_debug(name, exc)
-                    self.log_info(name, self._("CRC Error"))
-
-                    if not self.repair:
-                        raise CRCError("Archive damaged")
-
-                    else:
-                        self.log_warning(name, self._("Repairing..."))
-                        pyfile.set_custom_status(self._("archive repairing"))
+            start = time.time()
+            probes = self.probe_passwords(archive, passwords)
+            try:
+                for pw in probes:
+                    try:
+                        pyfile.set_custom_status(self._("archive testing"))
                         pyfile.set_progress(0)
-                        repaired = archive.repair()
+                        archive.verify(pw)
                         pyfile.set_progress(100)
 
-                        if not repaired and not self.config.get("keepbroken"):
+                    except PasswordError:
+                        if not encrypted:
+                            self.log_info(name, self._("Password protected"))
+                            encrypted = True
+
+                    except CRCError as exc:
+                        self.log_debug(name, exc)
+                        self.log_info(name, self._("CRC Error"))
+
+                        if not self.repair:
                             raise CRCError("Archive damaged")
 
                         else:
-                            self.add_password(pw)
-                            break
+                            self.log_warning(name, self._("Repairing..."))
+                            pyfile.set_custom_status(self._("archive repairing"))
+                            pyfile.set_progress(0)
+                            repaired = archive.repair()
+                            pyfile.set_progress(100)
 
-                except ArchiveError as exc:
-                    raise ArchiveError(exc)
+                            if not repaired and not self.config.get("keepbroken"):
+                                raise CRCError("Archive damaged")
 
-                else:
-                    self.add_password(pw)
-                    break
+                            else:
+                                found = pw
+                                break
+
+                    except ArchiveError as exc:
+                        raise ArchiveError(exc)
+
+                    else:
+                        found = pw
+                        break
+
+            finally:
+                probes.close()  #: no probes may run anymore while extracting
+
+            if found is not None:
+                self.add_password(found, sources)
+                self.report_rank(found, passwords, time.time() - start)
 
             pyfile.set_custom_status(self._("archive extracting"))
             pyfile.set_progress(0)
@@ -495,14 +637,12 @@ class ExtractArchive(BaseAddon):
                 )
                 archive.extract(password)
             else:
-                for pw in [
-                    f for f in uniquify([password] + self.get_passwords(False)) if f
-                ]:
+                for pw in [f for f in uniquify([found] + passwords) if f]:
                     try:
                         self.log_debug(f"Extracting using password: {pw}")
 
                         archive.extract(pw)
-                        self.add_password(pw)
+                        self.add_password(pw, sources)
                         break
 
                     except PasswordError:
@@ -577,6 +717,44 @@ class ExtractArchive(BaseAddon):
 
         raise Exception(self._("Extract failed"))
 
+    def probe_passwords(self, archive, passwords):
+        """
+        yields the passwords worth verifying, the first one right away, the others as
+        soon as they pass the cheap `probe` of the archive, which runs in parallel.
+        """
+        if not passwords:
+            return
+
+        yield passwords[0]
+
+        passwords = passwords[1:]
+        workers = min(self.config.get("passwordworkers"), len(passwords))
+        if workers < 2:
+            yield from passwords
+            return
+
+        def probe(pw):
+            try:
+                archive.probe(pw)
+            except PasswordError:
+                return False
+            except Exception:
+                pass  #: let verify report it
+            return True
+
+        executor = ThreadPoolExecutor(workers)
+        futures = {executor.submit(probe, pw): pw for pw in passwords}
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    yield futures[future]
+
+        finally:
+            #: the running probes are quick, but must be done before extracting
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     #: Deprecated method, use `get_passwords` instead
     @expose
     def get_passwords(self, *args, **kwargs):
@@ -595,14 +773,17 @@ class ExtractArchive(BaseAddon):
 
         return self.passwords
 
+    @lock
     def reload_passwords(self):
         try:
-            passwords = []
-
             file = os.fsdecode(self.config.get("passwordfile"))
+            stat = os.stat(file)
+            stamp = (stat.st_mtime, stat.st_size)
+            if stamp == self.passwords_stamp:
+                return
+
             with open(file) as fp:
-                for pw in fp.read().splitlines():
-                    passwords.append(pw)
+                passwords = fp.read().splitlines()
 
         except IOError as exc:
             if exc.errno == 2:
@@ -614,6 +795,30 @@ class ExtractArchive(BaseAddon):
 
         else:
             self.passwords = passwords
+            self.passwords_stamp = stamp
+
+    def report_rank(self, password, passwords, elapsed):
+        """
+        logs how many tests the ranking saved compared to the password file order.
+        """
+        plain = uniquify(passwords[:1] + self.passwords)
+        if password not in plain:
+            return
+
+        rank = passwords.index(password)
+        skipped = plain.index(password) - rank
+        saved = elapsed / (rank + 1) * skipped
+
+        self.info["password_tests_saved"] = (
+            self.info.get("password_tests_saved", 0) + skipped
+        )
+        self.info["password_time_saved"] = round(
+            self.info.get("password_time_saved", 0) + saved, 1
+        )
+        self.log_debug(
+            f"Password found as candidate {rank + 1} instead of {rank + skipped + 1}, "
+            f"saved about {saved:.1f}s"
+        )
 
     #: Deprecated method, use `add_password` instead
     @expose
@@ -624,10 +829,18 @@ class ExtractArchive(BaseAddon):
         return self.add_password(*args, **kwargs)
 
     @expose
-    def add_password(self, password):
+    @lock
+    def add_password(self, password, sources=()):
         """
-        Adds a password to saved list.
+        Adds a password to saved list, sources are the hoster and package name words
+        it worked for.
         """
+        if sources:
+            self.password_stats.hit(password, sources)
+
+        if password in self.passwords:
+            return
+
         try:
             self.passwords = uniquify([password] + self.passwords)
 
@@ -636,5 +849,8 @@ class ExtractArchive(BaseAddon):
                 for pw in self.passwords:
                     fp.write(pw + "\n")
 
+            stat = os.stat(file)
+            self.passwords_stamp = (stat.st_mtime, stat.st_size)
+
         except IOError as exc:
             self.log_error(exc)
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import random
 import threading
 import time
@@ -16,7 +17,7 @@ from .plugin import BasePlugin
 class BaseAccount(BasePlugin):
     __name__ = "BaseAccount"
     __type__ = "account"
-    __version__ = "0.86"
+    __version__ = "0.87"
     __status__ = "stable"
 
     __description__ = """Base account plugin"""
@@ -27,6 +28,9 @@ class BaseAccount(BasePlugin):
     LOGIN_TIMEOUT = timedelta(minutes=30).seconds
     TUNE_TIMEOUT = True  #: Automatically tune relogin interval
 
+    #: Account info older than this gets refreshed in background when selecting an account, use -1 for never expire
+    INFO_TIMEOUT = timedelta(minutes=30).seconds
+
     def __init__(self, manager, accounts):
         self._init(manager.pyload)
 
@@ -37,6 +41,7 @@ class BaseAccount(BasePlugin):
         self.user = None
 
         self.timeout = self.LOGIN_TIMEOUT
+        self.refreshing = set()  #: users with a pending info refresh
 
         #: Callback of periodical job task, used by AddonManager
         self.periodical = Periodical(self, self.periodical_task)
@@ -183,15 +188,22 @@ class BaseAccount(BasePlugin):
             u.update(self.info["login"])
 
         else:
-            d = {"login": {}, "data": {}}
+            self.info.update(self._split_info(u))
+
+    @staticmethod
+    def _split_info(u):
+        """
+        Account dict in the {"login": ..., "data": ...} shape of the info.
+        """
+        d = {"login": {}, "data": {}}
 
-            for k, v in u.items():
-                if k in ("password", "timestamp", "valid"):
-                    d["login"][k] = v
-                else:
-                    d["data"][k] = v
+        for k, v in u.items():
+            if k in ("password", "refreshed", "timestamp", "valid"):
+                d["login"][k] = v
+            else:
+                d["data"][k] = v
 
-            self.info.update(d)
+        return d
 
     def relogin(self):
         return self.login()
@@ -228,6 +240,7 @@ class BaseAccount(BasePlugin):
                 self._("Grabbing account info for user `{}`...").format(self.user)
             )
             self.info = self._grab_info()
+            self.info["login"]["refreshed"] = time.time()
 
             self.syncback()
 
@@ -307,10 +320,53 @@ class BaseAccount(BasePlugin):
         # NOTE: So force=False always here
         return [self.get_account_data(user, False) for user in self.accounts]
 
-    # TODO: Remove in 0.6.x
+    def is_stale(self, user):
+        """
+        Checks if the cached account info of user is outdated.
+        """
+        if self.INFO_TIMEOUT == -1:
+            return False
+
+        refreshed = self.accounts[user].get("refreshed") or 0
+        return refreshed + self.INFO_TIMEOUT < time.time()
+
     @lock
     def schedule_refresh(self, user, force=False):
-        pass
+        """
+        Refreshes the account info of user in background, if outdated or forced.
+        """
+        if user not in self.accounts or user in self.refreshing:
+            return
+
+        if force or self.is_stale(user):
+            self.refreshing.add(user)
+            self.pyload.scheduler.add_job(0, self._refresh, [user])
+
+    def _refresh(self, user):
+        #: Use a copy, the chosen user and its request must stay untouched
+        account = copy.copy(self)
+        account.lock = threading.RLock()
+        account.info = {}
+        account.req = None
+        account.user = None
+
+        try:
+            if account.choose(user):
+                account.get_info()
+
+        except Exception as exc:
+            self.log_warning(
+                self._("Error loading info for user `{}`").format(user), exc
+            )
+
+        finally:
+            if account.req:
+                account.req.close()
+
+            with self.lock:
+                self.refreshing.discard(user)
+
+            self.m.send_change()
 
     @lock
     def add(self, user, password=None, options={}):
@@ -330,6 +386,7 @@ class BaseAccount(BasePlugin):
             "password": password or "",
             "plugin": self.pyload.account_manager.get_account_plugin(self.classname),
             "premium": None,
+            "refreshed": 0,
             "timestamp": 0,
             "trafficleft": None,
             "type": self.__name__,
@@ -372,20 +429,24 @@ class BaseAccount(BasePlugin):
 
     @lock
     def select(self):
+        """
+        Ranks the accounts by their cached info, outdated info gets refreshed in
+        background for the next time. Returns the user and its info, like
+        `get_info` but from the cached values.
+        """
         free_accounts = {}
         premium_accounts = {}
 
-        for user in self.accounts:
-            info = self.accounts[user]["plugin"].get_info()
-            data = info["data"]
+        for user, u in self.accounts.items():
+            self.schedule_refresh(user)
 
-            if not info["login"]["valid"]:
+            if not u["valid"]:
                 continue
 
-            if data["options"].get("time"):
+            if u["options"].get("time"):
                 time_data = ""
                 try:
-                    time_data = data["options"]["time"][0]
+                    time_data = u["options"]["time"][0]
                     start, end = time_data.split("-")
 
                     if not seconds.compare(start.split(":"), end.split(":")):
@@ -398,7 +459,7 @@ class BaseAccount(BasePlugin):
                         ).format(user, time_data)
                     )
 
-            if data["trafficleft"] == 0:
+            if u["trafficleft"] == 0:
                 self.log_warning(
                     self._(
                         "Not using account `{}` because the account has no traffic left"
@@ -406,7 +467,7 @@ class BaseAccount(BasePlugin):
                 )
                 continue
 
-            validuntil = -1 if not data["validuntil"] else data["validuntil"]
+            validuntil = -1 if not u["validuntil"] else u["validuntil"]
             if time.time() > validuntil > 0:
                 self.log_warning(
                     self._(
@@ -415,28 +476,32 @@ class BaseAccount(BasePlugin):
                 )
                 continue
 
-            if data["premium"]:
-                premium_accounts[user] = info
+            if u["premium"]:
+                premium_accounts[user] = u
 
             else:
-                free_accounts[user] = info
+                free_accounts[user] = u
 
         account_list = list((premium_accounts or free_accounts).items())
 
         if not account_list:
             return None, None
 
-        validuntil_list = [
-            (user, info) for user, info in account_list if info["data"]["validuntil"]
-        ]
+        validuntil_list = [(user, u) for user, u in account_list if u["validuntil"]]
 
         if not validuntil_list:
             # TODO: Random account?! Rewrite in 0.6.x
-            return random.choice(account_list)
+            user, u = random.choice(account_list)
+            return user, self._split_info(u)
+
+        def rank(account):
+            u = account[1]
+            traffic = u["trafficleft"]
+            unlimited = traffic is None or traffic < 0
+            return u["validuntil"], float("inf") if unlimited else traffic
 
-        return sorted(
-            validuntil_list, key=lambda a: a[1]["data"]["validuntil"], reverse=True
-        )[0]
+        user, u = max(validuntil_list, key=rank)
+        return user, self._split_info(u)
 
     @lock
     def choose(self, user=None):
@@ -90,7 +90,9 @@ class BaseAddon(BasePlugin):
             "package_processed": "package_processed",
         }
         for event, funcs in event_map.items():
-            self.m.add_event(event, getattr(self, funcs))
+            #: skip the ones doing nothing
+            if getattr(type(self), funcs) is not getattr(BaseAddon, funcs):
+                self.m.add_event(event, getattr(self, funcs))
 
     def init_events(self):
         if self.event_map:
@@ -11,7 +11,7 @@ from .addon import BaseAddon
 class ChatBot(Thread, BaseAddon):
     __name__ = "ChatBot"
     __type__ = "addon"
-    __version__ = "0.01"
+    __version__ = "0.02"
     __status__ = "testing"
 
     __config__ = [
@@ -325,7 +325,12 @@ class ChatBot(Thread, BaseAddon):
         """Returns most recent log entries."""
         self.more = []
         lines = []
-        log = self.pyload.api.get_log()
+
+        if args and args[0] == 'last':
+            offset = -(int(args[1]) if len(args) > 1 else self.max_lines)
+        else:
+            offset = 0
+        log = self.pyload.api.get_log(offset)
 
         for line in log:
             if line:
@@ -333,12 +338,6 @@ class ChatBot(Thread, BaseAddon):
                     line = line[:-1]
                 self.more.append("LOG: {}".format(line))
 
-        if args and args[0] == 'last':
-            if len(args) < 2:
-                self.more = self.more[-self.max_lines:]
-            else:
-                self.more = self.more[-(int(args[1])):]
-
         if len(self.more) < self.max_lines:
             lines.extend(self.more)
             self.more = []
@@ -64,11 +64,19 @@ class BaseDownloader(BaseHoster):
         #: Download is possible with premium account only, don't fallback to free download
         self.no_fallback = False
 
+        #: Checksum algorithms to compute while downloading, e.g. asked for by addons
+        self.stream_checksums = set()
+
+        #: Checksums of the last download computed on the fly, by algorithm
+        self.last_checksums = {}
+
     def setup_base(self):
         self._last_download = ""
         self.last_check = None
         self.restart_free = False
         self.no_fallback = False
+        self.stream_checksums = set()
+        self.last_checksums = {}
 
         if self.account:
             self.chunk_limit = -1  #: -1 for unlimited
@@ -249,7 +257,10 @@ class BaseDownloader(BaseHoster):
                 resume=resume,
                 status_notify=self._on_notification,
                 disposition=disposition,
+                weight=self.pyload.request_factory.get_weight(self.pyfile.packageid),
+                checksums=sorted(self.stream_checksums),
             )
+            self.last_checksums = getattr(self.req, "last_checksums", {})
 
         except IOError as exc:
             self.log_error(str(exc))
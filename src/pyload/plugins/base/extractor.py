@@ -27,7 +27,7 @@ class PasswordError(Exception):
 class BaseExtractor(BasePlugin):
     __name__ = "BaseExtractor"
     __type__ = "base"
-    __version__ = "0.49"
+    __version__ = "0.50"
     __status__ = "stable"
 
     __description__ = """Base extractor plugin"""
@@ -160,6 +160,14 @@ class BaseExtractor(BasePlugin):
         """
         pass
 
+    def probe(self, password=None):
+        """
+        Quick password test, only has to raise PasswordError if the password is
+        wrong. Runs in parallel for several passwords, so must not change the state
+        of the extractor
+        """
+        self.verify(password)
+
     def repair(self):
         pass
 
@@ -13,7 +13,7 @@ from .account import BaseAccount
 class MultiAccount(BaseAccount):
     __name__ = "MultiAccount"
     __type__ = "account"
-    __version__ = "0.24"
+    __version__ = "0.25"
     __status__ = "testing"
 
     __config__ = [
@@ -238,22 +238,20 @@ class MultiAccount(BaseAccount):
 
             self.log_debug(f"New {self.plugintype}s: {', '.join(plugins)}")
 
-            #: Create new regexp
-            domains = "|".join(x.replace(".", r"\.") for x in plugins)
-            pattern = rf".*(?P<DOMAIN>{domains}).*"
-
+            #: Create new regexp, the domains get indexed by host too
+            pattern = None
             if (
                 hasattr(self.pluginclass, "__pattern__")
                 and isinstance(self.pluginclass.__pattern__, str)
                 and "://" in self.pluginclass.__pattern__
             ):
-                pattern = rf"{self.pluginclass.__pattern__}|{pattern}"
+                pattern = self.pluginclass.__pattern__
 
-            self.log_debug(f"Pattern: {pattern}")
+            pattern = self.pyload.plugin_manager.set_domains(
+                self.plugintype, self.classname, plugins, pattern
+            )
 
-            hdict = self.pyload.plugin_manager.plugins[self.plugintype][self.classname]
-            hdict["pattern"] = pattern
-            hdict["re"] = re.compile(pattern)
+            self.log_debug(f"Pattern: {pattern}")
 
     def get_plugins(self, cached=True):
         if cached and self.plugins:
@@ -462,10 +460,12 @@ class MultiAccount(BaseAccount):
                 self.unload_plugin(plugin)
 
         #: Reset pattern
-        hdict = self.pyload.plugin_manager.plugins[self.plugintype][self.classname]
-
-        hdict["pattern"] = getattr(self.pluginclass, "__pattern__", r"^unmatchable$")
-        hdict["re"] = re.compile(hdict["pattern"])
+        self.pyload.plugin_manager.set_domains(
+            self.plugintype,
+            self.classname,
+            (),
+            getattr(self.pluginclass, "__pattern__", r"^unmatchable$"),
+        )
 
     def update_accounts(self, user, password=None, options={}):
         super().update_accounts(user, password, options)
@@ -8,9 +8,19 @@ from .addon import BaseAddon, expose
 class Notifier(BaseAddon):
     __name__ = "Notifier"
     __type__ = "addon"
-    __version__ = "0.11"
+    __version__ = "0.12"
     __status__ = "testing"
 
+    #: sending may take a while, nobody has to wait for it
+    __threaded__ = [
+        "download_finished",
+        "download_failed",
+        "package_finished",
+        "before_reconnecting",
+        "after_reconnecting",
+        "new_captcha_task",
+    ]
+
     __config__ = [
         ("enabled", "bool", "Activated", False),
         ("captcha", "bool", "Notify captcha request", True),
@@ -7,6 +7,11 @@ from PIL import Image
 
 from pyload import PKGDIR
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from .plugin import BasePlugin
 
 # import tempfile
@@ -15,7 +20,7 @@ from .plugin import BasePlugin
 class BaseOCR(BasePlugin):
     __name__ = "BaseOCR"
     __type__ = "base"
-    __version__ = "0.28"
+    __version__ = "0.29"
     __status__ = "stable"
 
     __description__ = """OCR base plugin"""
@@ -150,6 +155,19 @@ class BaseOCR(BasePlugin):
     def recognize(self, image):
         raise NotImplementedError
 
+    def _array(self):
+        """
+        copy of the image as numpy array, None if numpy is missing or the image is
+        not greyscale, the pixel loops are used then.
+        """
+        if np is None or self.img.mode != "L":
+            return None
+        return np.array(self.img)
+
+    def _set_array(self, arr):
+        self.img.paste(Image.fromarray(arr.astype(np.uint8)))
+        self.pixels = self.img.load()
+
     def to_greyscale(self):
         if self.img.mode != "L":
             self.img = self.img.convert("L")
@@ -157,6 +175,11 @@ class BaseOCR(BasePlugin):
         self.pixels = self.img.load()
 
     def eval_black_white(self, limit):
+        arr = self._array()
+        if arr is not None:
+            self._set_array(np.where(arr > limit, 255, 0))
+            return
+
         self.pixels = self.img.load()
         w, h = self.img.size
         for x in range(w):
@@ -167,6 +190,25 @@ class BaseOCR(BasePlugin):
                     self.pixels[x, y] = 0
 
     def clean(self, allowed):
+        arr = self._array()
+        if arr is not None:
+            dark = (arr != 255).astype(np.int8)
+
+            def neighbour(dx, dy):
+                return np.roll(dark, (-dy, -dx), axis=(0, 1))
+
+            #: The loop counts the neighbours in this order until one is past the right
+            #: or bottom edge, the ones before the left and top edge wrap around
+            count = neighbour(-1, -1) + neighbour(-1, 0)
+            count[:-1] += neighbour(-1, 1)[:-1] + neighbour(0, 1)[:-1]
+            count[:-1, :-1] += (
+                neighbour(1, 1) + neighbour(1, 0) + neighbour(1, -1) + neighbour(0, -1)
+            )[:-1, :-1]
+
+            arr[(dark == 1) & (count < allowed) | (arr == 1)] = 255
+            self._set_array(arr)
+            return
+
         pixels = self.pixels
 
         w, h = self.img.size
@@ -223,6 +265,32 @@ class BaseOCR(BasePlugin):
         """
         Rotate by checking each angle and guess most suitable.
         """
+        arr = self._array()
+        if arr is not None:
+            arr[arr == 0] = 155
+            self._set_array(arr)
+
+            highest = {}
+            for angle in range(-45, 45):
+                count = (np.asarray(self.img.rotate(angle)) == 155).sum(axis=0)
+                avg = int(count.sum()) // int(np.count_nonzero(count))
+                highest[angle] = max(int(count.max()), 0) - avg
+
+            hkey = 0
+            hvalue = 0
+
+            for key, value in highest.items():
+                if value > hvalue:
+                    hkey = key
+                    hvalue = value
+
+            self.img = self.img.rotate(hkey)
+            arr = np.array(self.img)
+            arr[arr == 0] = 255
+            arr[arr == 155] = 0
+            self._set_array(arr)
+            return
+
         w, h = self.img.size
         pixels = self.pixels
 
@@ -293,33 +361,49 @@ class BaseOCR(BasePlugin):
 
         self.pixels = pixels
 
+    def _dark_columns(self):
+        """
+        top and bottom row of the dark pixels in each column, None for white ones.
+        """
+        arr = self._array()
+        if arr is not None:
+            dark = arr != 255
+            rows = np.arange(arr.shape[0])[:, None]
+            top = np.where(dark, rows, arr.shape[0]).min(axis=0).tolist()
+            bottom = np.where(dark, rows, 0).max(axis=0).tolist()
+            return [
+                (top[x], bottom[x]) if found else None
+                for x, found in enumerate(dark.any(axis=0).tolist())
+            ]
+
+        width, height = self.img.size
+        pixels = self.img.load()
+        columns = []
+
+        for x in range(width):
+            rows = [y for y in range(height) if pixels[x, y] != 255]
+            columns.append((min(rows), max(rows)) if rows else None)
+
+        return columns
+
     def split_captcha_letters(self):
         captcha = self.img
         started = False
         letters = []
         width, height = captcha.size
         bottomY, topY = 0, height
-        pixels = captcha.load()
 
-        for x in range(width):
-            black_pixel_in_col = False
-            for y in range(height):
-                if pixels[x, y] != 255:
-                    if not started:
-                        started = True
-                        firstX = x
-                        lastX = x
-
-                    if y > bottomY:
-                        bottomY = y
-                    if y < topY:
-                        topY = y
-                    if x > lastX:
-                        lastX = x
-
-                    black_pixel_in_col = True
-
-            if black_pixel_in_col is False and started is True:
+        for x, column in enumerate(self._dark_columns()):
+            if column is not None:
+                if not started:
+                    started = True
+                    firstX = x
+
+                topY = min(topY, column[0])
+                bottomY = max(bottomY, column[1])
+                lastX = x
+
+            elif started:
                 rect = (firstX, topY, lastX, bottomY)
                 new_captcha = captcha.crop(rect)
 
@@ -13,7 +13,7 @@ from pyload.plugins.helpers import renice
 class UnRar(BaseExtractor):
     __name__ = "UnRar"
     __type__ = "extractor"
-    __version__ = "1.44"
+    __version__ = "1.45"
     __status__ = "testing"
 
     __config__ = [("ignore_warnings", "bool", "Ignore unrar warnings", False)]
@@ -118,6 +118,29 @@ class UnRar(BaseExtractor):
             if groups[0] == "*":
                 raise PasswordError
 
+    def probe(self, password=None):
+        #: Listing is not enough when only the files are encrypted, so test the
+        #: smallest of them with the password
+        p = self.call_cmd("l", "-v", self.filename)
+        out, err = (to_str(r).strip() if r else "" for r in p.communicate())
+
+        f_grp = 5 if float(self.VERSION) >= 5 else 1
+        encrypted = [
+            (int(groups[2]), groups[f_grp].strip())
+            for groups in self._RE_FILES.findall(out)
+            if groups[0] == "*"
+        ]
+        if not encrypted:
+            #: Encrypted headers can only be listed with the right password
+            return self.verify(password)
+
+        size, name = min(encrypted)
+        p = self.call_cmd("t", self.filename, name, password=password)
+        out, err = (to_str(r).strip() if r else "" for r in p.communicate())
+
+        if self._RE_BADPWD.search(err):
+            raise PasswordError
+
     def repair(self):
         p = self.call_cmd("rc", self.filename)
 
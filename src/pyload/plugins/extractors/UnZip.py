@@ -11,7 +11,7 @@ from pyload.plugins.base.extractor import ArchiveError, BaseExtractor, CRCError,
 class UnZip(BaseExtractor):
     __name__ = "UnZip"
     __type__ = "extractor"
-    __version__ = "1.28"
+    __version__ = "1.29"
     __status__ = "stable"
 
     __description__ = """ZIP extractor plugin"""
@@ -54,7 +54,7 @@ class UnZip(BaseExtractor):
 
     def list(self, password=None):
         with zipfile.ZipFile(self.filename, "r") as z:
-            z.setpassword(password)
+            z.setpassword(password.encode() if password else None)
             self.files = [os.path.join(self.dest, _f)
                           for _f in z.namelist()
                           if _f[-1] != os.path.sep]
@@ -64,7 +64,7 @@ class UnZip(BaseExtractor):
     def verify(self, password=None):
         try:
             with zipfile.ZipFile(self.filename, "r") as z:
-                z.setpassword(password)
+                z.setpassword(password.encode() if password else None)
                 badfile = z.testzip()
                 if badfile is not None:
                     raise CRCError(badfile)
@@ -78,12 +78,32 @@ class UnZip(BaseExtractor):
             else:
                 raise CRCError(exc)
 
+    def probe(self, password=None):
+        #: Opening an encrypted member only checks the password against its header
+        try:
+            with zipfile.ZipFile(self.filename, "r") as z:
+                for info in z.infolist():
+                    if info.flag_bits & 0x1:
+                        z.open(
+                            info, pwd=password.encode() if password else None
+                        ).close()
+                        break
+
+        except (zipfile.BadZipfile, zipfile.LargeZipFile) as exc:
+            raise ArchiveError(exc)
+
+        except RuntimeError as exc:
+            if "encrypted" in exc.args[0] or "Bad password" in exc.args[0]:
+                raise PasswordError(exc)
+            else:
+                raise CRCError(exc)
+
     def extract(self, password=None):
         self.verify(password)
 
         try:
             with zipfile.ZipFile(self.filename, "r") as z:
-                z.setpassword(password)
+                z.setpassword(password.encode() if password else None)
                 members = (member for member in z.namelist()  
                            if not any(fnmatch.fnmatch(member, exclusion)
                            for exclusion in self.excludefiles))
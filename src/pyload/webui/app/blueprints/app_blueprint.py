@@ -357,20 +357,27 @@ def logs(start_line=-1):
 
         # s.modified = True
 
-    log = api.get_log()
-    if not perpage:
-        start_line = 0
-
-    if start_line < 1:
-        start_line = (
-            1 if len(log) - perpage + 1 < 1 or perpage == 0 else len(log) - perpage + 1
-        )
-
     if isinstance(fro, datetime.datetime):  #: we will search for datetime.datetime
+        log = api.get_log()
+        length = len(log)
         start_line = -1
+        counter = 0
+
+    else:
+        #: only read the shown lines, the log can be huge
+        length = api.get_log_length()
+        if not perpage:
+            start_line = 0
+
+        if start_line < 1:
+            start_line = (
+                1 if length - perpage + 1 < 1 or perpage == 0 else length - perpage + 1
+            )
+
+        log = api.get_log(start_line - 1, perpage or None)
+        counter = start_line - 1
 
     data = []
-    counter = 0
     perpagecheck = 0
     for logline in log:
         counter += 1
@@ -424,7 +431,7 @@ def logs(start_line=-1):
         "perpage": perpage,
         "perpage_p": sorted(perpage_p),
         "iprev": max(start_line - perpage, 1),
-        "inext": (start_line + perpage) if start_line + perpage <= len(log) else start_line,
+        "inext": (start_line + perpage) if start_line + perpage <= length else start_line,
     }
     return render_template("logs.html", **context)
 
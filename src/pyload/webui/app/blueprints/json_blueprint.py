@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import time
+from threading import Lock, Semaphore
 
 import flask
 from flask.json import jsonify
@@ -22,36 +25,222 @@ def status():
     return jsonify(data)
 
 
+def format_link(api, link):
+    if link["status"] == 12:
+        formatted_eta = link["format_eta"]
+        formatted_speed = format.speed(link["speed"])
+        link["info"] = f"{formatted_eta} @ {formatted_speed}"
+
+    elif link["status"] == 5:
+        link["percent"] = 0
+        link["size"] = 0
+        link["bleft"] = 0
+        link["info"] = api._("waiting {}").format(link["format_wait"])
+    else:
+        link["info"] = ""
+
+    return link
+
+
 @bp.route("/json/links", methods=["GET", "POST"], endpoint="links")
 # @apiver_check
 @login_required("LIST")
 def links():
     api = flask.current_app.config["PYLOAD_API"]
     try:
-        links = api.status_downloads()
-        ids = []
-        for link in links:
-            ids.append(link["fid"])
-
-            if link["status"] == 12:
-                formatted_eta = link["format_eta"]
-                formatted_speed = format.speed(link["speed"])
-                link["info"] = f"{formatted_eta} @ {formatted_speed}"
-
-            elif link["status"] == 5:
-                link["percent"] = 0
-                link["size"] = 0
-                link["bleft"] = 0
-                link["info"] = api._("waiting {}").format(link["format_wait"])
-            else:
-                link["info"] = ""
-
+        links = [format_link(api, link) for link in api.status_downloads()]
+        ids = [link["fid"] for link in links]
         return jsonify(links=links, ids=ids)
 
     except Exception as exc:
         return jsonify(False), 500
 
 
+STREAM_INTERVAL = 1  #: min seconds between updates, speed and eta refresh rate
+STREAM_LIFETIME = 300  #: seconds until the browser has to reconnect
+STREAM_RETRY = 3000  #: milliseconds the browser waits before reconnecting
+STREAM_KEEPALIVE = 15  #: seconds of silence after which a comment is sent
+STREAM_IDLE = 5  #: seconds between status checks with nothing downloading
+
+#: every stream holds a webserver thread, beyond this clients keep polling
+streams = Semaphore(4)
+
+
+class StatusSnapshot:
+    """
+    server status and active downloads, polled once for all event streams.
+
+    A stream asks for data reflecting the events up to its cursor, or for its
+    periodic speed and eta update; the data is polled again only if it is older.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = Lock()
+        self.checked = 0
+        self.seq = None  #: event seq the data reflects
+        self.status = None
+        self.links = {}
+
+    def get(self, api, cursor):
+        """
+        returns the status and the links by fid, at most interval old and polled
+        after the event at cursor.
+        """
+        with self.lock:
+            if (
+                self.seq is None
+                or self.seq < cursor
+                or time.time() - self.checked >= self.interval
+            ):
+                #: replaced, never changed, streams keep the old ones to compare
+                self.seq = api.pyload.event_manager.seq
+                self.status = dict(api.status_server())
+                self.links = {
+                    link["fid"]: dict(format_link(api, link))
+                    for link in api.status_downloads()
+                }
+                self.checked = time.time()
+            return self.status, self.links
+
+
+snapshot = StatusSnapshot(STREAM_INTERVAL)
+
+
+@bp.route("/json/events", endpoint="events")
+# @apiver_check
+@login_required("LIST")
+def events():
+    """
+    pushes server status and active downloads as server-sent events.
+
+    The stream follows the event buffer with its own cursor and sleeps until
+    something changes there, events arriving meanwhile are coalesced. Only what
+    changed is sent: a `status` message when the server status changed and a
+    `links` message with the changed downloads and the ids of finished ones. The
+    first `links` message of a connection has all downloads and `full` set.
+    While downloading, speed and eta are refreshed every STREAM_INTERVAL.
+    """
+    if not streams.acquire(blocking=False):
+        return "Too many event streams", 503
+
+    try:
+        api = flask.current_app.config["PYLOAD_API"]
+        event_manager = api.pyload.event_manager
+
+        def message(event, data):
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+        def stream():
+            yield f"retry: {STREAM_RETRY}\n\n"
+
+            cursor = event_manager.seq
+            last_status, last_links = snapshot.get(api, cursor)
+            data = {"links": list(last_links.values()), "removed": [], "full": True}
+            yield message("status", last_status)
+            yield message("links", data)
+
+            last_sent = last_check = time.time()
+            deadline = last_sent + STREAM_LIFETIME
+
+            while time.time() < deadline:
+                #: let events pile up in the buffer instead of waking on every one
+                time.sleep(max(0, last_check + STREAM_INTERVAL - time.time()))
+
+                timeout = min(
+                    STREAM_INTERVAL if last_links else STREAM_IDLE,
+                    max(0, last_sent + STREAM_KEEPALIVE - time.time()),
+                )
+                events, cursor = event_manager.wait(cursor, timeout)
+                last_check = time.time()
+
+                status, links = snapshot.get(api, cursor)
+                if status != last_status:
+                    last_status = status
+                    last_sent = time.time()
+                    yield message("status", status)
+
+                if links is not last_links:
+                    changed = [
+                        link
+                        for fid, link in links.items()
+                        if last_links.get(fid) != link
+                    ]
+                    removed = [fid for fid in last_links if fid not in links]
+                    last_links = links
+                    if changed or removed:
+                        last_sent = time.time()
+                        yield message("links", {"links": changed, "removed": removed})
+
+                #: writing is the only way to notice a client has gone
+                if time.time() - last_sent >= STREAM_KEEPALIVE:
+                    last_sent = time.time()
+                    yield ":\n\n"
+
+        response = flask.Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(streams.release)
+
+    except Exception:
+        streams.release()
+        raise
+
+    return response
+
+
+@bp.route("/json/log", endpoint="log")
+# @apiver_check
+@login_required("LOGS")
+def log():
+    """
+    pushes new log records as server-sent `log` events.
+
+    Every message carries the sequence number of its last record as id, so a
+    reconnecting browser gets the records it missed while they are still kept.
+    """
+    if not streams.acquire(blocking=False):
+        return "Too many event streams", 503
+
+    try:
+        api = flask.current_app.config["PYLOAD_API"]
+        tail = api.pyload.logfactory.tail
+
+        try:
+            cursor = min(int(flask.request.headers.get("Last-Event-ID")), tail.seq)
+        except (TypeError, ValueError):
+            cursor = tail.seq
+
+        def stream():
+            nonlocal cursor
+            yield f"retry: {STREAM_RETRY}\n\n"
+
+            deadline = time.time() + STREAM_LIFETIME
+            while time.time() < deadline:
+                lines, cursor = tail.wait(cursor, STREAM_KEEPALIVE)
+                if lines:
+                    yield f"id: {cursor}\nevent: log\ndata: {json.dumps(lines)}\n\n"
+                    time.sleep(STREAM_INTERVAL)  #: let bursts of records pile up
+                else:
+                    #: writing is the only way to notice a client has gone
+                    yield ":\n\n"
+
+        response = flask.Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(streams.release)
+
+    except Exception:
+        streams.release()
+        raise
+
+    return response
+
+
 @bp.route("/json/packages", endpoint="packages")
 # @apiver_check
 @login_required("LIST")
@@ -3,6 +3,8 @@
 let desktopNotifications;
 let interactiveCaptchaHandlerInstance = null;
 const thisScript = document.currentScript;
+// pushes status, download and queue updates, null if the browser has to poll
+let eventStream = null;
 
 function indicateLoad() {
     $(".load-indicator").css('opacity',1);
@@ -298,6 +300,35 @@ $(function() {
     $("#cap_box #cap_positional").click(submit_positional_captcha);
 
     if (thisScript.getAttribute('nopoll') !== "1") {
+        if (window.EventSource) {
+            eventStream = new EventSource("{{url_for('json.events')}}");
+            eventStream.addEventListener("status", function (e) {
+                LoadJsonToContent(JSON.parse(e.data));
+            });
+            eventStream.addEventListener("error", function () {
+                // refused or gone for good, the browser retries by itself otherwise
+                if (eventStream.readyState === EventSource.CLOSED) {
+                    eventStream = null;
+                    startStatusPolling();
+                    $(document).trigger("eventstream:closed");
+                }
+            });
+        } else {
+            startStatusPolling();
+        }
+    }
+});
+
+function startStatusPolling() {
+    $.ajax({
+        method: "post",
+        url: "{{url_for('json.status')}}",
+        async: true,
+        timeout: 3000,
+        success: LoadJsonToContent
+    });
+
+    setInterval(function () {
         $.ajax({
             method: "post",
             url: "{{url_for('json.status')}}",
@@ -305,18 +336,8 @@ $(function() {
             timeout: 3000,
             success: LoadJsonToContent
         });
-
-        setInterval(function () {
-            $.ajax({
-                method: "post",
-                url: "{{url_for('json.status')}}",
-                async: true,
-                timeout: 3000,
-                success: LoadJsonToContent
-            });
-        }, 4000);
-    }
-});
+    }, 4000);
+}
 
 function LoadJsonToContent(a) {
     var notification;
@@ -28,6 +28,30 @@ function EntryManager(){
     var container;
     this.initialize = function() {
         thisObject=this;
+        if (eventStream) {
+            eventStream.addEventListener("links", function(e) {
+                thisObject.apply(JSON.parse(e.data));
+            });
+            $(document).on("eventstream:closed", thisObject.startPolling);
+        } else {
+            thisObject.startPolling();
+        }
+
+        ids = [{% for link in content %}
+        {% if forloop.last %}
+            {{link.id}}
+        {% else %}
+         {{link.id}},
+        {% endif %}
+        {% endfor %}];
+
+        container = $('#links_active');
+
+        this.parseFromContent();
+
+        // this.json.startTimer();
+    };
+    this.startPolling = function() {
         $.ajax({
             method:"post",
             url: "{{url_for('json.links')}}",
@@ -44,20 +68,6 @@ function EntryManager(){
             success: thisObject.update
         });
     }, 2500);
-
-        ids = [{% for link in content %}
-        {% if forloop.last %}
-            {{link.id}}
-        {% else %}
-         {{link.id}},
-        {% endif %}
-        {% endfor %}];
-
-        container = $('#links_active');
-
-        this.parseFromContent();
-
-        // this.json.startTimer();
     };
     this.parseFromContent = function (){
         $.each(ids,function(id,index){
@@ -111,6 +121,41 @@ function EntryManager(){
             alert(e)
         }
     };
+    // applies the changed downloads pushed by the event stream
+    this.apply = function (data){
+        if (data.full){
+            // first message of a connection, it has all downloads
+            thisObject.update(data);
+            return;
+        }
+        try{
+            $.each(data.removed,function(i,fid){
+                var index = ids.indexOf(fid);
+                if (index > -1){
+                    entries[index].remove();
+                    entries.splice(index,1);
+                    ids.splice(index,1);
+                }
+            });
+            $.each(data.links,function(i,link){
+                var index= $.inArray(link.fid,ids);
+                if (index > -1){
+                    entries[index].update(link);
+                }else{
+                    var entry = new LinkEntry(link.fid);
+                    entry.insert(link);
+                    entries.push(entry);
+                    ids.push(link.fid);
+                    container[0].appendChild(entry.elements.tr);
+                    container[0].appendChild(entry.elements.pgbTr);
+                    $(entry.fade).fadeIn('fast');
+                    $(entry.fadeBar).fadeIn('fast');
+                }
+            });
+        }catch(e){
+            alert(e)
+        }
+    };
     // initialize object
     this.initialize();
 }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures database startup and update throughput for big queues.
+
+Usage: db_benchmark.py [links ...], default 10000 100000 1000000
+"""
+
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from pyload.core.threads.database_thread import DatabaseThread
+
+LINKS_PER_PACKAGE = 1000
+UPDATES = 10000
+
+
+class Core:
+    def __init__(self, userdir):
+        self.userdir = userdir
+        self.debug = 0
+        self.log = logging.getLogger("db_benchmark")
+        self._ = lambda x: x
+        self.files = SimpleNamespace(status_msg=defaultdict(str))
+
+
+def fill(db, links):
+    for pid in range(links // LINKS_PER_PACKAGE):
+        package = db.add_package(f"package{pid}", f"package{pid}", 1)
+        db.add_links(
+            [
+                (f"http://example.com/{pid}/{n}", "DefaultPlugin")
+                for n in range(LINKS_PER_PACKAGE)
+            ],
+            package,
+        )
+    db.sync_save()
+
+
+def bench(links):
+    userdir = tempfile.mkdtemp()
+    try:
+        db = DatabaseThread(Core(userdir))
+        db.setup()
+        t = time.time()
+        fill(db, links)
+        print(f"{links} links: filled in {time.time() - t:.2f}s")
+        db.shutdown()
+        db.join()
+
+        t = time.time()
+        db = DatabaseThread(Core(userdir))
+        db.setup()
+        db.get_all_packages(1)
+        data = db.get_all_links(1)
+        print(f"{links} links: startup and queue load in {time.time() - t:.2f}s")
+
+        pyfiles = [
+            SimpleNamespace(
+                id=fid,
+                url=f["url"],
+                name=f["name"],
+                size=1 << 20,
+                status=0,
+                error="",
+                packageid=f["package"],
+            )
+            for fid, f in list(data.items())[:UPDATES]
+        ]
+        t = time.time()
+        for pyfile in pyfiles:
+            db.update_link(pyfile)
+        db.sync_save()
+        elapsed = time.time() - t
+        print(f"{links} links: {len(pyfiles) / elapsed:.0f} updates/s")
+
+        t = time.time()
+        db.vacuum()
+        print(f"{links} links: vacuum in {time.time() - t:.2f}s")
+
+        db.shutdown()
+        db.join()
+    finally:
+        shutil.rmtree(userdir, ignore_errors=True)
+
+
+def main():
+    for links in map(int, sys.argv[1:] or (10000, 100000, 1000000)):
+        bench(links)
+
+
+if __name__ == "__main__":
+    main()
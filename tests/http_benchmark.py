@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the callback driven HTTPDownload against the old sleeping transfer loop,
+downloading from a local range server.
+
+Usage: http_benchmark.py [megabytes [chunks]], default 200 MB in 4 chunks.
+"""
+
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pycurl
+
+from pyload.core.network.http.http_download import HTTPDownload
+
+BLOCK = os.urandom(1 << 20)
+OPTIONS = {"interface": None, "proxies": {}, "ipv6": False}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    size = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        start, end = 0, self.size - 1
+        range = self.headers.get("Range")
+        if range:
+            first, last = range.split("=")[1].split("-")
+            start = int(first)
+            end = min(int(last), end) if last else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{self.size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        pos = start
+        while pos <= end:
+            offset = pos % len(BLOCK)
+            data = BLOCK[offset : offset + min(end + 1 - pos, 64 << 10)]
+            self.wfile.write(data)
+            pos += len(data)
+
+
+class RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  #: downloads drop connections they do not need anymore
+
+
+def serve(port, size):
+    RangeHandler.size = size
+    RangeServer(("127.0.0.1", port), RangeHandler).serve_forever()
+
+
+def sleep_loop(url, filename, size, chunks):
+    """
+    the transfer loop before the callback driven one: curl is polled every second,
+    finished handles are checked every 0.5 seconds and every write callback sleeps.
+    """
+    m = pycurl.CurlMulti()
+    handles = []
+    part = size // chunks
+    for n in range(chunks):
+        fp = open(f"{filename}.chunk{n}", mode="wb")
+        state = {"sleep": 0.0, "last_size": 0}
+
+        def write(buf, fp=fp, state=state):
+            fp.write(buf)
+            if len(buf) < state["last_size"]:
+                state["sleep"] += 0.002
+            else:
+                state["sleep"] *= 0.7
+            state["last_size"] = len(buf)
+            time.sleep(state["sleep"])
+
+        c = pycurl.Curl()
+        c.setopt(pycurl.URL, url)
+        c.setopt(pycurl.WRITEFUNCTION, write)
+        last = size - 1 if n == chunks - 1 else (n + 1) * part - 1
+        c.setopt(pycurl.RANGE, f"{n * part}-{last}")
+        m.add_handle(c)
+        handles.append((c, fp))
+
+    done = 0
+    last_finish_check = 0
+    while done < chunks:
+        while True:
+            ret, num_handles = m.perform()
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+        t = time.time()
+        if last_finish_check + 0.5 < t:
+            num_q, ok_list, err_list = m.info_read()
+            done += len(ok_list) + len(err_list)
+            last_finish_check = t
+
+        m.select(1)
+
+    for c, fp in handles:
+        m.remove_handle(c)
+        c.close()
+        fp.close()
+    m.close()
+
+    return sum(os.path.getsize(f"{filename}.chunk{n}") for n in range(chunks))
+
+
+def callback_loop(url, filename, size, chunks):
+    download = HTTPDownload(url, filename, options=OPTIONS)
+    try:
+        download.download(chunks=chunks)
+    finally:
+        download.close()
+
+    return os.path.getsize(filename)
+
+
+def measure(func, url, folder, size, chunks):
+    filename = os.path.join(folder, func.__name__)
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    t = time.time()
+    received = func(url, filename, size, chunks)
+    elapsed = time.time() - t
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime
+    print(
+        f"{func.__name__:>14}: {elapsed:6.2f}s, {size / elapsed / (1 << 20):7.1f} MB/s, "
+        f"cpu {cpu:.2f}s" + ("" if received == size else f", got {received} bytes!")
+    )
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    chunks = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    size = megabytes << 20
+
+    port = 8000 + os.getpid() % 1000
+    server = multiprocessing.Process(target=serve, args=(port, size), daemon=True)
+    server.start()
+    time.sleep(0.5)
+
+    folder = tempfile.mkdtemp()
+    try:
+        url = f"http://127.0.0.1:{port}/file"
+        print(f"{megabytes} MB in {chunks} chunks")
+        measure(sleep_loop, url, folder, size, chunks)
+        measure(callback_loop, url, folder, size, chunks)
+    finally:
+        server.terminate()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
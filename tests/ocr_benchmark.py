@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the numpy image operations of BaseOCR against the pixel loops.
+
+Usage: ocr_benchmark.py [image files ...], by default noisy captcha like images
+are generated.
+"""
+
+import io
+import random
+import string
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from pyload.plugins.base import ocr
+
+SAMPLES = 5
+
+
+def generate_image():
+    """
+    a few rotated letters on a grey background with some dirt.
+    """
+    img = Image.new("L", (160, 60), 220)
+    font = ImageFont.load_default()
+    for n in range(5):
+        letter = Image.new("L", (30, 30), 0)
+        ImageDraw.Draw(letter).text(
+            (8, 6), random.choice(string.ascii_uppercase), fill=255, font=font
+        )
+        letter = letter.resize((45, 45)).rotate(random.randint(-20, 20))
+        img.paste(40, (10 + n * 29, 8), letter)
+
+    pixels = img.load()
+    for n in range(400):
+        pixels[random.randrange(160), random.randrange(60)] = random.randrange(256)
+
+    fp = io.BytesIO()
+    img.save(fp, "PNG")
+    fp.seek(0)
+    return fp
+
+
+def run(image):
+    engine = ocr.BaseOCR.__new__(ocr.BaseOCR)
+    image.seek(0)
+    engine.load_image(image)
+    engine.to_greyscale()
+
+    t = time.time()
+    engine.eval_black_white(140)
+    engine.clean(3)
+    engine.derotate_by_average()
+    letters = engine.split_captcha_letters()
+    elapsed = time.time() - t
+
+    return elapsed, engine.img.tobytes(), [letter.tobytes() for letter in letters]
+
+
+def main():
+    if sys.argv[1:]:
+        images = []
+        for filename in sys.argv[1:]:
+            with open(filename, mode="rb") as fp:
+                images.append(io.BytesIO(fp.read()))
+    else:
+        random.seed(0)
+        images = [generate_image() for n in range(SAMPLES)]
+
+    numpy = ocr.np
+    if numpy is None:
+        print("numpy not installed")
+        return 1
+
+    loops = vectorized = 0
+    mismatches = 0
+    for n, image in enumerate(images):
+        ocr.np = None
+        elapsed, img, letters = run(image)
+        loops += elapsed
+
+        ocr.np = numpy
+        elapsed, img2, letters2 = run(image)
+        vectorized += elapsed
+
+        if (img, letters) != (img2, letters2):
+            print(f"MISMATCH image {n}")
+            mismatches += 1
+
+    print(
+        f"{len(images)} images, loops: {loops / len(images):.3f}s, "
+        f"numpy: {vectorized / len(images):.3f}s per image"
+    )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
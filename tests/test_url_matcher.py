@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import random
+import string
+from types import SimpleNamespace
+
+import pytest
+
+from pyload.core.managers.plugin_manager import PluginManager, URLMatcher, sre_parse
+
+
+@pytest.fixture(scope="module")
+def plugins(tmp_path_factory):
+    userdir = str(tmp_path_factory.mktemp("userdir"))
+    manager = PluginManager.__new__(PluginManager)
+    manager.pyload = SimpleNamespace(
+        userdir=userdir,
+        version="",
+        log=logging.getLogger("test_url_matcher"),
+        config=SimpleNamespace(delete_config=lambda name: None),
+    )
+    manager._ = lambda x: x
+    manager.index_cache_path = os.path.join(userdir, "plugin_index.json")
+    manager.load_index_cache()
+    return [
+        manager.parse(folder, pattern=True)[0]
+        for folder in ("decrypters", "downloaders", "containers")
+    ]
+
+
+def linear_find(plugins, url):
+    for plugin_dicts in plugins:
+        for name, value in plugin_dicts.items():
+            if value.get("re") is not None and value["re"].match(url):
+                return name, value
+    return None
+
+
+def generate_urls(matcher, size):
+    """
+    urls built from the literal skeletons of the patterns, wildcards filled randomly.
+    """
+    skeletons = ["https://www.example.com/\0", "http://\0.\0/\0?id=\0"]
+    for name, value, regex in matcher.entries:
+        if regex is not None:
+            variants = matcher._expand(sre_parse.parse(regex.pattern, regex.flags))
+            skeletons.extend(variants or ())
+
+    random.seed(0)
+    fill = string.ascii_letters + string.digits + "-_."
+    urls = []
+    for n in range(size):
+        parts = random.choice(skeletons).replace(matcher.END, "").split(matcher.WILDCARD)
+        url = "".join(
+            part + "".join(random.choices(fill, k=random.randint(1, 12)))
+            for part in parts[:-1]
+        )
+        urls.append(url + parts[-1])
+    return urls
+
+
+def test_find_like_trying_all_patterns(plugins):
+    matcher = URLMatcher(*plugins)
+    urls = generate_urls(matcher, 20000)
+    urls += [url.upper() for url in urls[:1000]]
+    urls += [url + "\n" for url in urls[:200]]
+    urls += ["", "https://ünicode.example/x", "ftp://files.example.org/a.rar"]
+
+    for url in urls:
+        assert matcher.find(url) == linear_find(plugins, url), url
+
+
+def test_rebuild_replaces_the_whole_state(plugins):
+    matcher = URLMatcher(*plugins)
+    state = matcher.state
+    matcher.check()
+    assert matcher.state is state  #: nothing changed
+
+    name = next(iter(plugins[1]))
+    plugins[1]["TestHoster"] = {"name": "TestHoster", "re": plugins[1][name]["re"]}
+    try:
+        matcher.check()
+        assert matcher.state is not state
+        assert len(matcher.entries) == len(state.entries) + 1
+        assert state.entries is not matcher.entries
+    finally:
+        del plugins[1]["TestHoster"]
+
+
+def test_multi_hoster_domains_match_like_their_pattern(plugins):
+    hosters = dict(plugins[1])
+    hosters["Debrid"] = {"name": "Debrid"}
+    hosters["OtherDebrid"] = {"name": "OtherDebrid"}
+    hosters["OddDebrid"] = {"name": "OddDebrid"}
+    manager = PluginManager.__new__(PluginManager)
+    manager.plugins = {"downloader": hosters}
+    manager.set_domains(
+        "downloader",
+        "Debrid",
+        ["example-files.com", "Mirror.example.net", "files.example.com.au"],
+        r"https?://(?:www\.)?debrid\.com/dl/\w+",
+    )
+    manager.set_domains("downloader", "OtherDebrid", ["localhost", ".example.org"])
+    manager.set_domains("downloader", "OddDebrid", ["odd+files.com"])
+    sources = [plugins[0], hosters, plugins[2]]
+    matcher = URLMatcher(*sources)
+
+    urls = [
+        "https://example-files.com/file/1",
+        "http://dl.example-files.com/file/1",
+        "https://Mirror.example.net/x",
+        "https://mirror.example.net/x",  #: the pattern is case sensitive
+        "https://debrid.com/dl/abc",
+        "https://redirect.example.org/?to=example-files.com/file/1",
+        "https://example-files.community/file/1",
+        "example-files.com/file/1",
+        "https://redirect.example.org/\nexample-files.com/file/1",
+        "https://unrelated.example.org/file/1",
+        "https://xexample-files.com.evil/file/1",
+        "https://a.b.files.example.com.au.example-files.co/",
+        "http://localhost:8080/x",
+        "http://oddfiles.com/x",
+        "http://odd+files.com/x",
+        "http://oddfiles.com/x?u=odd+files.com",
+        "",
+        ".",
+        "...",
+    ]
+    random.seed(1)
+    pieces = ["example-files.com", "Mirror.example.net", ".example.org", "files.", "."]
+    for n in range(2000):
+        urls.append("".join(random.choices(pieces + list("ab/.:\n"), k=8)))
+
+    for url in urls:
+        assert matcher.find(url) == linear_find(sources, url), url
+        for name in ("Debrid", "OtherDebrid", "OddDebrid"):
+            assert matcher.match(hosters[name], url) == bool(
+                hosters[name]["re"].match(url)
+            ), url
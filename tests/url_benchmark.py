@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares PluginManager.parse_urls against trying every plugin pattern in turn.
+
+Usage: url_benchmark.py [--no-debrid] [url files ...], one url per line, by
+default a corpus is generated from the plugin patterns themselves. Three debrid
+services are set up as multi-hosters, like MultiAccount does when their accounts
+are active, unless --no-debrid is given.
+"""
+
+import logging
+import os
+import random
+import re
+import shutil
+import string
+import sys
+import tempfile
+import time
+from itertools import chain
+from types import SimpleNamespace
+
+from pyload.core.managers.plugin_manager import PluginManager, URLMatcher, sre_parse
+
+CORPUS_SIZE = 50000
+DEBRID_ACCOUNTS = 3
+DEBRID_DOMAINS = 600  #: hosts supported by every debrid service
+
+
+def load_manager(userdir):
+    manager = PluginManager.__new__(PluginManager)
+    manager.pyload = SimpleNamespace(
+        userdir=userdir,
+        version="",
+        log=logging.getLogger("url_benchmark"),
+        config=SimpleNamespace(delete_config=lambda name: None),
+    )
+    manager._ = lambda x: x
+    manager.index_cache_path = os.path.join(userdir, "plugin_index.json")
+    manager.load_index_cache()
+    manager.crypter_plugins = manager.parse("decrypters", pattern=True)[0]
+    manager.container_plugins = manager.parse("containers", pattern=True)[0]
+    manager.hoster_plugins = manager.parse("downloaders", pattern=True)[0]
+    manager.plugins = {
+        "decrypter": manager.crypter_plugins,
+        "container": manager.container_plugins,
+        "downloader": manager.hoster_plugins,
+    }
+    manager.url_matcher = URLMatcher(
+        manager.crypter_plugins, manager.hoster_plugins, manager.container_plugins
+    )
+    return manager
+
+
+def add_debrid(manager, count, size):
+    """
+    multi-hosters handling size domains each, mostly the same ones.
+    """
+    random.seed(1)
+    tlds = ("com", "net", "org", "to", "io", "cc")
+    pool = [
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 12)))
+        + f".{random.choice(tlds)}"
+        for n in range(size * 4 // 3)
+    ]
+    patterns = {}
+    for n in range(count):
+        name = f"Debrid{n}"
+        patterns[name] = re.compile(rf"https?://(?:www\.)?debrid{n}\.com/dl/\w+")
+        manager.hoster_plugins[name] = {"name": name}
+        manager.set_domains(
+            "downloader", name, random.sample(pool, size), patterns[name].pattern
+        )
+    return patterns
+
+
+def linear_parse_urls(manager, urls):
+    """
+    the former implementation, trying all patterns.
+    """
+    last = (None, {})
+    res = []
+    for url in urls:
+        if last != (None, {}) and last[1]["re"].match(url):
+            res.append((url, last[0]))
+            continue
+        for name, value in chain(
+            manager.crypter_plugins.items(),
+            manager.hoster_plugins.items(),
+            manager.container_plugins.items(),
+        ):
+            if "re" in value and value["re"].match(url):
+                res.append((url, name))
+                last = (name, value)
+                break
+        else:
+            res.append((url, "DefaultPlugin"))
+    return res
+
+
+def generate_urls(manager, size, patterns):
+    """
+    urls built from the literal skeletons of the patterns, wildcards filled randomly,
+    patterns are the own ones of the multi-hosters.
+    """
+    matcher = manager.url_matcher
+    skeletons = ["https://www.example.com/\0", "http://\0.\0/\0?id=\0"]
+    for name, value, regex in matcher.entries:
+        if regex is None:
+            continue
+        if value.get("domains"):
+            skeletons.extend(
+                f"https://{random.choice(('', 'www.', 'dl.'))}{domain}/\0"
+                for domain in value["domains"]
+            )
+            regex = patterns[name]
+        variants = matcher._expand(sre_parse.parse(regex.pattern, regex.flags))
+        skeletons.extend(variants or ())
+
+    fill = string.ascii_letters + string.digits
+    urls = []
+    for n in range(size):
+        skeleton = random.choice(skeletons).replace(matcher.END, "")
+        parts = skeleton.split(matcher.WILDCARD)
+        urls.append(
+            "".join(
+                part + "".join(random.choices(fill, k=random.randint(1, 12)))
+                for part in parts[:-1]
+            )
+            + parts[-1]
+        )
+    random.shuffle(urls)
+    return urls
+
+
+def main():
+    userdir = tempfile.mkdtemp()
+    try:
+        manager = load_manager(userdir)
+    finally:
+        shutil.rmtree(userdir, ignore_errors=True)
+
+    args = sys.argv[1:]
+    debrid = "--no-debrid" not in args
+    args = [arg for arg in args if arg != "--no-debrid"]
+
+    patterns = add_debrid(manager, DEBRID_ACCOUNTS, DEBRID_DOMAINS) if debrid else {}
+    matcher = manager.url_matcher
+    matcher.check()
+    print(
+        f"{len(matcher.entries)} patterns, {len(matcher.unindexed)} not indexed, "
+        f"{len(matcher.index)} tokens, {len(matcher.multi)} multi-hosters"
+    )
+
+    if args:
+        urls = []
+        for filename in args:
+            with open(filename) as fp:
+                urls.extend(line.strip() for line in fp if line.strip())
+    else:
+        random.seed(0)
+        urls = generate_urls(manager, CORPUS_SIZE, patterns)
+
+    t = time.time()
+    expected = linear_parse_urls(manager, urls)
+    linear = time.time() - t
+
+    t = time.time()
+    result = manager.parse_urls(urls)
+    indexed = time.time() - t
+
+    mismatches = [(a, b) for a, b in zip(expected, result) if a != b]
+    matched = sum(name != "DefaultPlugin" for url, name in result)
+    print(f"{len(urls)} urls, {matched} matched by a plugin")
+    print(
+        f"linear: {linear:.2f}s ({len(urls) / linear:.0f} urls/s), "
+        f"indexed: {indexed:.2f}s ({len(urls) / indexed:.0f} urls/s)"
+    )
+    for a, b in mismatches[:10]:
+        print(f"MISMATCH {a[0]}: {a[1]} != {b[1]}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())